@@ -11,9 +11,11 @@ from api.models.customer import CustomerDetail, CustomerCreate, CustomerUpdate,
 from api.models.facility import FacilityDetail, FacilityCreate, FacilityUpdate, StorageUnitDetail
 from api.models.responses import PaginatedResponse, ErrorResponse
 from api.services.admin_service import AdminService
+from api.services.pagination import build_page
 from api.services.customer_service import CustomerService
 from api.services.facility_service import FacilityService
 from database.connection import db
+from data_ingestion.queue.rabbitmq_client import rabbitmq
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -381,8 +383,10 @@ async def update_system_config(
 async def get_ingestion_logs(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; pages by keyset instead of offset"),
     customer_id: Optional[UUID] = Query(None, description="Filter by customer ID"),
-    status: Optional[str] = Query(None, description="Filter by status (success, failure)"),
+    # Named apart from fastapi.status, which the handler uses for its error codes
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by status (success, failure)"),
     start_date: Optional[datetime] = Query(None, description="Filter by start date"),
     end_date: Optional[datetime] = Query(None, description="Filter by end date"),
     admin: dict = Depends(get_admin_user)
@@ -394,19 +398,14 @@ async def get_ingestion_logs(
     """
     try:
         logs, total = await AdminService.get_ingestion_logs(
-            limit, offset, customer_id, status, start_date, end_date
+            limit, offset, customer_id, status_filter, start_date, end_date, cursor=cursor
         )
         
-        
-        page = (offset // limit) + 1 if limit > 0 else 1
-        pages = (total + limit - 1) // limit if limit > 0 else 1
-        
-        return PaginatedResponse(
-            items=logs,
-            total=total,
-            page=page,
-            page_size=limit,
-            pages=pages
+        return build_page(logs, total, limit, offset, cursor, position_key='start_time')
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
         logger.error(f"Error in get_ingestion_logs: {str(e)}")
@@ -414,4 +413,92 @@ async def get_ingestion_logs(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving ingestion logs: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get(
+    "/admin/ingestion/dead-letters",
+    response_model=Dict[str, Any],
+    summary="[Admin] Inspect dead-lettered events",
+    description="Look at events that exhausted their retries without removing them (admin only)",
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        403: {"model": ErrorResponse, "description": "Forbidden"},
+    }
+)
+async def inspect_dead_letters(
+    limit: int = Query(100, ge=1, le=1000),
+    admin: dict = Depends(get_admin_user)
+):
+    """
+    Inspect dead-lettered events.
+    
+    Only accessible to admin users. Returns the queue depth and the oldest events with their last error.
+    """
+    try:
+        return await rabbitmq.inspect_dead_letters(limit=limit)
+    except Exception as e:
+        logger.error(f"Error in inspect_dead_letters: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error inspecting dead-lettered events: {str(e)}"
+        )
+
+@router.post(
+    "/admin/ingestion/dead-letters/replay",
+    response_model=dict,
+    summary="[Admin] Replay dead-lettered events",
+    description="Publish dead-lettered events back to the ingestion queue (admin only)",
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        403: {"model": ErrorResponse, "description": "Forbidden"},
+    }
+)
+async def replay_dead_letters(
+    limit: int = Query(1000, ge=1, le=100000),
+    admin: dict = Depends(get_admin_user)
+):
+    """
+    Replay dead-lettered events.
+    
+    Only accessible to admin users. The oldest `limit` events are republished with a fresh retry budget.
+    """
+    try:
+        replayed = await rabbitmq.replay_dead_letters(limit=limit)
+        return {"replayed": replayed}
+    except Exception as e:
+        logger.error(f"Error in replay_dead_letters: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error replaying dead-lettered events: {str(e)}"
+        )
+
+@router.delete(
+    "/admin/ingestion/dead-letters",
+    response_model=dict,
+    summary="[Admin] Purge dead-lettered events",
+    description="Drop every dead-lettered event (admin only)",
+    responses={
+        401: {"model": ErrorResponse, "description": "Unauthorized"},
+        403: {"model": ErrorResponse, "description": "Forbidden"},
+    }
+)
+async def purge_dead_letters(
+    admin: dict = Depends(get_admin_user)
+):
+    """
+    Purge dead-lettered events.
+    
+    Only accessible to admin users. This cannot be undone.
+    """
+    try:
+        purged = await rabbitmq.purge_dead_letters()
+        return {"purged": purged}
+    except Exception as e:
+        logger.error(f"Error in purge_dead_letters: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error purging dead-lettered events: {str(e)}"
+        )
@@ -10,8 +10,10 @@ from api.auth.token_auth import get_current_customer, get_admin_user, check_read
 from api.models.temperature import TemperatureStats, AggregationResult
 from api.models.responses import ErrorResponse, PaginatedResponse
 from api.services.temperature_service import TemperatureService
+from api.services.pagination import page_clause, build_page
 from database.connection import db
 from database.connection import DatabaseConnection  
+from database.repositories.repositories import ReadingRollupRepository
 
 db_manager = DatabaseConnection() 
 
@@ -152,6 +154,7 @@ async def get_temperature_trends(
 async def get_alarm_history(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; pages by keyset instead of offset"),
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
     facility_id: Optional[UUID] = Query(None, description="Filter by facility ID"),
@@ -200,15 +203,12 @@ async def get_alarm_history(
             param_count += 1
         
         
-        sql_query += " ORDER BY tr.recorded_at DESC"
-        
-        
-        sql_query += f" LIMIT ${param_count} OFFSET ${param_count + 1}"
-        params.extend([limit, offset])
-        
-      
+        sql_query += page_clause(params, limit, offset, cursor)
+
         alarms = await db.fetch(sql_query, *params)
-        
+
+        if cursor:
+            return build_page(alarms, None, limit, cursor=cursor)
        
         count_query = """
             SELECT COUNT(*) as count
@@ -244,15 +244,11 @@ async def get_alarm_history(
         total = count_result['count'] if count_result else 0
         
         
-        page = (offset // limit) + 1 if limit > 0 else 1
-        pages = (total + limit - 1) // limit if limit > 0 else 1
-        
-        return PaginatedResponse(
-            items=alarms,
-            total=total,
-            page=page,
-            page_size=limit,
-            pages=pages
+        return build_page(alarms, total, limit, offset)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
         logger.error(f"Error in get_alarm_history: {str(e)}")
@@ -291,48 +287,69 @@ async def get_performance_metrics(
             start_date = end_date - timedelta(days=30)
         
       
-        uptime_query = """
-            WITH time_periods AS (
-                SELECT 
-                    generate_series(
-                        $1::timestamp, 
-                        $2::timestamp, 
-                        interval '1 hour'
-                    ) as hour
-            ),
-            readings_per_hour AS (
-                SELECT 
-                    date_trunc('hour', recorded_at) as hour,
-                    COUNT(*) as reading_count
-                FROM temperature_readings
-                WHERE customer_id = $3
-                AND recorded_at BETWEEN $1 AND $2
-                GROUP BY date_trunc('hour', recorded_at)
+        if ReadingRollupRepository.enabled:
+            # Uptime, quality and status come from the hourly and daily rollups
+            uptime_result, quality_result, status_result = await TemperatureService.get_rollup_performance(
+                customer['id'], start_date, end_date
             )
-            SELECT 
-                COUNT(rph.reading_count) as hours_with_readings,
-                COUNT(tp.hour) as total_hours,
-                ROUND((COUNT(rph.reading_count)::numeric / COUNT(tp.hour)::numeric * 100)::numeric, 2) as uptime_percentage
-            FROM time_periods tp
-            LEFT JOIN readings_per_hour rph ON tp.hour = rph.hour
-        """
+        else:
+            uptime_query = """
+                WITH time_periods AS (
+                    SELECT 
+                        generate_series(
+                            $1::timestamp, 
+                            $2::timestamp, 
+                            interval '1 hour'
+                        ) as hour
+                ),
+                readings_per_hour AS (
+                    SELECT 
+                        date_trunc('hour', recorded_at) as hour,
+                        COUNT(*) as reading_count
+                    FROM temperature_readings
+                    WHERE customer_id = $3
+                    AND recorded_at BETWEEN $1 AND $2
+                    GROUP BY date_trunc('hour', recorded_at)
+                )
+                SELECT 
+                    COUNT(rph.reading_count) as hours_with_readings,
+                    COUNT(tp.hour) as total_hours,
+                    ROUND((COUNT(rph.reading_count)::numeric / COUNT(tp.hour)::numeric * 100)::numeric, 2) as uptime_percentage
+                FROM time_periods tp
+                LEFT JOIN readings_per_hour rph ON tp.hour = rph.hour
+            """
         
-        uptime_result = await db.fetchrow(uptime_query, start_date, end_date, customer['id'])
+            uptime_result = await db.fetchrow(uptime_query, start_date, end_date, customer['id'])
         
         
-        quality_query = """
-            SELECT 
-                COUNT(*) as total_readings,
-                COUNT(CASE WHEN quality_score = 1 THEN 1 END) as good_readings,
-                ROUND((COUNT(CASE WHEN quality_score = 1 THEN 1 END)::numeric / COUNT(*)::numeric * 100)::numeric, 2) as quality_percentage
-            FROM temperature_readings
-            WHERE customer_id = $1
-            AND recorded_at BETWEEN $2 AND $3
-        """
+            quality_query = """
+                SELECT 
+                    COUNT(*) as total_readings,
+                    COUNT(CASE WHEN quality_score = 1 THEN 1 END) as good_readings,
+                    ROUND((COUNT(CASE WHEN quality_score = 1 THEN 1 END)::numeric / COUNT(*)::numeric * 100)::numeric, 2) as quality_percentage
+                FROM temperature_readings
+                WHERE customer_id = $1
+                AND recorded_at BETWEEN $2 AND $3
+            """
         
-        quality_result = await db.fetchrow(quality_query, customer['id'], start_date, end_date)
+            quality_result = await db.fetchrow(quality_query, customer['id'], start_date, end_date)
+
+            status_query = """
+                SELECT 
+                    equipment_status,
+                    COUNT(*) as count,
+                    ROUND((COUNT(*)::numeric / (SELECT COUNT(*) FROM temperature_readings WHERE customer_id = $1 AND recorded_at BETWEEN $2 AND $3)::numeric * 100)::numeric, 2) as percentage
+                FROM temperature_readings
+                WHERE customer_id = $1
+                AND recorded_at BETWEEN $2 AND $3
+                GROUP BY equipment_status
+                ORDER BY count DESC
+            """
         
+            status_result = await db.fetch(status_query, customer['id'], start_date, end_date)
+
         
+        # The mean distance from the set point needs every reading, so it stays on the raw table
         deviation_query = """
             WITH deviations AS (
                 SELECT 
@@ -355,21 +372,6 @@ async def get_performance_metrics(
         deviation_result = await db.fetchrow(deviation_query, customer['id'], start_date, end_date)
         
        
-        status_query = """
-            SELECT 
-                equipment_status,
-                COUNT(*) as count,
-                ROUND((COUNT(*)::numeric / (SELECT COUNT(*) FROM temperature_readings WHERE customer_id = $1 AND recorded_at BETWEEN $2 AND $3)::numeric * 100)::numeric, 2) as percentage
-            FROM temperature_readings
-            WHERE customer_id = $1
-            AND recorded_at BETWEEN $2 AND $3
-            GROUP BY equipment_status
-            ORDER BY count DESC
-        """
-        
-        status_result = await db.fetch(status_query, customer['id'], start_date, end_date)
-        
-      
         performance_metrics = {
             "uptime": {
                 "hours_with_readings": uptime_result['hours_with_readings'] if uptime_result else 0,
@@ -210,37 +210,15 @@ async def get_storage_unit(
     try:
         
         query = """
-            SELECT su.*, 
-                (
-                    SELECT tr.temperature 
-                    FROM temperature_readings tr 
-                    WHERE tr.storage_unit_id = su.id 
-                    ORDER BY tr.recorded_at DESC 
-                    LIMIT 1
-                ) as current_temperature,
-                (
-                    SELECT tr.temperature_unit 
-                    FROM temperature_readings tr 
-                    WHERE tr.storage_unit_id = su.id 
-                    ORDER BY tr.recorded_at DESC 
-                    LIMIT 1
-                ) as current_temperature_unit,
-                (
-                    SELECT tr.equipment_status 
-                    FROM temperature_readings tr 
-                    WHERE tr.storage_unit_id = su.id 
-                    ORDER BY tr.recorded_at DESC 
-                    LIMIT 1
-                ) as temperature_status,
-                (
-                    SELECT tr.recorded_at 
-                    FROM temperature_readings tr 
-                    WHERE tr.storage_unit_id = su.id 
-                    ORDER BY tr.recorded_at DESC 
-                    LIMIT 1
-                ) as last_reading_time
+            SELECT su.*,
+                ls.temperature as current_temperature,
+                ls.temperature_unit as current_temperature_unit,
+                ls.equipment_status as temperature_status,
+                ls.recorded_at as last_reading_time
             FROM storage_units su
             JOIN facilities f ON su.facility_id = f.id
+            -- Primary key lookup of the unit's latest reading
+            LEFT JOIN unit_latest_state ls ON ls.storage_unit_id = su.id
             WHERE su.id = $1 AND f.customer_id = $2
         """
         
@@ -13,7 +13,9 @@ from api.models.temperature import (
 )
 from api.models.responses import PaginatedResponse, ErrorResponse
 from api.services.temperature_service import TemperatureService
+from api.services.pagination import build_page
 from database.connection import DatabaseConnection  
+from database.partitions import TimestampOutOfRangeError
 
 
 db_manager = DatabaseConnection() 
@@ -40,6 +42,7 @@ async def get_db():
 async def get_temperature_readings(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; pages by keyset instead of offset"),
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
     min_temperature: Optional[float] = Query(None, description="Minimum temperature"),
@@ -59,6 +62,7 @@ async def get_temperature_readings(
         query = TemperatureQuery(
             limit=limit,
             offset=offset,
+            cursor=cursor,
             start_date=start_date,
             end_date=end_date,
             min_temperature=min_temperature,
@@ -71,15 +75,11 @@ async def get_temperature_readings(
         readings, total = await TemperatureService.get_readings(customer, query)
         
      
-        page = (offset // limit) + 1 if limit > 0 else 1
-        pages = (total + limit - 1) // limit if limit > 0 else 1
-        
-        return PaginatedResponse(
-            items=readings,
-            total=total,
-            page=page,
-            page_size=limit,
-            pages=pages
+        return build_page(readings, total, limit, offset, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
         logger.error(f"Error in get_temperature_readings: {str(e)}")
@@ -111,17 +111,16 @@ async def get_latest_temperature_readings(
     """
     try:
         query = """
-            WITH latest_readings AS (
-                SELECT DISTINCT ON (storage_unit_id) *
-                FROM temperature_readings
-                WHERE customer_id = $1
-                ORDER BY storage_unit_id, recorded_at DESC
-            )
-            SELECT lr.*, f.name as facility_name, su.name as unit_name
-            FROM latest_readings lr
-            JOIN facilities f ON lr.facility_id = f.id
-            JOIN storage_units su ON lr.storage_unit_id = su.id
-            ORDER BY lr.recorded_at DESC
+            SELECT 
+                ls.reading_id as id, ls.customer_id, ls.facility_id, ls.storage_unit_id,
+                ls.temperature, ls.temperature_unit, ls.recorded_at, ls.sensor_id,
+                ls.quality_score, ls.equipment_status, ls.reading_created_at as created_at,
+                f.name as facility_name, su.name as unit_name
+            FROM unit_latest_state ls
+            JOIN facilities f ON ls.facility_id = f.id
+            JOIN storage_units su ON ls.storage_unit_id = su.id
+            WHERE ls.customer_id = $1
+            ORDER BY ls.recorded_at DESC
             LIMIT $2
         """
         
@@ -150,6 +149,7 @@ async def get_facility_temperature_readings(
     facility_id: UUID = Path(..., description="Facility ID"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; pages by keyset instead of offset"),
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
     min_temperature: Optional[float] = Query(None, description="Minimum temperature"),
@@ -169,6 +169,7 @@ async def get_facility_temperature_readings(
         query = TemperatureQuery(
             limit=limit,
             offset=offset,
+            cursor=cursor,
             start_date=start_date,
             end_date=end_date,
             min_temperature=min_temperature,
@@ -196,18 +197,14 @@ async def get_facility_temperature_readings(
                 )
         
      
-        page = (offset // limit) + 1 if limit > 0 else 1
-        pages = (total + limit - 1) // limit if limit > 0 else 1
-        
-        return PaginatedResponse(
-            items=readings,
-            total=total,
-            page=page,
-            page_size=limit,
-            pages=pages
-        )
+        return build_page(readings, total, limit, offset, cursor)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error in get_facility_temperature_readings: {str(e)}")
         logger.error(traceback.format_exc())
@@ -231,6 +228,7 @@ async def get_unit_temperature_readings(
     unit_id: UUID = Path(..., description="Storage unit ID"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; pages by keyset instead of offset"),
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
     min_temperature: Optional[float] = Query(None, description="Minimum temperature"),
@@ -264,6 +262,7 @@ async def get_unit_temperature_readings(
         query = TemperatureQuery(
             limit=limit,
             offset=offset,
+            cursor=cursor,
             start_date=start_date,
             end_date=end_date,
             min_temperature=min_temperature,
@@ -278,18 +277,14 @@ async def get_unit_temperature_readings(
         )
         
 
-        page = (offset // limit) + 1 if limit > 0 else 1
-        pages = (total + limit - 1) // limit if limit > 0 else 1
-        
-        return PaginatedResponse(
-            items=readings,
-            total=total,
-            page=page,
-            page_size=limit,
-            pages=pages
-        )
+        return build_page(readings, total, limit, offset, cursor)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error in get_unit_temperature_readings: {str(e)}")
         logger.error(traceback.format_exc())
@@ -323,6 +318,11 @@ async def create_temperature_reading(
     try:
         result = await TemperatureService.create_reading(customer['id'], reading)
         return result
+    except TimestampOutOfRangeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -423,6 +423,7 @@ async def aggregate_temperature_data(
 async def admin_get_temperature_readings(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; pages by keyset instead of offset"),
     start_date: Optional[datetime] = Query(None, description="Start date"),
     end_date: Optional[datetime] = Query(None, description="End date"),
     min_temperature: Optional[float] = Query(None, description="Minimum temperature"),
@@ -443,6 +444,7 @@ async def admin_get_temperature_readings(
         query = TemperatureQuery(
             limit=limit,
             offset=offset,
+            cursor=cursor,
             start_date=start_date,
             end_date=end_date,
             min_temperature=min_temperature,
@@ -457,15 +459,11 @@ async def admin_get_temperature_readings(
         )
         
        
-        page = (offset // limit) + 1 if limit > 0 else 1
-        pages = (total + limit - 1) // limit if limit > 0 else 1
-        
-        return PaginatedResponse(
-            items=readings,
-            total=total,
-            page=page,
-            page_size=limit,
-            pages=pages
+        return build_page(readings, total, limit, offset, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
         logger.error(f"Error in admin_get_temperature_readings: {str(e)}")
@@ -10,7 +10,8 @@ class ErrorResponse(BaseModel):
     
 class PaginatedResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
-    page: int
+    total: Optional[int] = None  # Not counted for cursor pages
+    page: Optional[int] = None
     page_size: int
-    pages: int
\ No newline at end of file
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page
\ No newline at end of file
@@ -8,6 +8,7 @@ from fastapi import Query
 class TemperatureQuery(BaseModel):
     limit: int = 100
     offset: int = 0
+    cursor: Optional[str] = None  # Keyset cursor from a previous page; replaces offset
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     min_temperature: Optional[float] = None
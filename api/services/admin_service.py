@@ -6,6 +6,7 @@ import hashlib
 import secrets
 from datetime import datetime 
 from database.connection import db
+from api.services.pagination import page_clause
 
 logger = logging.getLogger(__name__)
 
@@ -27,9 +28,9 @@ class AdminService:
                 ) as unit_count,
                 (SELECT COUNT(*) FROM temperature_readings tr WHERE tr.customer_id = c.id) as reading_count,
                 (
-                    SELECT MAX(tr.recorded_at) 
-                    FROM temperature_readings tr 
-                    WHERE tr.customer_id = c.id
+                    SELECT MAX(ls.recorded_at) 
+                    FROM unit_latest_state ls 
+                    WHERE ls.customer_id = c.id
                 ) as last_reading_time
             FROM customers c
             ORDER BY c.created_at DESC
@@ -62,9 +63,9 @@ class AdminService:
                 ) as unit_count,
                 (SELECT COUNT(*) FROM temperature_readings tr WHERE tr.customer_id = c.id) as reading_count,
                 (
-                    SELECT MAX(tr.recorded_at) 
-                    FROM temperature_readings tr 
-                    WHERE tr.customer_id = c.id
+                    SELECT MAX(ls.recorded_at) 
+                    FROM unit_latest_state ls 
+                    WHERE ls.customer_id = c.id
                 ) as last_reading_time
             FROM customers c
             WHERE c.id = $1
@@ -238,9 +239,13 @@ class AdminService:
                                  customer_id: Optional[UUID] = None, 
                                  status: Optional[str] = None,
                                  start_date: Optional[datetime] = None,
-                                 end_date: Optional[datetime] = None):
+                                 end_date: Optional[datetime] = None,
+                                 cursor: Optional[str] = None):
         """
         Get ingestion logs.
+
+        With a cursor the page starts after the cursor's log entry and the
+        total is not counted (None).
         """
       
         sql_query = """
@@ -273,11 +278,12 @@ class AdminService:
             params.append(end_date)
             param_count += 1
         
-        sql_query += " ORDER BY il.start_time DESC LIMIT $" + str(param_count) + " OFFSET $" + str(param_count + 1)
-        params.extend([limit, offset])
-        
-    
+        sql_query += page_clause(params, limit, offset, cursor, "il.start_time", "il.id")
+
         logs = await db.fetch(sql_query, *params)
+
+        if cursor:
+            return logs, None
         
         
         count_query = """
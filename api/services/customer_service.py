@@ -59,7 +59,7 @@ class CustomerService:
 
         last_reading_query = """
             SELECT MAX(recorded_at) as last_time
-            FROM temperature_readings
+            FROM unit_latest_state
             WHERE customer_id = $1
         """
         last_reading_time = await db.fetchval(last_reading_query, str(customer_id))
@@ -0,0 +1,128 @@
+# api/services/pagination.py
+"""
+OFFSET and keyset (cursor) paging for the listing endpoints
+
+Listings are ordered by (timestamp DESC, id DESC). A cursor page seeks
+straight past the previous page's last row, so its cost does not grow
+with depth, and it is not counted: COUNT(*) would rescan every matching
+row, the cost cursor pages exist to avoid, so total/page/pages are None.
+"""
+import json
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from api.models.responses import PaginatedResponse
+
+
+def encode_cursor(position: datetime, row_id: Any) -> str:
+    """
+    Opaque cursor for the row a page ended on
+
+    Args:
+        position: Sort timestamp of the row (recorded_at, start_time, ...)
+        row_id: ID of the row, breaking ties between equal timestamps
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps({'t': position.isoformat(), 'id': row_id if isinstance(row_id, int) else str(row_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Any]:
+    """
+    Position and row ID encoded in a cursor
+
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload['t']), payload['id']
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_condition(position_column: str, id_column: str, param_count: int) -> str:
+    """
+    WHERE fragment selecting the rows after a cursor in (position DESC, id DESC) order
+
+    The plain bound on the position column lets the (..., position DESC)
+    indexes start the scan at the cursor; the row comparison then skips
+    the rows of that timestamp already returned.
+    """
+    return (f" AND {position_column} <= ${param_count}"
+            f" AND ({position_column}, {id_column}) < (${param_count}, ${param_count + 1})")
+
+
+def next_cursor(rows: List[Any], limit: int, position_key: str = 'recorded_at') -> Optional[str]:
+    """Cursor for the page after `rows`, or None if it was the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last[position_key], last['id'])
+
+
+def page_clause(
+    params: List[Any],
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    position_column: str = "tr.recorded_at",
+    id_column: str = "tr.id",
+) -> str:
+    """
+    Cursor condition, ORDER BY and LIMIT/OFFSET that close a listing query
+
+    Args:
+        params: Parameters of the query so far; the clause's are appended
+        limit: Page size
+        offset: Rows to skip when there is no cursor
+        cursor: next_cursor of the previous page
+        position_column: Timestamp column the listing is ordered by
+        id_column: ID column breaking ties between equal timestamps
+
+    Returns:
+        SQL to append after the WHERE conditions
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    clause = ""
+    if cursor:
+        position, row_id = decode_cursor(cursor)
+        clause += keyset_condition(position_column, id_column, len(params) + 1)
+        params.extend([position, row_id])
+
+    clause += f" ORDER BY {position_column} DESC, {id_column} DESC LIMIT ${len(params) + 1}"
+    params.append(limit)
+    if not cursor:
+        clause += f" OFFSET ${len(params) + 1}"
+        params.append(offset)
+    return clause
+
+
+def build_page(
+    items: List[Any],
+    total: Optional[int],
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    position_key: str = 'recorded_at',
+) -> PaginatedResponse:
+    """Paginated response for one page of a listing"""
+    if cursor:
+        page = pages = None
+    else:
+        page = (offset // limit) + 1 if limit > 0 else 1
+        pages = (total + limit - 1) // limit if limit > 0 else 1
+
+    return PaginatedResponse(
+        items=items,
+        total=total,
+        page=page,
+        page_size=limit,
+        pages=pages,
+        next_cursor=next_cursor(items, limit, position_key)
+    )
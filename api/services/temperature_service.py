@@ -4,6 +4,9 @@ from datetime import datetime, timedelta
 from uuid import UUID
 import logging
 from database.connection import db
+from database.partitions import TimestampOutOfRangeError, partition_manager
+from database.repositories.repositories import TemperatureReadingRepository, ReadingRollupRepository
+from api.services.pagination import page_clause
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +15,9 @@ class TemperatureService:
     async def get_readings(cls, customer: Dict, query, facility_id=None, storage_unit_id=None):
         """
         Get temperature readings based on the query parameters.
+
+        With `query.cursor` the page starts after the cursor's reading and
+        the total is not counted (None).
         """
    
         sql_query = """
@@ -70,14 +76,12 @@ class TemperatureService:
             params.append(query.sensor_id)
             param_count += 1
 
-        sql_query += " ORDER BY tr.recorded_at DESC"
-        
-    
-        sql_query += f" LIMIT ${param_count} OFFSET ${param_count + 1}"
-        params.extend([query.limit, query.offset])
-        
- 
+        sql_query += page_clause(params, query.limit, query.offset, query.cursor)
+
         readings = await db.fetch(sql_query, *params)
+
+        if query.cursor:
+            return readings, None
         
         # Get total count using the same filters
         count_query = """
@@ -143,7 +147,7 @@ class TemperatureService:
     async def get_admin_readings(cls, query, customer_id=None, facility_id=None, storage_unit_id=None):
         """
         Get temperature readings for admin users.
-        This allows viewing data across all customers.
+        This allows viewing data across all customers, paged like get_readings.
         """
         # Build the query
         sql_query = """
@@ -209,14 +213,12 @@ class TemperatureService:
             param_count += 1
         
         
-        sql_query += " ORDER BY tr.recorded_at DESC"
-        
-      
-        sql_query += f" LIMIT ${param_count} OFFSET ${param_count + 1}"
-        params.extend([query.limit, query.offset])
-        
-      
+        sql_query += page_clause(params, query.limit, query.offset, query.cursor)
+
         readings = await db.fetch(sql_query, *params)
+
+        if query.cursor:
+            return readings, None
         
  
         count_query = """
@@ -287,7 +289,15 @@ class TemperatureService:
     async def create_reading(cls, customer_id: UUID, reading_data):
         """
         Create a new temperature reading.
+
+        Raises:
+            TimestampOutOfRangeError: If recorded_at is too old or too far ahead
+            ValueError: If the storage unit does not belong to the customer
         """
+        if not partition_manager.accepts(reading_data.recorded_at):
+            raise TimestampOutOfRangeError(
+                f"recorded_at {reading_data.recorded_at.isoformat()} is outside the accepted window"
+            )
 
         query = """
             SELECT su.id
@@ -315,11 +325,11 @@ class TemperatureService:
                 customer_id, facility_id, storage_unit_id, temperature, temperature_unit,
                 recorded_at, sensor_id, quality_score, equipment_status, created_at
             ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, NOW())
-            RETURNING id, created_at
         """
+        # Also updates the unit's latest state and the rollups
+        insert_query = TemperatureReadingRepository.wrap_insert(insert_query, select="id, created_at")
         
-        result = await db.fetchrow(
-            insert_query,
+        insert_args = (
             str(customer_id),
             str(facility_id),
             str(reading_data.storage_unit_id),
@@ -330,6 +340,14 @@ class TemperatureService:
             reading_data.quality_score,
             reading_data.equipment_status
         )
+        try:
+            result = await db.fetchrow(insert_query, *insert_args)
+        except Exception as e:
+            if not partition_manager.is_missing_partition_error(e):
+                raise
+            # A reading outside the pre-created partitions, e.g. backdated
+            await partition_manager.ensure_periods([reading_data.recorded_at])
+            result = await db.fetchrow(insert_query, *insert_args)
         
 
         reading = {
@@ -415,23 +433,69 @@ class TemperatureService:
                 raise ValueError(f"Invalid aggregation parameter: {agg}. Valid values are {valid_aggregations}")
         
 
+        levels = ReadingRollupRepository.levels_for(aggregation_params.group_by)
+        if levels:
+            results = await cls._fetch_rollup_aggregation(customer_id, aggregation_params, levels)
+        else:
+            results = await cls._fetch_raw_aggregation(customer_id, aggregation_params)
+        
+
+        aggregated_results = []
+        for row in results:
+            group_key = {}
+            metrics = {}
+            
+
+            for group in aggregation_params.group_by:
+                if group == 'hour':
+                    group_key['hour'] = row.get('hour')
+                elif group == 'day':
+                    group_key['day'] = row.get('day')
+                elif group == 'week':
+                    group_key['week'] = row.get('week')
+                elif group == 'month':
+                    group_key['month'] = row.get('month')
+                elif group == 'facility':
+                    group_key['facility_id'] = row.get('facility_id')
+                    group_key['facility_name'] = row.get('facility_name')
+                elif group == 'unit':
+                    group_key['storage_unit_id'] = row.get('storage_unit_id')
+                    group_key['unit_name'] = row.get('unit_name')
+                elif group == 'sensor':
+                    group_key['sensor_id'] = row.get('sensor_id')
+            
+
+            for agg in aggregation_params.aggregations:
+                if agg == 'avg':
+                    metrics['avg_temperature'] = row.get('avg_temperature')
+                elif agg == 'min':
+                    metrics['min_temperature'] = row.get('min_temperature')
+                elif agg == 'max':
+                    metrics['max_temperature'] = row.get('max_temperature')
+                elif agg == 'count':
+                    metrics['reading_count'] = row.get('reading_count')
+            
+            aggregated_results.append({
+                'group_key': group_key,
+                'metrics': metrics
+            })
+        
+        return aggregated_results
+
+    @classmethod
+    async def _fetch_raw_aggregation(cls, customer_id: UUID, aggregation_params):
+        """
+        Aggregate by scanning the raw readings (needed for per-sensor groups).
+        """
         select_clause = []
         group_by_clause = []
         
      
         for group in aggregation_params.group_by:
-            if group == 'hour':
-                select_clause.append("DATE_TRUNC('hour', recorded_at) as hour")
-                group_by_clause.append("DATE_TRUNC('hour', recorded_at)")
-            elif group == 'day':
-                select_clause.append("DATE_TRUNC('day', recorded_at) as day")
-                group_by_clause.append("DATE_TRUNC('day', recorded_at)")
-            elif group == 'week':
-                select_clause.append("DATE_TRUNC('week', recorded_at) as week")
-                group_by_clause.append("DATE_TRUNC('week', recorded_at)")
-            elif group == 'month':
-                select_clause.append("DATE_TRUNC('month', recorded_at) as month")
-                group_by_clause.append("DATE_TRUNC('month', recorded_at)")
+            if group in ('hour', 'day', 'week', 'month'):
+                # UTC like the rollup path, whatever the session time zone
+                select_clause.append(f"DATE_TRUNC('{group}', tr.recorded_at, 'UTC') as {group}")
+                group_by_clause.append(f"DATE_TRUNC('{group}', tr.recorded_at, 'UTC')")
             elif group == 'facility':
                 select_clause.append("tr.facility_id, f.name as facility_name")
                 group_by_clause.extend(["tr.facility_id", "f.name"])
@@ -496,47 +560,127 @@ class TemperatureService:
                     break
         
    
-        results = await db.fetch(sql_query, *params)
-        
+        return await db.fetch(sql_query, *params)
 
-        aggregated_results = []
-        for row in results:
-            group_key = {}
-            metrics = {}
-            
-
-            for group in aggregation_params.group_by:
-                if group == 'hour':
-                    group_key['hour'] = row.get('hour')
-                elif group == 'day':
-                    group_key['day'] = row.get('day')
-                elif group == 'week':
-                    group_key['week'] = row.get('week')
-                elif group == 'month':
-                    group_key['month'] = row.get('month')
-                elif group == 'facility':
-                    group_key['facility_id'] = row.get('facility_id')
-                    group_key['facility_name'] = row.get('facility_name')
-                elif group == 'unit':
-                    group_key['storage_unit_id'] = row.get('storage_unit_id')
-                    group_key['unit_name'] = row.get('unit_name')
-                elif group == 'sensor':
-                    group_key['sensor_id'] = row.get('sensor_id')
-            
+    @classmethod
+    async def _fetch_rollup_aggregation(cls, customer_id: UUID, aggregation_params, levels: List[str]):
+        """
+        Aggregate from the reading rollups, coarsest first, with raw readings
+        only for the partial buckets at the edges of the time range.
+        """
+        filters = ["customer_id = $1"]
+        params = [str(customer_id)]
+        
+        if aggregation_params.facility_id:
+            params.append(str(aggregation_params.facility_id))
+            filters.append(f"facility_id = ${len(params)}")
+        
+        if aggregation_params.storage_unit_id:
+            params.append(str(aggregation_params.storage_unit_id))
+            filters.append(f"storage_unit_id = ${len(params)}")
+        
+        parts = ReadingRollupRepository.partials_sql(
+            levels, " AND ".join(filters), params,
+            aggregation_params.start_date, aggregation_params.end_date
+        )
+        
+        select_clause = []
+        group_by_clause = []
+        
+        for group in aggregation_params.group_by:
+            if group in ('hour', 'day', 'week', 'month'):
+                # Buckets are UTC, so the grouping is too
+                select_clause.append(f"DATE_TRUNC('{group}', p.bucket, 'UTC') as {group}")
+                group_by_clause.append(f"DATE_TRUNC('{group}', p.bucket, 'UTC')")
+            elif group == 'facility':
+                select_clause.append("p.facility_id, f.name as facility_name")
+                group_by_clause.extend(["p.facility_id", "f.name"])
+            elif group == 'unit':
+                select_clause.append("p.storage_unit_id, su.name as unit_name")
+                group_by_clause.extend(["p.storage_unit_id", "su.name"])
+        
+        for agg in aggregation_params.aggregations:
+            if agg == 'avg':
+                select_clause.append("SUM(p.temperature_sum) / NULLIF(SUM(p.reading_count), 0) as avg_temperature")
+            elif agg == 'min':
+                select_clause.append("MIN(p.temperature_min) as min_temperature")
+            elif agg == 'max':
+                select_clause.append("MAX(p.temperature_max) as max_temperature")
+            elif agg == 'count':
+                select_clause.append("SUM(p.reading_count)::bigint as reading_count")
+        
+        sql_query = f"""
+            WITH parts AS ({parts})
+            SELECT {', '.join(select_clause)}
+            FROM parts p
+            JOIN facilities f ON p.facility_id = f.id
+            JOIN storage_units su ON p.storage_unit_id = su.id
+        """
+        
+        if group_by_clause:
+            sql_query += f" GROUP BY {', '.join(group_by_clause)}"
+        
+        for g in ['hour', 'day', 'week', 'month']:
+            if g in aggregation_params.group_by:
+                sql_query += f" ORDER BY {g}"
+                break
+        
+        return await db.fetch(sql_query, *params)
 
-            for agg in aggregation_params.aggregations:
-                if agg == 'avg':
-                    metrics['avg_temperature'] = row.get('avg_temperature')
-                elif agg == 'min':
-                    metrics['min_temperature'] = row.get('min_temperature')
-                elif agg == 'max':
-                    metrics['max_temperature'] = row.get('max_temperature')
-                elif agg == 'count':
-                    metrics['reading_count'] = row.get('reading_count')
-            
-            aggregated_results.append({
-                'group_key': group_key,
-                'metrics': metrics
-            })
+    @classmethod
+    async def get_rollup_performance(cls, customer_id: UUID, start_date: datetime, end_date: datetime):
+        """
+        Get uptime, data quality and equipment status figures from the reading rollups.
+        
+        Returns:
+            Tuple of the uptime row, the quality row and the status distribution
+            rows, shaped like the raw queries of /analytics/performance
+        """
+        # Uptime needs hour resolution; the other figures can start from days
+        params = [str(customer_id)]
+        hourly = ReadingRollupRepository.partials_sql(['hour'], "customer_id = $1", params, start_date, end_date)
+        params.extend([start_date, end_date])
+        uptime_query = f"""
+            WITH parts AS ({hourly}),
+            hours AS (
+                SELECT COUNT(*) as total_hours
+                FROM generate_series(${len(params) - 1}::timestamptz, ${len(params)}::timestamptz, interval '1 hour')
+            )
+            SELECT
+                LEAST((SELECT COUNT(DISTINCT DATE_TRUNC('hour', bucket, 'UTC')) FROM parts), total_hours) as hours_with_readings,
+                total_hours,
+                ROUND((LEAST((SELECT COUNT(DISTINCT DATE_TRUNC('hour', bucket, 'UTC')) FROM parts), total_hours)::numeric
+                       / NULLIF(total_hours, 0)::numeric * 100)::numeric, 2) as uptime_percentage
+            FROM hours
+        """
+        uptime_result = await db.fetchrow(uptime_query, *params)
+        
+        params = [str(customer_id)]
+        parts = ReadingRollupRepository.partials_sql(['day', 'hour'], "customer_id = $1", params, start_date, end_date)
+        quality_query = f"""
+            WITH parts AS ({parts})
+            SELECT
+                COALESCE(SUM(reading_count), 0)::bigint as total_readings,
+                COALESCE(SUM(good_quality_count), 0)::bigint as good_readings,
+                ROUND((SUM(good_quality_count)::numeric / NULLIF(SUM(reading_count), 0)::numeric * 100)::numeric, 2) as quality_percentage
+            FROM parts
+        """
+        quality_result = await db.fetchrow(quality_query, *params)
+        
+        status_query = f"""
+            WITH parts AS ({parts}),
+            statuses AS (
+                SELECT s.key as equipment_status, SUM(s.value::bigint) as count
+                FROM parts p, jsonb_each_text(p.status_counts) s
+                GROUP BY s.key
+            )
+            SELECT
+                equipment_status,
+                count,
+                ROUND((count::numeric / SUM(count) OVER () * 100)::numeric, 2) as percentage
+            FROM statuses
+            ORDER BY count DESC
+        """
+        status_result = await db.fetch(status_query, *params)
         
-        return aggregated_results
\ No newline at end of file
+        return uptime_result, quality_result, status_result
@@ -1,3 +1,5 @@
 
 from .api_collector import APICollector
 from .csv_collector import CSVCollector
+from .transport import CollectorTransport, collector_transport
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
@@ -1,12 +1,14 @@
 import logging
-import aiohttp
 import asyncio
 import json
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable
 
 from database.models.models import Customer, IngestionLog
 from database.repositories.repositories import IngestionLogRepository
+from data_ingestion.collectors.conditional import ConditionalRequestState
+from data_ingestion.collectors.circuit_breaker import CircuitOpenError
+from data_ingestion.collectors.transport import CollectorTransport, collector_transport
 
 logger = logging.getLogger(__name__)
 
@@ -14,26 +16,47 @@ logger = logging.getLogger(__name__)
 class APICollector:
     """Collector for API data sources"""
 
-    def __init__(self, timeout: int = 30):
-        self.timeout = timeout
-        self.session = None
+    def __init__(self, transport: Optional[CollectorTransport] = None):
+        self.transport = transport or collector_transport
+        self.conditional = ConditionalRequestState()
+
+    @property
+    def timeout(self) -> float:
+        """Read timeout of the shared transport, in seconds"""
+        return self.transport.read_timeout
+
+    @property
+    def session(self):
+        """The shared transport's HTTP session (None until initialized)"""
+        return self.transport.session
 
     async def initialize(self):
-        """Initialize HTTP session"""
-        if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        """Initialize the shared HTTP transport"""
+        await self.transport.initialize()
 
     async def close(self):
-        """Close HTTP session"""
-        if self.session and not self.session.closed:
-            await self.session.close()
+        """Close the shared HTTP transport"""
+        await self.transport.close()
 
-    async def collect(self, customer: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    async def collect(
+        self,
+        customer: Dict[str, Any],
+        since: Optional[datetime] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         """
         Collect data from customer API
         
+        The response's validators are only remembered once `on_batch` has
+        handled its readings. Otherwise a failed publish would be followed
+        by a 304 and the readings would not be fetched again until the
+        resource changed.
+        
         Args:
             customer: Customer data including API URL
+            since: High-water mark; only readings at or after it are requested
+            on_batch: Coroutine receiving the readings; when given, the
+                returned list is empty
             
         Returns:
             Tuple containing (list of readings, ingestion log data)
@@ -75,7 +98,15 @@ class APICollector:
         try:
             logger.info(f"Collecting data from API for customer {customer_code}: {api_url}")
             
-            async with self.session.get(api_url) as response:
+            params = {'since': since.isoformat()} if since else None
+            
+            headers = self.conditional.request_headers(customer_id)
+            
+            async with self.transport.get(customer_id, api_url, params=params, headers=headers) as response:
+                if response.status == 304:
+                    logger.info(f"API data for customer {customer_code} not modified since last fetch")
+                    return [], self.conditional.not_modified_log(log_data, datetime.now())
+                
                 if response.status != 200:
                     error_message = f"API request failed with status {response.status}: {await response.text()}"
                     logger.error(error_message)
@@ -91,21 +122,34 @@ class APICollector:
                 
                 # Extract readings
                 readings = data.get('readings', [])
+                received = len(readings)
+                
+                if on_batch:
+                    if readings:
+                        await on_batch(readings)
+                    readings = []
+                    # Only remember validators once the readings were handed off
+                    self.conditional.update(customer_id, response.headers)
                 
                 # Update log data
                 log_data.update({
-                    'status': 'success' if readings else 'warning',
-                    'records_processed': len(readings),
-                    'records_succeeded': len(readings),
+                    'status': 'success' if received else 'warning',
+                    'records_processed': received,
+                    'records_succeeded': received,
                     'end_time': datetime.now(),
-                    'error_message': None if readings else "API returned no readings"
+                    'error_message': None if received else "API returned no readings"
                 })
                 
-                logger.info(f"Successfully collected {len(readings)} readings from {customer_code}")
+                logger.info(f"Successfully collected {received} readings from {customer_code}")
                 return readings, log_data
                 
+        except CircuitOpenError as e:
+            # Endpoint is backing off; nothing was fetched, so nothing to log
+            logger.info(str(e))
+            return [], None
+            
         except asyncio.TimeoutError:
-            error_message = f"API request timed out after {self.timeout} seconds: {api_url}"
+            error_message = f"API request timed out: {api_url}"
             logger.error(error_message)
             
             log_data.update({
@@ -0,0 +1,144 @@
+import os
+import math
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised when a fetch is refused because the customer's circuit is open"""
+
+    def __init__(self, customer_id: Any, retry_in: float):
+        super().__init__(f"Circuit open for customer {customer_id}, next probe in {retry_in:.0f}s")
+        self.customer_id = customer_id
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker and latency tracker for one customer endpoint
+
+    Keeps a rolling window of fetch outcomes. After `failure_threshold`
+    consecutive failures the circuit opens and fetches are refused until the
+    backoff expires; then a single probe is let through. A failed probe
+    reopens the circuit with twice the backoff, a successful one closes it.
+
+    The window's p99 latency also drives the per-request deadline, so a
+    customer that normally answers in 200ms is not given 30s to hang.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        failure_threshold: int = int(os.getenv("COLLECTOR_BREAKER_FAILURES", "5")),
+        window_size: int = int(os.getenv("COLLECTOR_BREAKER_WINDOW", "50")),
+        base_backoff: float = float(os.getenv("COLLECTOR_BREAKER_BACKOFF", "30")),
+        max_backoff: float = float(os.getenv("COLLECTOR_BREAKER_MAX_BACKOFF", "1800")),
+        timeout_multiplier: float = float(os.getenv("COLLECTOR_TIMEOUT_MULTIPLIER", "3")),
+        min_timeout: float = float(os.getenv("COLLECTOR_MIN_TIMEOUT", "2")),
+        max_timeout: float = float(os.getenv("COLLECTOR_MAX_TIMEOUT", "120")),
+        min_samples: int = 10,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.backoff = base_backoff
+        self.open_until = 0.0
+        self._outcomes = deque(maxlen=window_size)   # True for success
+        self._latencies = deque(maxlen=window_size)  # Seconds, successes only
+
+    def available(self) -> bool:
+        """Whether a fetch would be let through now; does not change state"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() >= self.open_until
+        # Half open: the probe is still in flight
+        return False
+
+    def before_request(self, customer_id: Any = None):
+        """Claim permission for a fetch, raising CircuitOpenError if refused"""
+        if not self.available():
+            raise CircuitOpenError(customer_id, max(0.0, self.open_until - time.monotonic()))
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+
+    def record_success(self, latency: float):
+        """Record a successful fetch"""
+        self._outcomes.append(True)
+        self._latencies.append(latency)
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self.backoff = self.base_backoff
+
+    def record_failure(self):
+        """Record a failed fetch, opening the circuit if needed"""
+        self._outcomes.append(False)
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN:
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            self._open()
+        elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def abandon(self):
+        """Release a claimed probe that ended without an outcome (e.g. cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.open_until = time.monotonic()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.trips += 1
+        self.open_until = time.monotonic() + self.backoff
+
+    def success_rate(self) -> Optional[float]:
+        """Share of successful fetches in the window"""
+        if not self._outcomes:
+            return None
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency percentile of successful fetches in the window (nearest rank)"""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def timeout(self) -> Optional[float]:
+        """
+        Deadline for the next fetch
+
+        Returns:
+            A multiple of the observed p99 latency within the configured
+            bounds, or None (no deadline beyond the socket timeouts) until
+            enough samples are collected
+        """
+        if len(self._latencies) < self.min_samples:
+            return None
+        deadline = self.percentile(99) * self.timeout_multiplier
+        return min(self.max_timeout, max(self.min_timeout, deadline))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'trips': self.trips,
+            'consecutive_failures': self.consecutive_failures,
+            'success_rate': self.success_rate(),
+            'p50_seconds': self.percentile(50),
+            'p99_seconds': self.percentile(99),
+            'timeout_seconds': self.timeout(),
+            'retry_in_seconds': max(0.0, self.open_until - time.monotonic()) if self.state == self.OPEN else 0.0,
+        }
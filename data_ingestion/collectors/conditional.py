@@ -0,0 +1,42 @@
+import logging
+from typing import Dict, Any, Mapping
+
+logger = logging.getLogger(__name__)
+
+
+class ConditionalRequestState:
+    """Per-customer ETag / Last-Modified validators for conditional GETs"""
+
+    def __init__(self):
+        self.validators: Dict[str, Dict[str, str]] = {}
+
+    def request_headers(self, customer_id: Any) -> Dict[str, str]:
+        """Headers that let the server answer 304 when nothing changed"""
+        validators = self.validators.get(str(customer_id), {})
+        headers = {'Accept-Encoding': 'gzip, deflate'}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def update(self, customer_id: Any, response_headers: Mapping[str, str]):
+        """Remember the validators of a successful response"""
+        validators = {
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+        }
+        if validators['etag'] or validators['last_modified']:
+            self.validators[str(customer_id)] = validators
+        else:
+            self.validators.pop(str(customer_id), None)
+
+    @staticmethod
+    def not_modified_log(log_data: Dict[str, Any], end_time) -> Dict[str, Any]:
+        """Turn a pending ingestion log into a cheap 304 entry"""
+        log_data.update({
+            'status': 'not_modified',
+            'end_time': end_time,
+            'error_message': None
+        })
+        return log_data
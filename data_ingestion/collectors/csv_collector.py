@@ -1,45 +1,152 @@
 import logging
-import aiohttp
+import aiofiles
 import asyncio
+import codecs
 import csv
 import os
 import io
-from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable
 
 from database.models.models import Customer, IngestionLog
 from database.repositories.repositories import IngestionLogRepository
+from data_ingestion.collectors.conditional import ConditionalRequestState
+from data_ingestion.collectors.circuit_breaker import CircuitOpenError
+from data_ingestion.collectors.transport import CollectorTransport, collector_transport
 
 logger = logging.getLogger(__name__)
 
 
+class CSVStreamParser:
+    """Incrementally parse CSV bytes that arrive in arbitrary chunks"""
+
+    def __init__(self, encoding: str = 'utf-8-sig'):
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._pending = ''  # Text after the last complete record
+        self.header: Optional[List[str]] = None
+
+    @staticmethod
+    def _complete_length(text: str) -> int:
+        """Length of the prefix of `text` that ends with a complete record"""
+        # A newline ends a record only when it is outside a quoted field,
+        # i.e. when an even number of quotes precedes it
+        end = 0
+        position = 0
+        quotes = 0
+        for line in text.split('\n')[:-1]:
+            position += len(line) + 1
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                end = position
+        return end
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[Dict[str, Any]]:
+        """
+        Parse a chunk and return the rows it completed
+        
+        Args:
+            chunk: Next bytes of the file
+            final: True for the last call, flushing any unterminated record
+            
+        Returns:
+            Rows as dicts keyed by the header, like csv.DictReader
+        """
+        text = self._pending + self._decoder.decode(chunk, final=final)
+        end = len(text) if final else self._complete_length(text)
+        complete, self._pending = text[:end], text[end:]
+        if not complete:
+            return []
+        
+        rows = []
+        for values in csv.reader(io.StringIO(complete)):
+            if not values:
+                continue
+            if self.header is None:
+                self.header = values
+                continue
+            row = dict(zip(self.header, values))
+            # Missing trailing fields are None, extra fields are dropped (as with DictReader)
+            for key in self.header[len(values):]:
+                row[key] = None
+            rows.append(row)
+        return rows
+
+
 class CSVCollector:
     """Collector for CSV data sources"""
 
-    def __init__(self, timeout: int = 30, download_dir: str = "data/imported"):
-        self.timeout = timeout
-        self.session = None
+    def __init__(
+        self,
+        transport: Optional[CollectorTransport] = None,
+        download_dir: str = "data/imported",
+        chunk_size: int = 64 * 1024,
+        batch_size: int = int(os.getenv("CSV_BATCH_SIZE", "5000")),
+    ):
+        self.transport = transport or collector_transport
+        self.conditional = ConditionalRequestState()
         self.download_dir = download_dir
+        self.chunk_size = chunk_size  # Bytes read from the response at a time
+        self.batch_size = batch_size  # Rows handed downstream at a time
         
         # Ensure download directory exists
         os.makedirs(self.download_dir, exist_ok=True)
 
+    @property
+    def timeout(self) -> float:
+        """Read timeout of the shared transport, in seconds"""
+        return self.transport.read_timeout
+
+    @property
+    def session(self):
+        """The shared transport's HTTP session (None until initialized)"""
+        return self.transport.session
+
     async def initialize(self):
-        """Initialize HTTP session"""
-        if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        """Initialize the shared HTTP transport"""
+        await self.transport.initialize()
             
     async def close(self):
-        """Close HTTP session"""
-        if self.session and not self.session.closed:
-            await self.session.close()
+        """Close the shared HTTP transport"""
+        await self.transport.close()
 
-    async def collect(self, customer: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    @staticmethod
+    def is_before(row: Dict[str, Any], since: datetime) -> bool:
+        """Check whether a CSV row was recorded before the high-water mark"""
+        timestamp_str = row.get('timestamp') or row.get('recorded_at') or row.get('reading_time')
+        if not timestamp_str:
+            return False
+        
+        try:
+            timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+        except ValueError:
+            # Let the processor decide what to do with unparseable rows
+            return False
+        
+        # Naive timestamps are stored as UTC
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return timestamp < since
+
+    async def collect(
+        self,
+        customer: Dict[str, Any],
+        since: Optional[datetime] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
         """
         Collect data from customer CSV endpoint
         
+        The file is streamed: chunks are written to disk and parsed as they
+        arrive, so memory use does not depend on the file size when
+        `on_batch` is given.
+        
         Args:
             customer: Customer data including API URL
+            since: High-water mark; rows recorded before it are skipped
+            on_batch: Coroutine receiving parsed rows in batches of at most
+                `batch_size`; when given, the returned list is empty
             
         Returns:
             Tuple containing (list of readings, ingestion log data)
@@ -86,7 +193,15 @@ class CSVCollector:
         try:
             logger.info(f"Downloading CSV for customer {customer_code} from: {api_url}")
             
-            async with self.session.get(api_url) as response:
+            params = {'since': since.isoformat()} if since else None
+            
+            headers = self.conditional.request_headers(customer_id)
+            
+            async with self.transport.get(customer_id, api_url, params=params, headers=headers) as response:
+                if response.status == 304:
+                    logger.info(f"CSV data for customer {customer_code} not modified since last fetch")
+                    return [], self.conditional.not_modified_log(log_data, datetime.now())
+                
                 if response.status != 200:
                     error_message = f"CSV download failed with status {response.status}: {await response.text()}"
                     logger.error(error_message)
@@ -98,45 +213,77 @@ class CSVCollector:
                     })
                     return [], log_data
                 
-                # Read the response content
-                content = await response.read()
-                
-                # Save the file
-                with open(filepath, 'wb') as f:
-                    f.write(content)
-                
-                # Parse the CSV
                 readings = []
+                batch = []
+                parsed_rows = 0
                 failed_rows = 0
+                skipped_rows = 0
+                parser = CSVStreamParser()
+                
+                async def emit():
+                    nonlocal batch
+                    if not batch:
+                        return
+                    if on_batch:
+                        await on_batch(batch)
+                    else:
+                        readings.extend(batch)
+                    batch = []
                 
-                # Process the CSV content
-                csv_text = content.decode('utf-8-sig').splitlines()
-                csv_reader = csv.DictReader(csv_text)
+                def handle_rows(rows: List[Dict[str, Any]]):
+                    nonlocal parsed_rows, failed_rows, skipped_rows
+                    for row in rows:
+                        try:
+                            # Clean up row data (strip whitespace from keys and handle empty values)
+                            cleaned_row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+                            
+                            # Skip rows that were already committed by an earlier run
+                            if since and self.is_before(cleaned_row, since):
+                                skipped_rows += 1
+                                continue
+                            
+                            batch.append(cleaned_row)
+                            parsed_rows += 1
+                        except Exception as e:
+                            failed_rows += 1
+                            logger.warning(f"Failed to parse CSV row: {e}")
                 
-                for row in csv_reader:
-                    try:
-                        # Clean up row data (strip whitespace from keys and handle empty values)
-                        cleaned_row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
-                        readings.append(cleaned_row)
-                    except Exception as e:
-                        failed_rows += 1
-                        logger.warning(f"Failed to parse CSV row: {e}")
+                # Stream the body to disk and parse it as it arrives
+                async with aiofiles.open(filepath, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        await f.write(chunk)
+                        handle_rows(parser.feed(chunk))
+                        if len(batch) >= self.batch_size:
+                            await emit()
+                
+                handle_rows(parser.feed(b'', final=True))
+                await emit()
+                
+                # Only remember validators once the whole file was processed
+                self.conditional.update(customer_id, response.headers)
                 
                 # Update log data
                 log_data.update({
-                    'status': 'success' if readings else 'warning',
-                    'records_processed': len(readings) + failed_rows,
-                    'records_succeeded': len(readings),
+                    'status': 'success' if parsed_rows else 'warning',
+                    'records_processed': parsed_rows + failed_rows,
+                    'records_succeeded': parsed_rows,
                     'records_failed': failed_rows,
                     'end_time': datetime.now(),
-                    'error_message': None if readings else "CSV contained no valid readings"
+                    'error_message': None if parsed_rows else "CSV contained no valid readings"
                 })
                 
-                logger.info(f"Successfully parsed {len(readings)} readings from CSV for {customer_code}")
+                if skipped_rows:
+                    logger.info(f"Skipped {skipped_rows} CSV rows before watermark {since.isoformat()} for {customer_code}")
+                logger.info(f"Successfully parsed {parsed_rows} readings from CSV for {customer_code}")
                 return readings, log_data
                 
+        except CircuitOpenError as e:
+            # Endpoint is backing off; nothing was fetched, so nothing to log
+            logger.info(str(e))
+            return [], None
+            
         except asyncio.TimeoutError:
-            error_message = f"CSV download timed out after {self.timeout} seconds: {api_url}"
+            error_message = f"CSV download timed out: {api_url}"
             logger.error(error_message)
             
             log_data.update({
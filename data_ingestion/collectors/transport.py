@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+import logging
+import aiohttp
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
+
+from data_ingestion.collectors.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+class FetchStats:
+    """Latency and volume counters for the fetches of one customer"""
+
+    __slots__ = ('fetches', 'errors', 'bytes', 'total_seconds', 'last_seconds', 'max_seconds', 'last_status')
+
+    def __init__(self):
+        self.fetches = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_status: Optional[int] = None
+
+    def record(self, seconds: float, size: int, status: Optional[int], failed: bool = False):
+        """Add one finished fetch"""
+        self.fetches += 1
+        if failed or status is None or status >= 400:
+            self.errors += 1
+        self.bytes += size
+        self.total_seconds += seconds
+        self.last_seconds = seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_status = status
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'fetches': self.fetches,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'avg_seconds': self.total_seconds / self.fetches if self.fetches else 0.0,
+            'last_seconds': self.last_seconds,
+            'max_seconds': self.max_seconds,
+            'last_status': self.last_status,
+        }
+
+
+class CollectorTransport:
+    """
+    HTTP transport shared by all collectors
+
+    One `aiohttp.ClientSession` over a tuned `TCPConnector`: connections are
+    capped globally and per host and kept alive between polls, DNS answers
+    are cached, and connect and read timeouts are set separately so a slow
+    but steadily streaming download is not cut off by a total deadline.
+    A semaphore bounds how many customer fetches are in flight at once.
+
+    Every customer also has a `CircuitBreaker`: fetches to an endpoint that
+    keeps failing are refused until its backoff expires, and each request
+    gets a deadline for its response headers derived from that customer's
+    observed p99 time to headers. Only transport errors, timeouts and
+    error statuses count against the circuit; exceptions raised by the
+    caller while it processes the response pass through untouched.
+    """
+
+    def __init__(
+        self,
+        limit: int = int(os.getenv("COLLECTOR_MAX_CONNECTIONS", "200")),
+        limit_per_host: int = int(os.getenv("COLLECTOR_MAX_CONNECTIONS_PER_HOST", "8")),
+        max_concurrent_fetches: int = int(os.getenv("COLLECTOR_MAX_CONCURRENT_FETCHES", "200")),
+        connect_timeout: float = float(os.getenv("COLLECTOR_CONNECT_TIMEOUT", "5")),
+        read_timeout: float = float(os.getenv("COLLECTOR_READ_TIMEOUT", "30")),
+        keepalive_timeout: float = float(os.getenv("COLLECTOR_KEEPALIVE_TIMEOUT", "60")),
+        dns_cache_ttl: int = int(os.getenv("COLLECTOR_DNS_CACHE_TTL", "300")),
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.stats: Dict[str, FetchStats] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent_fetches)
+
+    async def initialize(self):
+        """Create the shared session if it is not open"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            # No total deadline; waiting for a pooled connection is not a timeout either
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            logger.info(f"Opened collector transport (limit={self.limit}, per host={self.limit_per_host})")
+
+    async def close(self):
+        """Close the shared session"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    def breaker(self, customer_id: Any) -> CircuitBreaker:
+        """The circuit breaker of a customer"""
+        key = str(customer_id)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker()
+        return breaker
+
+    @asynccontextmanager
+    async def get(self, customer_id: Any, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        GET a customer endpoint and record its latency (time to headers) and size
+
+        Args:
+            customer_id: Customer the metrics are recorded under
+            url: URL to fetch
+            **kwargs: Passed on to `ClientSession.get`
+
+        Yields:
+            The response; its body must be read inside the block
+        """
+        await self.initialize()
+        breaker = self.breaker(customer_id)
+
+        # Raises CircuitOpenError while the customer is backing off
+        breaker.before_request(customer_id)
+
+        async with self._semaphore:
+            start = time.monotonic()
+            latency = None
+            status = None
+            response = None
+            outcome = None  # Verdict on the endpoint; None when it gave no answer to judge
+            try:
+                try:
+                    # The p99 deadline covers the request up to the response
+                    # headers; the body streams under the socket read timeout only
+                    response = await asyncio.wait_for(self.session.get(url, **kwargs), breaker.timeout())
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    outcome = False
+                    raise
+                latency = time.monotonic() - start
+                status = response.status
+
+                try:
+                    yield response
+                    outcome = status < 400
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    # The body failed or stalled while being read
+                    outcome = False
+                    raise
+                finally:
+                    response.release()
+            finally:
+                if status is not None and status >= 400:
+                    outcome = False
+                previous_state = breaker.state
+                if outcome is True:
+                    breaker.record_success(latency)
+                elif outcome is False:
+                    breaker.record_failure()
+                else:
+                    # Cancelled, or the caller's own processing failed: no
+                    # verdict on the endpoint, but a claimed probe is released
+                    breaker.abandon()
+                if breaker.state != previous_state:
+                    logger.warning(f"Circuit for customer {customer_id} is now {breaker.state}")
+
+                # Body bytes read so far, after any decompression
+                size = getattr(response.content, 'total_bytes', 0) if response is not None else 0
+                self.stats.setdefault(str(customer_id), FetchStats()).record(
+                    latency if latency is not None else time.monotonic() - start, size, status, outcome is False
+                )
+
+    def get_stats(self, customer_id: Optional[Any] = None) -> Dict[str, Any]:
+        """Fetch and circuit metrics for one customer, or for every customer"""
+        if customer_id is not None:
+            stats = self.stats.get(str(customer_id)) or FetchStats()
+            return {**stats.to_dict(), 'circuit': self.breaker(customer_id).get_stats()}
+        return {customer: self.get_stats(customer) for customer in self.stats}
+
+
+# Transport shared by every collector in the process
+collector_transport = CollectorTransport()
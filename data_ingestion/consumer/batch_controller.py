@@ -0,0 +1,99 @@
+import os
+import time
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchController:
+    """
+    Chooses the consumer's batch size and flush interval
+
+    A reading waits for its batch to fill (about `batch_size / arrival_rate`)
+    and then for the insert (about `batch_size * cost_per_reading`). The
+    controller keeps smoothed estimates of both rates and picks the largest
+    batch whose expected end-to-end latency stays within `target_latency`,
+    so quiet periods flush quickly and busy periods use fewer, larger
+    transactions. The flush interval is whatever is left of the target once
+    the expected insert time is taken out.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = int(os.getenv("INGESTION_BATCH_SIZE", "100")),
+        max_batch_size: int = int(os.getenv("INGESTION_MAX_BATCH_SIZE", "5000")),
+        flush_interval: float = float(os.getenv("INGESTION_BATCH_TIMEOUT", "10")),
+        target_latency: float = float(os.getenv("INGESTION_TARGET_LATENCY", "2")),
+        min_interval: float = 0.1,
+        adaptive: bool = True,
+        smoothing: float = 0.3,
+        update_interval: float = 1.0,
+    ):
+        self.min_batch_size = batch_size
+        self.max_batch_size = max(max_batch_size, batch_size)
+        self.max_interval = flush_interval
+        self.min_interval = min(min_interval, flush_interval)
+        self.target_latency = target_latency
+        self.adaptive = adaptive
+        self.smoothing = smoothing  # Weight of the newest observation
+        self.update_interval = update_interval  # Seconds between setpoint updates
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.arrival_rate: Optional[float] = None      # Readings per second
+        self.cost_per_reading: Optional[float] = None  # Insert seconds per reading
+        self._arrived = 0
+        self._window_start = time.monotonic()
+
+    def _smooth(self, current: Optional[float], observed: float) -> float:
+        if current is None:
+            return observed
+        return current + self.smoothing * (observed - current)
+
+    def observe_arrivals(self, count: int):
+        """Count readings taken from the queue"""
+        self._arrived += count
+
+    def observe_flush(self, size: int, latency: float):
+        """Record a committed batch and update the setpoints if due"""
+        if size:
+            self.cost_per_reading = self._smooth(self.cost_per_reading, latency / size)
+
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if not self.adaptive or elapsed < self.update_interval:
+            return
+
+        self.arrival_rate = self._smooth(self.arrival_rate, self._arrived / elapsed)
+        self._arrived = 0
+        self._window_start = now
+        self._update_setpoints()
+
+    def _update_setpoints(self):
+        if not self.arrival_rate or self.cost_per_reading is None:
+            return
+
+        # Largest batch whose fill time plus insert time meets the target
+        size = self.target_latency / (1 / self.arrival_rate + self.cost_per_reading)
+        batch_size = int(min(self.max_batch_size, max(self.min_batch_size, size)))
+
+        # Wait no longer than the target leaves after the expected insert
+        interval = self.target_latency - batch_size * self.cost_per_reading
+        flush_interval = min(self.max_interval, max(self.min_interval, interval))
+
+        if batch_size != self.batch_size:
+            logger.debug(f"Batch size {self.batch_size} -> {batch_size}, "
+                         f"flush interval {self.flush_interval:.2f}s -> {flush_interval:.2f}s")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current setpoints and the estimates behind them"""
+        return {
+            'adaptive': self.adaptive,
+            'batch_size': self.batch_size,
+            'flush_interval_seconds': self.flush_interval,
+            'target_latency_seconds': self.target_latency,
+            'arrival_rate': self.arrival_rate,
+            'insert_seconds_per_reading': self.cost_per_reading,
+        }
@@ -1,26 +1,111 @@
+import os
+import math
+import time
 import logging
 import asyncio
 from typing import Dict, List, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
-from database.repositories.repositories import TemperatureReadingRepository
+import asyncpg
+
+from database.repositories.repositories import (
+    TemperatureReadingRepository, IngestionWatermarkRepository
+)
+from database.partitions import PartitionManager, TimestampOutOfRangeError, partition_manager
 from data_ingestion.processors.data_processor import DataProcessor
-from data_ingestion.queue.rabbitmq_client import rabbitmq
+from data_ingestion.queue import QueueBackend, ingestion_queue
+from data_ingestion.consumer.spool import WriteAheadSpool
+from data_ingestion.consumer.batch_controller import BatchController
 
 logger = logging.getLogger(__name__)
 
+# Positions of the fields the consumer reads back from insert records
+_CUSTOMER_ID = TemperatureReadingRepository.record_columns.index('customer_id')
+_RECORDED_AT = TemperatureReadingRepository.record_columns.index('recorded_at')
+_CREATED_AT = TemperatureReadingRepository.record_columns.index('created_at')
+
+# Failures of the database rather than of the batch; only these are spooled
+_UNAVAILABLE_ERRORS = (
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.exceptions.OperatorInterventionError,   # Shutting down, cannot connect now
+    asyncpg.exceptions.InsufficientResourcesError,  # Too many connections, disk full
+    OSError,
+    asyncio.TimeoutError,
+)
+
 
 class DatabaseConsumer:
     """Consumer that processes queue messages and writes to the database"""
 
-    def __init__(self, batch_size: int = 100, batch_timeout: int = 10):
-        self.processor = DataProcessor()
-        self.batch_size = batch_size
-        self.batch_timeout = batch_timeout
+    def __init__(
+        self,
+        batch_size: int = int(os.getenv("INGESTION_BATCH_SIZE", "100")),
+        batch_timeout: int = int(os.getenv("INGESTION_BATCH_TIMEOUT", "10")),
+        ack_after_commit: bool = os.getenv("INGESTION_ACK_AFTER_COMMIT", "true").lower() == "true",
+        prefetch_count: int = int(os.getenv("INGESTION_PREFETCH_COUNT", "1000")),
+        spool: Optional[WriteAheadSpool] = None,
+        use_spool: bool = os.getenv("INGESTION_SPOOL_ENABLED", "true").lower() == "true",
+        spool_max_backoff: float = float(os.getenv("INGESTION_SPOOL_MAX_BACKOFF", "60")),
+        max_in_flight: int = int(os.getenv("INGESTION_MAX_IN_FLIGHT", "4")),
+        max_batch_size: int = int(os.getenv("INGESTION_MAX_BATCH_SIZE", "5000")),
+        target_latency: float = float(os.getenv("INGESTION_TARGET_LATENCY", "2")),
+        adaptive_batching: bool = os.getenv("INGESTION_ADAPTIVE_BATCHING", "true").lower() == "true",
+        queue: Optional[QueueBackend] = None,
+        partitions: Optional[PartitionManager] = None,
+        readings_per_message: Optional[int] = None,
+    ):
+        self.queue = queue or ingestion_queue  # Where events are consumed from
+        self.partitions = partitions or partition_manager  # Creates partitions for backfilled readings
+        self.processor = DataProcessor(queue=self.queue)
+        self.queue_name = "temperature_readings"
+        # batch_size is the smallest batch and batch_timeout the longest wait;
+        # within those bounds the controller tunes both to the target latency
+        self.controller = BatchController(
+            batch_size=batch_size,
+            max_batch_size=max_batch_size if adaptive_batching else batch_size,
+            flush_interval=batch_timeout,
+            target_latency=target_latency,
+            adaptive=adaptive_batching
+        )
+        self.ack_after_commit = ack_after_commit
+        self.max_in_flight = max(1, max_in_flight)  # Batches being written concurrently
+        # Prefetch counts messages while batches count readings; publishers
+        # pack up to envelope_size readings into each message
+        self.readings_per_message = max(1, readings_per_message or self.processor.envelope_size)
+        # The prefetch window must cover the batches in flight plus the one being
+        # assembled, or flushes only happen on timeout
+        batch_messages = math.ceil(
+            self.controller.max_batch_size * (self.max_in_flight + 1) / self.readings_per_message
+        )
+        self.prefetch_count = max(prefetch_count, batch_messages)
+        # Ceiling on readings held unacknowledged in memory
+        self.max_unacked_readings = self.prefetch_count * self.readings_per_message
         self.pending_batch = []
+        self.pending_messages = []  # Unacknowledged messages backing pending_batch
         self.last_flush_time = datetime.now()
         self.is_running = False
         self.flush_task = None
+        # Batches that fail to commit are spooled to disk and replayed by the drainer
+        self.spool = spool if spool is not None else (WriteAheadSpool() if use_spool else None)
+        self.spool_max_backoff = spool_max_backoff
+        self.drain_task = None
+        self._flush_slots = asyncio.Semaphore(self.max_in_flight)
+        self._in_flight = set()
+        self._last_flush = None  # Most recent flush task; batches are settled in submission order
+        # Failed messages that could not be handed off and are still unacked:
+        # (delivery, error, whether it was being dead-lettered)
+        self._stranded = []
+
+    @property
+    def batch_size(self) -> int:
+        """Readings per batch, as currently set by the controller"""
+        return self.controller.batch_size
+
+    @property
+    def batch_timeout(self) -> float:
+        """Seconds a partial batch may wait, as currently set by the controller"""
+        return self.controller.flush_interval
 
     async def start(self):
         """Start the consumer"""
@@ -29,18 +114,24 @@ class DatabaseConsumer:
             
         self.is_running = True
         
-        # Connect to RabbitMQ
-        await rabbitmq.connect()
+        # Connect to the queue
+        await self.queue.connect()
         
         # Start the message consumer
-        await rabbitmq.consume(
+        await self.queue.consume(
             callback=self.handle_message,
-            queue_name="temperature_readings",
-            routing_key="temperature.#"
+            queue_name=self.queue_name,
+            routing_key="temperature.#",
+            manual_ack=self.ack_after_commit,
+            prefetch_count=self.prefetch_count if self.ack_after_commit else None
         )
         
         # Start the batch flushing task
         self.flush_task = asyncio.create_task(self.periodic_flush())
+        
+        # Replay anything spooled during an earlier outage
+        if self.spool is not None:
+            self.drain_task = asyncio.create_task(self.drain_spool())
         logger.info("Database consumer started")
 
     async def stop(self):
@@ -50,71 +141,373 @@ class DatabaseConsumer:
             
         self.is_running = False
         
-        # Cancel the flush task
-        if self.flush_task:
-            self.flush_task.cancel()
-            try:
-                await self.flush_task
-            except asyncio.CancelledError:
-                pass
+        # Cancel the flush and drain tasks
+        for task in (self.flush_task, self.drain_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
             
         # Flush any remaining items
         await self.flush_batch()
+        if self.spool is not None:
+            self.spool.close()
         
-        # Close RabbitMQ connection
-        await rabbitmq.close()
+        # Close the queue connection
+        await self.queue.close()
         
         logger.info("Database consumer stopped")
 
-    async def handle_message(self, message: Dict[str, Any]):
-        """Handle a message from the queue"""
+    async def handle_message(self, message: Dict[str, Any], delivery: Optional[Any] = None):
+        """
+        Handle a message from the queue
+        
+        Args:
+            message: The decoded event or batch envelope
+            delivery: The AMQP message when acking after commit; it is held
+                until the batch containing the reading has been written
+        """
         try:
-            # Map the event to a temperature reading
-            reading = self.processor.map_temperature_reading(message)
-            
-            # Add to the pending batch
-            self.pending_batch.append(reading)
-            
-            # Flush if batch size reached
-            if len(self.pending_batch) >= self.batch_size:
-                await self.flush_batch()
-                
+            # Map the event or envelope straight to insert records
+            readings = self.processor.map_message(message)
         except Exception as e:
             logger.error(f"Error handling message: {e}", exc_info=True)
+            # A message that cannot be mapped will never succeed, so do not retry it
+            if delivery is not None:
+                await self._dead_letter(delivery, e)
+            return
+        
+        # Readings too old or too far ahead would never get a partition; the
+        # message is dead-lettered whole so it can be inspected and replayed
+        now = datetime.now(timezone.utc)
+        rejected = [r for r in readings if not self.partitions.accepts(self._recorded_at(r), now)]
+        if rejected:
+            e = TimestampOutOfRangeError(
+                f"{len(rejected)} of {len(readings)} readings recorded outside the accepted window, "
+                f"e.g. {self._recorded_at(rejected[0]).isoformat()}"
+            )
+            logger.error(f"Rejecting message: {e}")
+            if delivery is not None:
+                await self._dead_letter(delivery, e)
+            return
+            
+        # Add to the pending batch
+        self.controller.observe_arrivals(len(readings))
+        self.pending_batch.extend(readings)
+        if delivery is not None:
+            self.pending_messages.append(delivery)
+        
+        # Hand the batch to the flush pipeline once it is full
+        if len(self.pending_batch) >= self.batch_size:
+            await self.submit_batch()
 
-    async def flush_batch(self):
-        """Flush the current batch to the database"""
+    async def submit_batch(self):
+        """
+        Start writing the current batch without waiting for it
+        
+        Up to `max_in_flight` batches are written concurrently, each on its own
+        pool connection, while the next one is assembled. When every slot is
+        busy this waits for one to free up, which stops consumption until
+        the database catches up.
+        """
         if not self.pending_batch:
             return
             
+        await self._flush_slots.acquire()
+        if not self.pending_batch:
+            # Another caller took the batch while this one waited for a slot
+            self._flush_slots.release()
+            return
+        
         batch_to_flush = self.pending_batch
+        messages_to_settle = self.pending_messages
         self.pending_batch = []
+        self.pending_messages = []
         self.last_flush_time = datetime.now()
         
+        task = asyncio.create_task(self._flush(batch_to_flush, messages_to_settle, self._last_flush))
+        self._last_flush = task
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def wait_for_flushes(self):
+        """Wait until every submitted batch has been written and settled"""
+        while self._in_flight:
+            await asyncio.wait(list(self._in_flight))
+
+    async def flush_batch(self):
+        """Flush the current batch to the database and wait for all writes"""
+        await self.submit_batch()
+        await self.wait_for_flushes()
+
+    async def _flush(self, batch: List[Dict[str, Any]], messages: List[Any], previous: Optional[asyncio.Task]):
+        """Write one batch, then settle its messages after those of earlier batches"""
+        try:
+            committed, error = await self._write_batch(batch)
+            
+            # Acks use multiple=True, so they must not overtake an earlier batch
+            if previous is not None:
+                await asyncio.wait([previous])
+                
+            if messages:
+                await self._settle(messages, success=error is None, error=error)
+            elif error is not None and self.is_unavailable_error(error):
+                # Put items back in the batch for retry
+                self.pending_batch.extend(batch)
+            elif error is not None:
+                # Retrying a rejected batch cannot succeed and there is no message to dead-letter
+                await self._quarantine(batch, error)
+                
+            if committed:
+                await self._advance_watermarks(batch)
+        except Exception as e:
+            logger.error(f"Error in flush pipeline: {e}", exc_info=True)
+        finally:
+            self._flush_slots.release()
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        """
+        Write a batch to the database, or to the spool if the database is
+        unavailable
+        
+        A batch the database rejects (bad data, constraint violations) is
+        not spooled: it would block the spool, and everything queued
+        behind it, until it fills the disk. Its error is returned so its
+        messages go through retry and dead-lettering instead.
+        
+        Returns:
+            Tuple of (committed to the database, error if the batch was
+            neither committed nor spooled)
+        """
+        # While a backlog is spooled the database is assumed unhealthy; keep
+        # the backlog in order and leave the retries to the drainer
+        if self.spool is not None and len(self.spool):
+            if await self._spool_batch(batch):
+                return False, None
+        
         try:
             # Insert batch into database
-            count = await TemperatureReadingRepository.create_batch(batch_to_flush)
+            started = time.monotonic()
+            count = await self._insert(batch)
+            self.controller.observe_flush(len(batch), time.monotonic() - started)
             logger.info(f"Inserted {count} temperature readings into database")
+            return True, None
             
         except Exception as e:
             logger.error(f"Error flushing batch to database: {e}", exc_info=True)
             
-            # Put items back in the batch for retry
-            self.pending_batch.extend(batch_to_flush)
+            # Once the batch is durable on disk the queue can let go of it
+            if self.spool is not None and self.is_unavailable_error(e) and await self._spool_batch(batch):
+                return False, None
+            return False, e
+
+    async def _insert(self, batch: List[Any]) -> int:
+        """Insert a batch, creating partitions first if it reaches outside the existing ones"""
+        try:
+            return await TemperatureReadingRepository.create_batch(batch)
+        except Exception as e:
+            if not self.partitions.is_missing_partition_error(e):
+                raise
+            
+        # Backfilled or early readings: add the partitions of the periods they
+        # fall in, never the span between them, and retry once
+        now = datetime.now(timezone.utc)
+        times = [self._recorded_at(reading) for reading in batch]
+        accepted = [t for t in times if self.partitions.accepts(t, now)]
+        if len(accepted) < len(times):
+            logger.warning(f"Not creating partitions for {len(times) - len(accepted)} readings "
+                           f"recorded outside the accepted window")
+        await self.partitions.ensure_periods(accepted)
+        return await TemperatureReadingRepository.create_batch(batch)
+
+    async def _advance_watermarks(self, batch: List[Dict[str, Any]]):
+        """Record how far each customer's data is committed for incremental polling"""
+        try:
+            await IngestionWatermarkRepository.advance(self._high_water_marks(batch, datetime.now(timezone.utc)))
+        except Exception as e:
+            logger.warning(f"Failed to advance ingestion watermarks: {e}")
+
+    @staticmethod
+    def is_unavailable_error(error: Exception) -> bool:
+        """Whether a write failed because the database could not be reached, not because of the batch"""
+        # Client-side encoding errors are InterfaceErrors too, but the batch is at fault
+        return isinstance(error, _UNAVAILABLE_ERRORS) and not isinstance(error, ValueError)
+
+    async def _quarantine(self, batch: List[Any], error: Exception) -> bool:
+        """Set aside a batch the database rejects, returning False if it could not be stored"""
+        if self.spool is None:
+            logger.error(f"Dropping {len(batch)} readings the database rejects: {error}")
+            return False
+        try:
+            path = await asyncio.to_thread(self.spool.quarantine, batch, error)
+        except Exception as e:
+            logger.error(f"Could not quarantine batch of {len(batch)} readings: {e}")
+            return False
+        logger.error(f"Quarantined {len(batch)} readings the database rejects to {path}: {error}")
+        return True
+
+    async def _spool_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        """Append a batch to the spool, returning False if it could not be stored"""
+        try:
+            await asyncio.to_thread(self.spool.append, batch)
+        except Exception as e:
+            logger.error(f"Could not spool batch of {len(batch)} readings: {e}")
+            return False
+        logger.warning(f"Spooled {len(batch)} readings to disk ({len(self.spool)} batches pending)")
+        return True
+
+    async def drain_spool(self):
+        """Replay spooled batches into the database, backing off while it is down"""
+        backoff = 1.0
+        while self.is_running:
+            try:
+                entry = await asyncio.to_thread(self.spool.peek)
+                if entry is None:
+                    await asyncio.sleep(1)
+                    continue
+                    
+                position, batch = entry
+                try:
+                    count = await self._insert(batch)
+                except Exception as e:
+                    # A rejected batch would be retried forever and hold up the rest
+                    if not self.is_unavailable_error(e) and await self._quarantine(batch, e):
+                        await asyncio.to_thread(self.spool.commit, position)
+                        continue
+                    logger.warning(f"Spool drain failed, retrying in {backoff:.0f}s: {e}")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.spool_max_backoff)
+                    continue
+                    
+                backoff = 1.0
+                await asyncio.to_thread(self.spool.commit, position)
+                logger.info(f"Replayed {count} spooled readings ({len(self.spool)} batches pending)")
+                await self._advance_watermarks(batch)
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error draining spool: {e}", exc_info=True)
+                await asyncio.sleep(backoff)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Consumer backlog figures"""
+        return {
+            'pending_readings': len(self.pending_batch),
+            'pending_messages': len(self.pending_messages),
+            'batches_in_flight': len(self._in_flight),
+            'prefetch_count': self.prefetch_count,
+            'max_unacked_readings': self.max_unacked_readings,
+            'batching': self.controller.get_stats(),
+            'spool': self.spool.get_stats() if self.spool is not None else None,
+        }
+
+    @staticmethod
+    def _recorded_at(reading: Any) -> datetime:
+        """Reading time of a record or mapped dict"""
+        recorded_at = reading[_RECORDED_AT] if isinstance(reading, tuple) else reading['recorded_at']
+        # Naive timestamps are stored as UTC
+        if recorded_at.tzinfo is None:
+            recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+        return recorded_at
+
+    @staticmethod
+    def _high_water_marks(batch: List[Any], committed_at: datetime) -> Dict[str, datetime]:
+        """
+        Latest recorded_at per customer in a batch of records or mapped dicts
+
+        Readings whose timestamp was missing or invalid got the mapping
+        clock as recorded_at (the same value as created_at) and are left
+        out, and marks are capped at the commit time, so neither a
+        substituted timestamp nor a device clock running ahead moves a
+        customer's `since` past readings that were never fetched.
+        """
+        marks = {}
+        for reading in batch:
+            if isinstance(reading, tuple):
+                customer_id, substituted = reading[_CUSTOMER_ID], reading[_RECORDED_AT] == reading[_CREATED_AT]
+            else:
+                customer_id, substituted = reading['customer_id'], reading['recorded_at'] == reading.get('created_at')
+            if substituted:
+                continue
+            recorded_at = min(DatabaseConsumer._recorded_at(reading), committed_at)
+            if customer_id not in marks or recorded_at > marks[customer_id]:
+                marks[customer_id] = recorded_at
+        return marks
+
+    async def _settle(self, messages: List[Any], success: bool, error: Optional[Exception] = None):
+        """Ack every message of a flushed batch, or send each one to retry"""
+        if not success:
+            # Each message carries its own retry count, so they are handled one by one
+            for message in messages:
+                if not await self.queue.retry_or_dead_letter(message, self.queue_name, error):
+                    self._stranded.append((message, error, False))
+            return
+            
+        await self._recover_stranded()
+        try:
+            if self._stranded:
+                # A bulk ack would also ack the message left for redelivery
+                for message in messages:
+                    await message.ack()
+            else:
+                # Delivery tags increase per channel, so acking the last message
+                # with multiple=True covers the whole batch
+                await messages[-1].ack(multiple=True)
+        except Exception as e:
+            # The channel was closed; the broker redelivers everything unacked
+            logger.warning(f"Could not settle {len(messages)} messages: {e}")
+
+    async def _dead_letter(self, delivery: Any, error: Exception):
+        """Dead-letter a delivery, remembering it if it is left unacked"""
+        if not await self.queue.dead_letter(delivery, self.queue_name, error):
+            # A later bulk ack would silently ack it, losing the message
+            self._stranded.append((delivery, error, True))
+
+    async def _recover_stranded(self):
+        """
+        Hand stranded deliveries off again, and forget those whose channel
+        has closed, since the broker redelivers them on the new one
+        
+        Once none are left, batches go back to a single bulk ack.
+        """
+        stranded, self._stranded = self._stranded, []
+        for delivery, error, dead_letter in stranded:
+            if self._channel_closed(delivery):
+                continue
+            if dead_letter:
+                settled = await self.queue.dead_letter(delivery, self.queue_name, error)
+            else:
+                settled = await self.queue.retry_or_dead_letter(delivery, self.queue_name, error)
+            if not settled:
+                self._stranded.append((delivery, error, dead_letter))
+
+    @staticmethod
+    def _channel_closed(delivery: Any) -> bool:
+        """Whether the channel a delivery arrived on has closed"""
+        try:
+            channel = delivery.channel
+        except AttributeError:
+            return False  # In-process deliveries have no channel
+        except Exception:
+            return True   # aio-pika refuses to hand out a closed channel
+        return getattr(channel, 'is_closed', False) is True
 
     async def periodic_flush(self):
         """Periodically flush the batch if timeout is reached"""
         while self.is_running:
             try:
-                # Sleep for a bit
-                await asyncio.sleep(1)
+                # Check often enough to honour the shortest flush interval
+                await asyncio.sleep(min(1.0, self.batch_timeout / 2))
                 
                 # Check if timeout reached
                 now = datetime.now()
                 seconds_since_flush = (now - self.last_flush_time).total_seconds()
                 
                 if seconds_since_flush >= self.batch_timeout and self.pending_batch:
-                    await self.flush_batch()
+                    await self.submit_batch()
                     
             except asyncio.CancelledError:
                 break
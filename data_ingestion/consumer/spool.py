@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import struct
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple, Deque
+
+from database.repositories.repositories import TemperatureReadingRepository
+
+logger = logging.getLogger(__name__)
+
+# payload length, crc32 of the payload, append time (epoch seconds), reading count
+_RECORD_HEADER = struct.Struct("<IIdI")
+
+FSYNC_ALWAYS = "always"
+FSYNC_INTERVAL = "interval"
+FSYNC_NEVER = "never"
+
+
+class SpoolFullError(Exception):
+    """Raised when appending would take the spool past its size limit"""
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Cannot spool value of type {type(value).__name__}")
+
+
+class WriteAheadSpool:
+    """
+    Append-only on-disk spool for batches that could not be written to the
+    database
+
+    Batches are appended to numbered segment files as length-prefixed,
+    checksummed records. A checkpoint file records how far the spool has
+    been drained; segments behind it are deleted, and once everything is
+    drained the active segment is recycled, so disk use returns to zero
+    after an outage. A torn record at the tail (crash mid-append) is
+    truncated away when the spool is opened.
+
+    Batches the database rejects outright are moved to JSON files in the
+    `quarantine` subdirectory, with the error, for inspection and manual
+    replay.
+    """
+
+    def __init__(
+        self,
+        directory: str = os.getenv("INGESTION_SPOOL_DIR", "data/spool"),
+        segment_bytes: int = int(os.getenv("INGESTION_SPOOL_SEGMENT_BYTES", str(64 * 1024 * 1024))),
+        max_bytes: int = int(os.getenv("INGESTION_SPOOL_MAX_BYTES", str(10 * 1024 * 1024 * 1024))),
+        fsync: str = os.getenv("INGESTION_SPOOL_FSYNC", FSYNC_ALWAYS),
+        fsync_interval: float = 1.0,
+        datetime_fields: Tuple[str, ...] = ('recorded_at', 'created_at'),
+        record_columns: Tuple[str, ...] = TemperatureReadingRepository.record_columns,
+    ):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER):
+            raise ValueError(f"Unknown spool fsync policy: {fsync}")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.datetime_fields = datetime_fields
+        # Tuple records are stored as JSON arrays in `record_columns` order
+        self.datetime_positions = [record_columns.index(f) for f in datetime_fields if f in record_columns]
+        self._lock = threading.Lock()
+        # Undrained records: (segment, start offset, end offset, appended_at, reading count)
+        self._entries: Deque[Tuple[int, int, int, float, int]] = deque()
+        self._segments: List[int] = []
+        self._writer = None
+        self._write_segment = 0
+        self._write_offset = 0
+        self._last_fsync = 0.0
+        self._bytes = 0
+
+        self.quarantine_directory = os.path.join(directory, "quarantine")
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover()
+
+    # Paths
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:012d}.log")
+
+    @property
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.directory, "checkpoint.json")
+
+    # Recovery
+
+    def _recover(self):
+        """Rebuild the index of undrained records from the files on disk"""
+        segments = sorted(
+            int(name[len("segment-"):-len(".log")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".log")
+        )
+
+        checkpoint_segment, checkpoint_offset = 0, 0
+        if os.path.exists(self._checkpoint_path):
+            with open(self._checkpoint_path) as f:
+                checkpoint = json.load(f)
+            checkpoint_segment, checkpoint_offset = checkpoint['segment'], checkpoint['offset']
+
+        for segment in segments:
+            if segment < checkpoint_segment:
+                # Fully drained before the last shutdown
+                os.remove(self._segment_path(segment))
+                continue
+            start = checkpoint_offset if segment == checkpoint_segment else 0
+            self._scan_segment(segment, start)
+            self._segments.append(segment)
+
+        self._write_segment = self._segments[-1] if self._segments else max(checkpoint_segment, 1)
+        if not self._segments:
+            self._segments.append(self._write_segment)
+        self._write_offset = self._file_size(self._write_segment)
+        self._bytes = sum(end - start for _, start, end, _, _ in self._entries)
+
+        if self._entries:
+            logger.warning(f"Recovered spool with {len(self._entries)} undrained batches "
+                           f"({self._bytes} bytes) in {self.directory}")
+
+    def _file_size(self, segment: int) -> int:
+        path = self._segment_path(segment)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _scan_segment(self, segment: int, offset: int):
+        """Index the valid records of a segment, truncating a torn tail"""
+        path = self._segment_path(segment)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if not header:
+                    return
+                valid = len(header) == _RECORD_HEADER.size
+                if valid:
+                    length, crc, appended_at, count = _RECORD_HEADER.unpack(header)
+                    payload = f.read(length)
+                    valid = len(payload) == length and zlib.crc32(payload) == crc
+                if not valid:
+                    logger.warning(f"Truncating torn spool record in {path} at offset {offset}")
+                    break
+                end = offset + _RECORD_HEADER.size + length
+                self._entries.append((segment, offset, end, appended_at, count))
+                offset = end
+
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+
+    # Writing
+
+    def _open_writer(self):
+        if self._writer is None:
+            self._writer = open(self._segment_path(self._write_segment), 'ab')
+
+    def _roll_segment(self):
+        """Start a new active segment"""
+        if self._writer is not None:
+            self._sync(force=True)
+            self._writer.close()
+            self._writer = None
+        self._write_segment += 1
+        self._write_offset = 0
+        self._segments.append(self._write_segment)
+
+    def _sync(self, force: bool = False):
+        """Flush and fsync the active segment according to the policy"""
+        self._writer.flush()
+        if self.fsync == FSYNC_NEVER and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync == FSYNC_ALWAYS or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._writer.fileno())
+            self._last_fsync = now
+
+    def append(self, readings: List[Any]) -> None:
+        """
+        Durably append a batch of insert records or mapped reading dicts
+
+        Raises:
+            SpoolFullError: If the spool is at its size limit
+        """
+        payload = json.dumps(readings, default=_json_default, separators=(',', ':')).encode()
+        appended_at = time.time()
+        record = _RECORD_HEADER.pack(len(payload), zlib.crc32(payload), appended_at, len(readings)) + payload
+
+        with self._lock:
+            if self._bytes + len(record) > self.max_bytes:
+                raise SpoolFullError(f"Spool is full ({self._bytes} of {self.max_bytes} bytes)")
+            if self._write_offset and self._write_offset + len(record) > self.segment_bytes:
+                self._roll_segment()
+
+            self._open_writer()
+            self._writer.write(record)
+            self._sync()
+
+            start = self._write_offset
+            self._write_offset += len(record)
+            self._bytes += len(record)
+            self._entries.append((self._write_segment, start, self._write_offset, appended_at, len(readings)))
+
+    # Draining
+
+    def peek(self) -> Optional[Tuple[Tuple[int, int], List[Dict[str, Any]]]]:
+        """
+        Read the oldest undrained batch without removing it
+
+        Returns:
+            Tuple of (position to pass to `commit`, readings), or None if empty
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            segment, start, end, _, _ = self._entries[0]
+            if segment == self._write_segment and self._writer is not None:
+                self._writer.flush()
+
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(start + _RECORD_HEADER.size)
+            payload = f.read(end - start - _RECORD_HEADER.size)
+
+        readings = json.loads(payload)
+        for i, reading in enumerate(readings):
+            if isinstance(reading, list):
+                for position in self.datetime_positions:
+                    if isinstance(reading[position], str):
+                        reading[position] = datetime.fromisoformat(reading[position])
+                readings[i] = tuple(reading)
+                continue
+            for field in self.datetime_fields:
+                if isinstance(reading.get(field), str):
+                    reading[field] = datetime.fromisoformat(reading[field])
+        return (segment, end), readings
+
+    def commit(self, position: Tuple[int, int]) -> None:
+        """Mark the batch returned by `peek` as drained and compact the spool"""
+        with self._lock:
+            if not self._entries or self._entries[0][0] != position[0] or self._entries[0][2] != position[1]:
+                raise ValueError(f"Spool position {position} is not the oldest undrained batch")
+            segment, start, end, _, _ = self._entries.popleft()
+            self._bytes -= end - start
+
+            if not self._entries and segment == self._write_segment:
+                # Everything is drained: recycle the active segment
+                self._roll_segment()
+            self._write_checkpoint(*(self._entries[0][:2] if self._entries else (self._write_segment, 0)))
+
+            # Delete segments that are now entirely behind the checkpoint
+            oldest = self._entries[0][0] if self._entries else self._write_segment
+            while self._segments and self._segments[0] < oldest:
+                path = self._segment_path(self._segments.pop(0))
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def quarantine(self, readings: List[Any], error: Any) -> str:
+        """
+        Durably set aside a batch the database will not accept
+
+        Returns:
+            Path of the quarantine file
+        """
+        os.makedirs(self.quarantine_directory, exist_ok=True)
+        path = os.path.join(self.quarantine_directory, f"batch-{time.time_ns()}-{uuid.uuid4().hex[:8]}.json")
+        temporary = path + ".tmp"
+        with open(temporary, 'w') as f:
+            json.dump({
+                'error': str(error)[:1000],
+                'quarantined_at': datetime.now().isoformat(),
+                'readings': readings,
+            }, f, default=_json_default, separators=(',', ':'))
+            if self.fsync != FSYNC_NEVER:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temporary, path)
+        return path
+
+    def _write_checkpoint(self, segment: int, offset: int):
+        """Atomically record the position of the oldest undrained record"""
+        temporary = self._checkpoint_path + ".tmp"
+        with open(temporary, 'w') as f:
+            json.dump({'segment': segment, 'offset': offset}, f)
+            if self.fsync != FSYNC_NEVER:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temporary, self._checkpoint_path)
+
+    # Introspection
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def quarantined(self) -> int:
+        """Number of quarantined batches"""
+        if not os.path.isdir(self.quarantine_directory):
+            return 0
+        return sum(1 for name in os.listdir(self.quarantine_directory) if name.endswith(".json"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Spool depth and age"""
+        quarantined = self.quarantined()
+        with self._lock:
+            oldest = self._entries[0][3] if self._entries else None
+            return {
+                'batches': len(self._entries),
+                'readings': sum(entry[4] for entry in self._entries),
+                'bytes': self._bytes,
+                'segments': len(self._segments),
+                'oldest_age_seconds': time.time() - oldest if oldest else 0.0,
+                'quarantined_batches': quarantined,
+            }
+
+    def close(self) -> None:
+        """Flush and close the active segment"""
+        with self._lock:
+            if self._writer is not None:
+                self._sync(force=True)
+                self._writer.close()
+                self._writer = None
@@ -3,11 +3,20 @@ import logging
 import signal
 import sys
 import os
+import time
+import argparse
+from typing import Dict, Any, Optional
 
 from database.connection import db
-from data_ingestion.queue.rabbitmq_client import rabbitmq
+from database.partitions import partition_manager
+from database.repositories.repositories import ReadingRollupRepository
+from database.rollups import rollup_repair
+from data_ingestion.queue import ingestion_queue
 from data_ingestion.schedulers.ingestion_scheduler import IngestionScheduler
 from data_ingestion.consumer.db_consumer import DatabaseConsumer
+from data_ingestion.consumer.spool import WriteAheadSpool
+from data_ingestion.processors.hierarchy_index import hierarchy_index
+from data_ingestion.supervisor import IngestionSupervisor
 
 # Create logs directory if it doesn't exist
 os.makedirs("logs", exist_ok=True)
@@ -15,7 +24,7 @@ os.makedirs("logs", exist_ok=True)
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
     handlers=[
         logging.StreamHandler(sys.stdout),
         logging.FileHandler("logs/data_ingestion.log"),
@@ -26,11 +35,33 @@ logger = logging.getLogger(__name__)
 
 
 class IngestionService:
-    """Main ingestion service that manages the scheduler and consumer"""
+    """
+    Main ingestion service that manages the scheduler and consumer
 
-    def __init__(self):
-        self.scheduler = IngestionScheduler()
-        self.consumer = DatabaseConsumer()
+    When run as one worker of a supervisor, the service only polls its own
+    shard of the customers and sends its load figures to the supervisor
+    over `status_queue` every `status_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        status_queue: Optional[Any] = None,
+        status_interval: float = float(os.getenv("INGESTION_STATUS_INTERVAL", "10")),
+    ):
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.scheduler = IngestionScheduler(shard_index=shard_index, shard_count=shard_count)
+        if shard_count > 1 and os.getenv("INGESTION_SPOOL_ENABLED", "true").lower() == "true":
+            # Workers must not share a spool directory
+            spool_dir = os.path.join(os.getenv("INGESTION_SPOOL_DIR", "data/spool"), f"shard-{shard_index}")
+            self.consumer = DatabaseConsumer(spool=WriteAheadSpool(directory=spool_dir))
+        else:
+            self.consumer = DatabaseConsumer()
+        self.status_queue = status_queue
+        self.status_interval = status_interval
+        self.status_task = None
         self.running = False
         self.stop_event = asyncio.Event()
 
@@ -45,12 +76,26 @@ class IngestionService:
         # Connect to the database
         await db.connect()
         
-        # Connect to RabbitMQ
-        await rabbitmq.connect()
+        # Keep partitions created ahead of the readings
+        partition_manager.start()
         
-        # Start the scheduler and consumer
-        await self.scheduler.start()
+        # Recompute recent rollup buckets; one worker per supervisor is enough
+        if ReadingRollupRepository.enabled and self.shard_index == 0:
+            rollup_repair.start()
+        
+        # Connect to the queue
+        await ingestion_queue.connect()
+        
+        # Reload cached customer hierarchies when facilities or units change
+        await hierarchy_index.start_listener()
+        
+        # Start the consumer first so the first polls have somewhere to go
         await self.consumer.start()
+        await self.scheduler.start()
+        
+        # Report load to the supervisor, if there is one
+        if self.status_queue is not None:
+            self.status_task = asyncio.create_task(self.report_status())
         
         logger.info("Ingestion service started")
 
@@ -62,12 +107,19 @@ class IngestionService:
         self.running = False
         logger.info("Stopping ingestion service")
         
+        if self.status_task:
+            self.status_task.cancel()
+            await asyncio.gather(self.status_task, return_exceptions=True)
+        
         # Stop the scheduler and consumer
         await self.scheduler.stop()
         await self.consumer.stop()
         
         # Close connections
-        await rabbitmq.close()
+        await partition_manager.stop()
+        await rollup_repair.stop()
+        await hierarchy_index.stop_listener()
+        await ingestion_queue.close()
         await db.close()
         
         # Set the stop event
@@ -75,6 +127,30 @@ class IngestionService:
         
         logger.info("Ingestion service stopped")
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Load figures for this process"""
+        scheduler_stats = self.scheduler.get_stats()
+        fetches = scheduler_stats.pop('fetches', {})
+        scheduler_stats['open_circuits'] = sum(
+            1 for stats in fetches.values() if stats['circuit']['state'] != 'closed'
+        )
+        return {
+            'shard_index': self.shard_index,
+            'pid': os.getpid(),
+            'reported_at': time.time(),
+            'scheduler': scheduler_stats,
+            'consumer': self.consumer.get_stats(),
+        }
+
+    async def report_status(self):
+        """Periodically send this worker's load figures to the supervisor"""
+        while self.running:
+            try:
+                self.status_queue.put_nowait(self.get_stats())
+            except Exception as e:
+                logger.warning(f"Could not report status: {e}")
+            await asyncio.sleep(self.status_interval)
+
     async def run(self):
         """Run the service until stopped"""
         # Register signal handlers
@@ -90,8 +166,18 @@ class IngestionService:
         await self.stop_event.wait()
 
 
-async def main():
-    """Main entry point"""
+async def main(workers: int = 1):
+    """
+    Main entry point
+    
+    Args:
+        workers: Number of worker processes; above 1 a supervisor shards
+            customers across that many processes
+    """
+    if workers > 1:
+        await IngestionSupervisor(workers=workers).run()
+        return
+    
     try:
         # Create and run the service
         service = IngestionService()
@@ -105,5 +191,17 @@ async def main():
         await db.close()
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the temperature data ingestion service")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("INGESTION_WORKERS", "1")),
+        help="worker processes to shard customers across; 0 for one per CPU core (default: 1)"
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        args.workers = os.cpu_count() or 1
+    return args
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args().workers))
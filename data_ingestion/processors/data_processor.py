@@ -1,59 +1,67 @@
+import os
 import logging
 import uuid
-from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, timezone
+from itertools import repeat
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Sequence
+
+import numpy as np
+import pandas as pd
 
 from database.models.models import DataEvent
 from database.repositories.repositories import (
     CustomerRepository, FacilityRepository, StorageUnitRepository
 )
-from data_ingestion.queue.rabbitmq_client import rabbitmq
+from data_ingestion.queue import QueueBackend, ingestion_queue
+from data_ingestion.queue.wire_format import (
+    CONTENT_TYPE_COMPACT, VERSION_HEADER, COMPACT_VERSION, encode_envelope
+)
 from database.connection import db
+from data_ingestion.processors.hierarchy_index import HierarchyIndex, hierarchy_index
+from data_ingestion.processors.recent_keys import RecentKeyFilter
 
 logger = logging.getLogger(__name__)
 
+# Event type of messages carrying several readings for one facility or unit
+ENVELOPE_EVENT_TYPE = 'temperature_reading_batch'
+
 
 class DataProcessor:
     """Process raw data into events for the queue"""
 
-    def __init__(self):
-        self.facility_cache = {}  # Cache for facility lookups by code
-        self.unit_cache = {}      # Cache for storage unit lookups by code
+    def __init__(
+        self,
+        envelope_size: int = int(os.getenv("INGESTION_ENVELOPE_SIZE", "500")),
+        envelope_group_by: str = os.getenv("INGESTION_ENVELOPE_GROUP_BY", "facility"),
+        wire_format: str = os.getenv("INGESTION_WIRE_FORMAT", "json"),
+        index: Optional[HierarchyIndex] = None,
+        dedup_capacity: int = int(os.getenv("INGESTION_DEDUP_CAPACITY", "100000")),
+        queue: Optional[QueueBackend] = None,
+        vectorize_threshold: int = int(os.getenv("INGESTION_VECTORIZE_THRESHOLD", "32")),
+    ):
+        self.queue = queue or ingestion_queue  # Where events are published
+        self.index = index or hierarchy_index  # Code -> ID lookups shared across processors
+        self.envelope_size = envelope_size  # Max readings per message, 1 disables envelopes
+        self.envelope_group_by = envelope_group_by  # 'facility' or 'unit'
+        self.wire_format = wire_format  # Envelope encoding: 'json' or 'compact'
+        self.recent_keys = RecentKeyFilter(dedup_capacity)  # 0 disables the filter
+        # Batches smaller than this are parsed value by value, which beats
+        # the fixed cost of building NumPy arrays
+        self.vectorize_threshold = vectorize_threshold
+
+    @property
+    def facility_cache(self) -> Dict[str, Dict[str, str]]:
+        """Facility code to ID mapping per customer"""
+        return self.index.facilities
+
+    @property
+    def unit_cache(self) -> Dict[str, Dict[str, str]]:
+        """Storage unit code to ID mapping per facility"""
+        return self.index.units
 
     async def load_mapping_data(self, customer_id: str):
         """Load facility and storage unit mapping data for a customer"""
-        # Get facilities for this customer
-        facilities_query = """
-            SELECT id, facility_code 
-            FROM public.facilities 
-            WHERE customer_id = $1
-        """
-        facilities = await db.fetch(facilities_query, customer_id)
-        
-        # Build facility code to ID mapping
-        self.facility_cache[customer_id] = {
-            f['facility_code']: f['id'] for f in facilities
-        }
-        
-        # Get storage units for all facilities
-        for facility in facilities:
-            facility_id = facility['id']
-            
-            units_query = """
-                SELECT id, unit_code 
-                FROM public.storage_units 
-                WHERE facility_id = $1
-            """
-            units = await db.fetch(units_query, facility_id)
-            
-            # Build unit code to ID mapping
-            self.unit_cache[facility_id] = {
-                u['unit_code']: u['id'] for u in units
-            }
-        
-        logger.info(f"Loaded mapping data for customer {customer_id}: " 
-                   f"{len(self.facility_cache.get(customer_id, {}))} facilities, "
-                   f"{sum(len(units) for units in self.unit_cache.values())} storage units")
+        await self.index.refresh(customer_id)
 
     async def process_api_readings(self, customer_id: str, readings: List[Dict[str, Any]]) -> int:
         """
@@ -66,61 +74,12 @@ class DataProcessor:
         Returns:
             Number of events successfully processed and queued
         """
-        if not readings:
-            return 0
-        
-        # Load mapping data if not already cached
-        if customer_id not in self.facility_cache:
-            await self.load_mapping_data(customer_id)
-        
-        events_processed = 0
-        facility_cache = self.facility_cache.get(customer_id, {})
-        
-        for reading in readings:
-            try:
-                # Get facility_code and unit_code from the reading
-                facility_code = reading.get('facility_id')
-                unit_code = reading.get('unit_id')
-                
-                if not facility_code or not unit_code:
-                    logger.warning(f"Skipping reading without facility_id or unit_id: {reading}")
-                    continue
-                
-                # Map facility code to facility ID
-                facility_id = facility_cache.get(facility_code)
-                if not facility_id:
-                    logger.warning(f"Unknown facility code: {facility_code} for customer {customer_id}")
-                    continue
-                
-                # Map unit code to unit ID
-                unit_cache = self.unit_cache.get(facility_id, {})
-                unit_id = unit_cache.get(unit_code)
-                if not unit_id:
-                    logger.warning(f"Unknown unit code: {unit_code} in facility {facility_code}")
-                    continue
-                
-                # Create event with proper UUIDs
-                event = {
-                    'id': str(uuid.uuid4()),
-                    'event_type': 'temperature_reading',
-                    'customer_id': str(customer_id),
-                    'facility_id': str(facility_id),
-                    'unit_id': str(unit_id),
-                    'data': reading,
-                    'timestamp': datetime.now().isoformat(),
-                    'processed': False
-                }
-                
-                # Publish to queue
-                routing_key = f"temperature.{customer_id}.{facility_id}.{unit_id}"
-                await rabbitmq.publish(event, routing_key=routing_key)
-                
-                events_processed += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing reading: {e}", exc_info=True)
-        
-        return events_processed
+        return await self._process_readings(
+            customer_id, readings,
+            facility_keys=('facility_id',),
+            unit_keys=('unit_id',),
+            source='API'
+        )
 
     async def process_csv_readings(self, customer_id: str, readings: List[Dict[str, Any]]) -> int:
         """
@@ -133,61 +92,164 @@ class DataProcessor:
         Returns:
             Number of events successfully processed and queued
         """
+        return await self._process_readings(
+            customer_id, readings,
+            facility_keys=('facility_code', 'facility_id'),
+            unit_keys=('unit_code', 'unit_id'),
+            source='CSV'
+        )
+
+    async def _process_readings(
+        self,
+        customer_id: str,
+        readings: List[Dict[str, Any]],
+        facility_keys: Tuple[str, ...],
+        unit_keys: Tuple[str, ...],
+        source: str
+    ) -> int:
+        """Map raw readings to storage unit IDs and publish them to the queue"""
         if not readings:
             return 0
         
-        # Load mapping data if not already cached
-        if customer_id not in self.facility_cache:
-            await self.load_mapping_data(customer_id)
+        # Load mapping data if not cached or expired
+        await self.index.ensure_loaded(customer_id)
         
-        events_processed = 0
-        facility_cache = self.facility_cache.get(customer_id, {})
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        group_dedup_keys: Dict[Tuple[str, ...], List[Tuple[str, ...]]] = {}
+        duplicates = 0
         
         for reading in readings:
-            try:
-                # Extract facility and unit information from CSV
-                facility_code = reading.get('facility_code') or reading.get('facility_id')
-                unit_code = reading.get('unit_code') or reading.get('unit_id')
-                
-                if not facility_code or not unit_code:
-                    logger.warning(f"Skipping CSV reading without facility_code or unit_code: {reading}")
-                    continue
-                
-                # Map facility code to facility ID
-                facility_id = facility_cache.get(facility_code)
-                if not facility_id:
-                    logger.warning(f"Unknown facility code: {facility_code} for customer {customer_id}")
-                    continue
-                
-                # Map unit code to unit ID
-                unit_cache = self.unit_cache.get(facility_id, {})
-                unit_id = unit_cache.get(unit_code)
-                if not unit_id:
-                    logger.warning(f"Unknown unit code: {unit_code} in facility {facility_code}")
-                    continue
-                
-                # Create event with proper UUIDs
+            # Extract facility and unit codes from the reading
+            facility_code = next((reading.get(k) for k in facility_keys if reading.get(k)), None)
+            unit_code = next((reading.get(k) for k in unit_keys if reading.get(k)), None)
+            
+            if not facility_code or not unit_code:
+                logger.warning(f"Skipping {source} reading without facility or unit code: {reading}")
+                continue
+            
+            # Map facility and unit codes to IDs
+            facility_id, unit_id = self.index.lookup(customer_id, facility_code, unit_code)
+            if not unit_id:
+                # Reload once in case the unit was provisioned after the last load
+                facility_id, unit_id = await self.index.resolve(customer_id, facility_code, unit_code)
+            
+            if not facility_id:
+                logger.warning(f"Unknown facility code: {facility_code} for customer {customer_id}")
+                continue
+            if not unit_id:
+                logger.warning(f"Unknown unit code: {unit_code} in facility {facility_code}")
+                continue
+            
+            # Drop readings already published by an overlapping poll
+            dedup_key = (
+                str(unit_id),
+                str(reading.get('timestamp') or reading.get('recorded_at') or reading.get('reading_time')),
+                str(reading.get('sensor_id') or '')
+            )
+            if not self.recent_keys.add(dedup_key):
+                duplicates += 1
+                continue
+            
+            # Group readings that will share an envelope
+            if self.envelope_group_by == 'unit':
+                group_key = (str(facility_id), str(unit_id))
+            else:
+                group_key = (str(facility_id),)
+            groups.setdefault(group_key, []).append({
+                'unit_id': str(unit_id),
+                'data': reading
+            })
+            group_dedup_keys.setdefault(group_key, []).append(dedup_key)
+        
+        if duplicates:
+            logger.info(f"Skipped {duplicates} recently seen {source} readings for customer {customer_id}")
+        
+        events_processed = 0
+        for group_key, items in groups.items():
+            facility_id = group_key[0]
+            for start in range(0, len(items), self.envelope_size):
+                chunk = items[start:start + self.envelope_size]
+                try:
+                    await self._publish_chunk(customer_id, facility_id, chunk)
+                    events_processed += len(chunk)
+                except Exception as e:
+                    logger.error(f"Error publishing {source} readings: {e}", exc_info=True)
+                    # Let the next poll publish these readings again
+                    for dedup_key in group_dedup_keys[group_key][start:start + self.envelope_size]:
+                        self.recent_keys.discard(dedup_key)
+        
+        return events_processed
+
+    async def _publish_chunk(self, customer_id: str, facility_id: str, items: List[Dict[str, Any]]):
+        """Publish mapped readings as single events or as one envelope"""
+        if self.envelope_size <= 1:
+            # Legacy format: one message per reading
+            for item in items:
                 event = {
                     'id': str(uuid.uuid4()),
                     'event_type': 'temperature_reading',
                     'customer_id': str(customer_id),
-                    'facility_id': str(facility_id),
-                    'unit_id': str(unit_id),
-                    'data': reading,
+                    'facility_id': facility_id,
+                    'unit_id': item['unit_id'],
+                    'data': item['data'],
                     'timestamp': datetime.now().isoformat(),
                     'processed': False
                 }
-                
-                # Publish to queue
-                routing_key = f"temperature.{customer_id}.{facility_id}.{unit_id}"
-                await rabbitmq.publish(event, routing_key=routing_key)
-                
-                events_processed += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing CSV reading: {e}", exc_info=True)
+                routing_key = f"temperature.{customer_id}.{facility_id}.{item['unit_id']}"
+                await self.queue.publish(event, routing_key=routing_key)
+            return
         
-        return events_processed
+        envelope = {
+            'id': str(uuid.uuid4()),
+            'event_type': ENVELOPE_EVENT_TYPE,
+            'customer_id': str(customer_id),
+            'facility_id': facility_id,
+            'timestamp': datetime.now().isoformat(),
+            'readings': items
+        }
+        
+        # Unit-grouped envelopes keep the per-unit routing key
+        if self.envelope_group_by == 'unit':
+            envelope['unit_id'] = items[0]['unit_id']
+            routing_key = f"temperature.{customer_id}.{facility_id}.{items[0]['unit_id']}"
+        else:
+            routing_key = f"temperature.{customer_id}.{facility_id}"
+        
+        if self.wire_format == 'compact':
+            await self.queue.publish_bytes(
+                encode_envelope(envelope),
+                routing_key=routing_key,
+                content_type=CONTENT_TYPE_COMPACT,
+                headers={VERSION_HEADER: COMPACT_VERSION}
+            )
+        else:
+            await self.queue.publish(envelope, routing_key=routing_key)
+
+    @staticmethod
+    def expand_event(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Expand a queue message into individual reading events
+        
+        Args:
+            message: A single reading event or a batch envelope
+            
+        Returns:
+            List of events accepted by `map_temperature_reading`
+        """
+        if message.get('event_type') != ENVELOPE_EVENT_TYPE:
+            return [message]
+        
+        customer_id = message['customer_id']
+        facility_id = message['facility_id']
+        return [
+            {
+                'customer_id': customer_id,
+                'facility_id': facility_id,
+                'unit_id': item['unit_id'],
+                'data': item['data']
+            }
+            for item in message.get('readings', [])
+        ]
 
     # def map_temperature_reading(self, event: Dict[str, Any]) -> Dict[str, Any]:
     #     """
@@ -265,18 +327,25 @@ class DataProcessor:
         """
         data = event['data']
         
+        # One clock reading for created_at and a missing timestamp, so the
+        # consumer can tell substituted timestamps apart
+        now = datetime.now()
+        
         # Extract timestamp
         timestamp_str = data.get('timestamp') or data.get('recorded_at') or data.get('reading_time')
         
         # Handle different timestamp formats or provide default
         try:
-            if timestamp_str:
+            if isinstance(timestamp_str, datetime):
+                # Already parsed by the compact wire format
+                timestamp = timestamp_str
+            elif timestamp_str:
                 timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
             else:
-                timestamp = datetime.now()
+                timestamp = now
         except (ValueError, TypeError):
             logger.warning(f"Invalid timestamp format: {timestamp_str}, using current time")
-            timestamp = datetime.now()
+            timestamp = now
         
         # Safely convert temperature to float
         try:
@@ -313,7 +382,159 @@ class DataProcessor:
             'sensor_id': data.get('sensor_id', ''),
             'quality_score': quality_score,  # This will now be an integer
             'equipment_status': data.get('equipment_status', 'normal'),
-            'created_at': datetime.now()
+            'created_at': now
         }
         
-        return reading
\ No newline at end of file
+        return reading
+
+    def map_message(self, message: Dict[str, Any]) -> List[tuple]:
+        """
+        Map a queue message straight to insert records
+        
+        Envelopes are mapped from their readings without building an
+        intermediate event per reading.
+        
+        Args:
+            message: A single reading event or a batch envelope
+            
+        Returns:
+            Tuples in `TemperatureReadingRepository.record_columns` order
+        """
+        if message.get('event_type') != ENVELOPE_EVENT_TYPE:
+            return self.map_batch([message])
+        
+        items = message.get('readings', [])
+        return self._map_columns(
+            repeat(message['customer_id']),
+            repeat(message['facility_id']),
+            [item['unit_id'] for item in items],
+            [item['data'] for item in items]
+        )
+
+    def map_batch(self, events: Sequence[Dict[str, Any]]) -> List[tuple]:
+        """
+        Map reading events to insert records in one pass
+        
+        Produces the same values as `map_temperature_reading`, except that
+        timestamps without an offset are taken as UTC and returned
+        timezone-aware, and there is no per-reading `id` (the column is a
+        BIGSERIAL). Timestamps and numbers are parsed column-wise with
+        pandas/NumPy; values the fast path rejects fall back to the
+        per-value parser, and unusable ones get the same defaults.
+        
+        Args:
+            events: Reading events as returned by `expand_event`
+            
+        Returns:
+            Tuples in `TemperatureReadingRepository.record_columns` order,
+            ready for `TemperatureReadingRepository.create_batch`
+        """
+        return self._map_columns(
+            [event['customer_id'] for event in events],
+            [event['facility_id'] for event in events],
+            [event['unit_id'] for event in events],
+            [event['data'] for event in events]
+        )
+
+    def _map_columns(
+        self,
+        customer_ids: Iterable[Any],
+        facility_ids: Iterable[Any],
+        unit_ids: List[Any],
+        data: List[Dict[str, Any]]
+    ) -> List[tuple]:
+        """Build insert records from per-column values"""
+        if not data:
+            return []
+        
+        # One clock reading per batch for created_at and missing timestamps
+        now = datetime.now(timezone.utc)
+        
+        recorded_at = self._parse_timestamps(
+            [d.get('timestamp') or d.get('recorded_at') or d.get('reading_time') for d in data], now
+        )
+        temperatures = self._parse_numbers([d.get('temperature') for d in data], 0.0, 'temperature')
+        quality_scores = self._parse_numbers([d.get('quality_score') for d in data], 1.0, 'quality score')
+        
+        # Quality scores are integers, truncated like int(float(value))
+        finite = np.isfinite(quality_scores)
+        if not finite.all():
+            logger.warning(f"Invalid quality score values in {int((~finite).sum())} readings, using 1")
+            quality_scores[~finite] = 1.0
+        quality_scores = np.trunc(quality_scores).astype(np.int64)
+        
+        return list(zip(
+            customer_ids,
+            facility_ids,
+            unit_ids,
+            temperatures.tolist(),
+            [d.get('temperature_unit', 'C') for d in data],
+            recorded_at,
+            # NULLs never conflict, so a missing sensor is stored as ''
+            [d.get('sensor_id') or '' for d in data],
+            quality_scores.tolist(),
+            [d.get('equipment_status', 'normal') for d in data],
+            repeat(now)
+        ))
+
+    def _parse_timestamps(self, values: List[Any], now: datetime) -> List[datetime]:
+        """Parse a column of timestamps into timezone-aware datetimes"""
+        parsed: List[Any] = [now] * len(values)
+        positions = []
+        strings = []
+        for i, value in enumerate(values):
+            if isinstance(value, datetime):
+                # Already parsed by the compact wire format
+                parsed[i] = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+            elif value:
+                positions.append(i)
+                strings.append(value)
+        
+        if len(strings) >= self.vectorize_threshold:
+            # Fast path: one C-level pass for ISO 8601, the format every source uses
+            index = pd.to_datetime(pd.Series(strings, dtype=object), format='ISO8601', utc=True, errors='coerce')
+            invalid = index.isna().to_numpy()
+            converted = index.dt.to_pydatetime()
+            for i, value, timestamp, failed in zip(positions, strings, converted, invalid):
+                parsed[i] = self._parse_timestamp(value, now) if failed else timestamp
+        else:
+            for i, value in zip(positions, strings):
+                parsed[i] = self._parse_timestamp(value, now)
+        
+        return parsed
+
+    @staticmethod
+    def _parse_timestamp(value: Any, now: datetime) -> datetime:
+        """Parse one timestamp, taking naive values as UTC"""
+        try:
+            timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (ValueError, TypeError, AttributeError):
+            logger.warning(f"Invalid timestamp format: {value}, using current time")
+            return now
+        return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+    def _parse_numbers(self, values: List[Any], default: float, name: str) -> np.ndarray:
+        """Parse a column of numbers, substituting the default for missing or invalid values"""
+        if len(values) >= self.vectorize_threshold:
+            numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+            numbers = numbers.to_numpy(dtype=np.float64, copy=True)
+            retry = np.flatnonzero(np.isnan(numbers))
+        else:
+            numbers = np.empty(len(values), dtype=np.float64)
+            retry = range(len(values))
+        
+        # Values the fast path could not convert, or every value of a small batch
+        invalid = 0
+        for i in retry:
+            value = values[i]
+            if value is None or value == '':
+                numbers[i] = default
+                continue
+            try:
+                numbers[i] = float(value)
+            except (ValueError, TypeError):
+                invalid += 1
+                numbers[i] = default
+        if invalid:
+            logger.warning(f"Invalid {name} values in {invalid} readings, using {default}")
+        return numbers
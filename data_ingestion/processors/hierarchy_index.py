@@ -0,0 +1,171 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+from database.connection import db
+
+logger = logging.getLogger(__name__)
+
+
+class HierarchyIndex:
+    """
+    Shared customer -> facility code -> unit code index used to map raw
+    readings to database IDs.
+
+    Each customer is loaded with a single JOIN and reloaded when its TTL
+    expires, when a NOTIFY arrives for it, or once when a reading references
+    a code that is not in the index. Codes that are still unknown after that
+    reload are kept in a negative cache so a stream of bad readings does not
+    turn into a stream of queries.
+    """
+
+    def __init__(
+        self,
+        ttl: float = float(os.getenv("HIERARCHY_CACHE_TTL", "300")),
+        negative_ttl: float = float(os.getenv("HIERARCHY_NEGATIVE_TTL", "60")),
+        max_negative_entries: int = 10000,
+        notify_channel: Optional[str] = os.getenv("HIERARCHY_NOTIFY_CHANNEL", "hierarchy_changed"),
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_negative_entries = max_negative_entries
+        self.notify_channel = notify_channel
+        self.facilities: Dict[str, Dict[str, str]] = {}  # customer_id -> facility_code -> facility_id
+        self.units: Dict[str, Dict[str, str]] = {}       # facility_id -> unit_code -> unit_id
+        self._loaded_at: Dict[str, float] = {}
+        self._negative: Dict[Tuple[str, str, str], float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._listener_conn = None
+
+    def apply(self, customer_id: str, rows: List[Dict[str, Any]]):
+        """Replace the index entries of a customer with the given hierarchy rows"""
+        customer_id = str(customer_id)
+
+        # Drop units of facilities that no longer belong to the customer
+        for facility_id in self.facilities.get(customer_id, {}).values():
+            self.units.pop(facility_id, None)
+
+        facilities: Dict[str, str] = {}
+        for row in rows:
+            facility_id = str(row['facility_id'])
+            facilities[row['facility_code']] = facility_id
+            units = self.units.setdefault(facility_id, {})
+            if row.get('unit_id') is not None:
+                units[row['unit_code']] = str(row['unit_id'])
+
+        self.facilities[customer_id] = facilities
+        self._loaded_at[customer_id] = time.monotonic()
+        self._negative = {k: v for k, v in self._negative.items() if k[0] != customer_id}
+
+    async def refresh(self, customer_id: str, if_older_than: Optional[float] = None):
+        """
+        Reload a customer's hierarchy with one query
+
+        Args:
+            customer_id: The customer ID
+            if_older_than: Skip the reload if the customer was loaded after this
+                monotonic time, so concurrent callers share one query
+        """
+        customer_id = str(customer_id)
+        lock = self._locks.setdefault(customer_id, asyncio.Lock())
+
+        async with lock:
+            loaded_at = self._loaded_at.get(customer_id)
+            if if_older_than is not None and loaded_at is not None and loaded_at > if_older_than:
+                return
+
+            query = """
+                SELECT f.id AS facility_id, f.facility_code,
+                       u.id AS unit_id, u.unit_code
+                FROM public.facilities f
+                LEFT JOIN public.storage_units u ON u.facility_id = f.id
+                WHERE f.customer_id = $1
+            """
+            rows = await db.fetch(query, customer_id)
+            self.apply(customer_id, rows)
+
+        facilities = self.facilities[customer_id]
+        logger.info(f"Loaded mapping data for customer {customer_id}: "
+                    f"{len(facilities)} facilities, "
+                    f"{sum(len(self.units.get(f, {})) for f in facilities.values())} storage units")
+
+    async def ensure_loaded(self, customer_id: str):
+        """Load a customer if it is missing or its TTL has expired"""
+        loaded_at = self._loaded_at.get(str(customer_id))
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            await self.refresh(customer_id, if_older_than=loaded_at)
+
+    def invalidate(self, customer_id: Optional[str] = None):
+        """Mark one customer, or every customer, as stale"""
+        if customer_id is None:
+            self._loaded_at.clear()
+            self._negative.clear()
+        else:
+            self._loaded_at.pop(str(customer_id), None)
+
+    def lookup(self, customer_id: str, facility_code: str, unit_code: str) -> Tuple[Optional[str], Optional[str]]:
+        """Look up facility and unit IDs without touching the database"""
+        facility_id = self.facilities.get(str(customer_id), {}).get(facility_code)
+        if facility_id is None:
+            return None, None
+        return facility_id, self.units.get(facility_id, {}).get(unit_code)
+
+    async def resolve(self, customer_id: str, facility_code: str, unit_code: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Resolve facility and unit codes, reloading the customer once on a miss
+
+        Returns:
+            Tuple of (facility_id, unit_id); either may be None if unknown
+        """
+        facility_id, unit_id = self.lookup(customer_id, facility_code, unit_code)
+        if unit_id is not None:
+            return facility_id, unit_id
+
+        key = (str(customer_id), facility_code, unit_code)
+        now = time.monotonic()
+        if self._negative.get(key, 0) > now:
+            return facility_id, unit_id
+
+        await self.refresh(customer_id, if_older_than=now)
+        facility_id, unit_id = self.lookup(customer_id, facility_code, unit_code)
+
+        if unit_id is None:
+            if len(self._negative) >= self.max_negative_entries:
+                self._negative.clear()
+            self._negative[key] = time.monotonic() + self.negative_ttl
+
+        return facility_id, unit_id
+
+    async def start_listener(self):
+        """Invalidate customers on NOTIFY from the hierarchy triggers"""
+        if not self.notify_channel or self._listener_conn is not None:
+            return
+
+        if not db.pool:
+            await db.connect()
+
+        def on_notify(connection, pid, channel, payload):
+            self.invalidate(payload or None)
+
+        try:
+            self._listener_conn = await db.pool.acquire()
+            await self._listener_conn.add_listener(self.notify_channel, on_notify)
+            logger.info(f"Listening for hierarchy changes on '{self.notify_channel}'")
+        except Exception as e:
+            logger.warning(f"Could not listen for hierarchy changes, relying on TTL: {e}")
+            await self.stop_listener()
+
+    async def stop_listener(self):
+        """Stop listening for hierarchy changes"""
+        if self._listener_conn is None:
+            return
+
+        # Releasing resets the connection, which also runs UNLISTEN
+        conn, self._listener_conn = self._listener_conn, None
+        await db.pool.release(conn)
+
+
+# Index shared by every DataProcessor in the process
+hierarchy_index = HierarchyIndex()
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from typing import Hashable
+
+
+class RecentKeyFilter:
+    """
+    Bounded LRU set of recently published reading keys.
+
+    Used in front of the queue to drop readings that an overlapping poll
+    window returns again. It only catches recent duplicates; the database
+    natural key remains the source of truth.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._keys = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def add(self, key: Hashable) -> bool:
+        """
+        Remember a key
+
+        Returns:
+            True if the key is new, False if it was seen recently
+        """
+        if self.capacity <= 0:
+            return True
+
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+
+        self._keys[key] = None
+        if len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+        return True
+
+    def discard(self, key: Hashable):
+        """Forget a key, e.g. when publishing its reading failed"""
+        self._keys.pop(key, None)
@@ -1,2 +1,24 @@
+import os
 
-from .rabbitmq_client import rabbitmq
+from .base import QueueBackend
+from .rabbitmq_client import rabbitmq, RabbitMQClient
+from .memory_queue import InProcessQueue
+
+
+def create_queue_backend(kind: str = os.getenv("INGESTION_QUEUE_BACKEND", "rabbitmq")) -> QueueBackend:
+    """
+    Select the queue between the scheduler and the consumer
+
+    Args:
+        kind: 'rabbitmq' for the AMQP broker, or 'memory' to pass events
+            between the scheduler and consumer inside one process
+    """
+    if kind == "rabbitmq":
+        return rabbitmq
+    if kind == "memory":
+        return InProcessQueue()
+    raise ValueError(f"Unknown queue backend: {kind}")
+
+
+# Queue shared by the scheduler and the consumer of this process
+ingestion_queue = create_queue_backend()
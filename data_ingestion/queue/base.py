@@ -0,0 +1,79 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from data_ingestion.queue.wire_format import CONTENT_TYPE_JSON
+
+
+class QueueBackend(ABC):
+    """
+    Transport between the ingestion scheduler and the database consumer
+
+    Implementations deliver published events to the queues whose binding
+    key matches the routing key (AMQP topic semantics: `*` matches one
+    word, `#` zero or more). With `manual_ack` the consumer callback gets a
+    delivery object exposing `ack(multiple=...)`, `nack(...)` and
+    `reject(...)`, and failed deliveries go through `retry_or_dead_letter`.
+    """
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """Open the backend"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Close the backend"""
+
+    @abstractmethod
+    async def publish(
+        self,
+        message: Dict[str, Any],
+        routing_key: str = "temperature.reading",
+        exchange_name: Optional[str] = None
+    ) -> None:
+        """Publish an event"""
+
+    @abstractmethod
+    async def publish_bytes(
+        self,
+        body: bytes,
+        routing_key: str = "temperature.reading",
+        exchange_name: Optional[str] = None,
+        content_type: str = CONTENT_TYPE_JSON,
+        headers: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Publish an already encoded event"""
+
+    @abstractmethod
+    async def consume(
+        self,
+        callback: Callable[..., Awaitable[None]],
+        queue_name: str = None,
+        routing_key: str = "temperature.#",
+        exchange_name: Optional[str] = None,
+        manual_ack: bool = False,
+        prefetch_count: Optional[int] = None
+    ) -> None:
+        """Deliver events from a queue to a callback"""
+
+    @abstractmethod
+    async def retry_or_dead_letter(self, message: Any, queue_name: str, error: Any) -> bool:
+        """Retry a failed delivery later, or dead-letter it; True once settled"""
+
+    @abstractmethod
+    async def dead_letter(self, message: Any, queue_name: str, error: Any) -> bool:
+        """Move a delivery to the dead letters; True once settled"""
+
+
+def topic_matches(pattern: str, routing_key: str) -> bool:
+    """Match a routing key against an AMQP topic binding key"""
+    def match(pattern_words, key_words) -> bool:
+        if not pattern_words:
+            return not key_words
+        head, rest = pattern_words[0], pattern_words[1:]
+        if head == '#':
+            return any(match(rest, key_words[i:]) for i in range(len(key_words) + 1))
+        if not key_words:
+            return False
+        return (head == '*' or head == key_words[0]) and match(rest, key_words[1:])
+
+    return match(pattern.split('.'), routing_key.split('.'))
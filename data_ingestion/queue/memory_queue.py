@@ -0,0 +1,230 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+from data_ingestion.queue.base import QueueBackend, topic_matches
+from data_ingestion.queue.wire_format import CONTENT_TYPE_JSON, decode_body
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessDelivery:
+    """A delivered event awaiting acknowledgement, mirroring an AMQP message"""
+
+    def __init__(self, consumer: '_InProcessConsumer', tag: int, event: Dict[str, Any],
+                 routing_key: str, retry_count: int):
+        self._consumer = consumer
+        self.delivery_tag = tag
+        self.event = event
+        self.routing_key = routing_key
+        self.retry_count = retry_count
+
+    @property
+    def headers(self) -> Dict[str, Any]:
+        return {'x-retry-count': self.retry_count}
+
+    async def ack(self, multiple: bool = False):
+        self._consumer.settle(self.delivery_tag, multiple)
+
+    async def nack(self, multiple: bool = False, requeue: bool = True):
+        for delivery in self._consumer.settle(self.delivery_tag, multiple):
+            if requeue:
+                self._consumer.redeliver(delivery.event, delivery.routing_key, delivery.retry_count)
+
+    async def reject(self, requeue: bool = False):
+        await self.nack(multiple=False, requeue=requeue)
+
+
+class _InProcessConsumer:
+    """One queue with its subscriber and unacknowledged deliveries"""
+
+    def __init__(self, name: str, binding: str, maxsize: int):
+        self.name = name
+        self.binding = binding
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.unacked: 'OrderedDict[int, InProcessDelivery]' = OrderedDict()
+        self.permits: Optional[asyncio.Semaphore] = None
+        self.worker: Optional[asyncio.Task] = None
+        self._next_tag = 0
+
+    def deliver(self, item: Tuple[Dict[str, Any], str, int]) -> InProcessDelivery:
+        event, routing_key, retry_count = item
+        self._next_tag += 1
+        delivery = InProcessDelivery(self, self._next_tag, event, routing_key, retry_count)
+        self.unacked[delivery.delivery_tag] = delivery
+        return delivery
+
+    def settle(self, tag: int, multiple: bool = False) -> List[InProcessDelivery]:
+        """Remove deliveries from the unacknowledged set, freeing prefetch permits"""
+        if multiple:
+            settled = [d for t, d in self.unacked.items() if t <= tag]
+        else:
+            settled = [self.unacked[tag]] if tag in self.unacked else []
+        for delivery in settled:
+            del self.unacked[delivery.delivery_tag]
+            if self.permits is not None:
+                self.permits.release()
+        return settled
+
+    def redeliver(self, event: Dict[str, Any], routing_key: str, retry_count: int):
+        """Put an event back at the tail of the queue"""
+        asyncio.get_running_loop().create_task(self.queue.put((event, routing_key, retry_count)))
+
+
+class InProcessQueue(QueueBackend):
+    """
+    Queue backend for a scheduler and consumer sharing one process
+
+    Events are handed over as the same Python objects that were published,
+    with no serialization and no broker round trip. Queues are bounded, so
+    a publisher waits when the consumer falls behind. Retries are scheduled
+    on the event loop and exhausted events are kept in `dead_letters`.
+    Nothing survives a restart, which is acceptable for single-node
+    deployments that can re-poll their sources and for benchmarks.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = int(os.getenv("INGESTION_MEMORY_QUEUE_SIZE", "10000")),
+        max_retries: int = int(os.getenv("RABBITMQ_MAX_RETRIES", "5")),
+        retry_base_delay: float = float(os.getenv("RABBITMQ_RETRY_BASE_DELAY", "5")),
+        max_dead_letters: int = 10000,
+    ):
+        self.maxsize = maxsize  # Events buffered per queue before publishers wait
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.default_queue_name = "temperature_readings"
+        self.consumers: Dict[str, _InProcessConsumer] = {}
+        self.dead_letters: Dict[str, deque] = {}
+        self.max_dead_letters = max_dead_letters
+
+    async def connect(self) -> None:
+        """Nothing to connect to"""
+
+    async def close(self) -> None:
+        """Stop delivering; undelivered events are dropped"""
+        workers = [c.worker for c in self.consumers.values() if c.worker]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.consumers.clear()
+
+    def declare_queue(self, queue_name: str, routing_key: str = "temperature.#") -> _InProcessConsumer:
+        """Create a queue bound to a routing pattern"""
+        consumer = self.consumers.get(queue_name)
+        if consumer is None:
+            consumer = self.consumers[queue_name] = _InProcessConsumer(queue_name, routing_key, self.maxsize)
+        return consumer
+
+    async def publish(
+        self,
+        message: Dict[str, Any],
+        routing_key: str = "temperature.reading",
+        exchange_name: Optional[str] = None
+    ) -> None:
+        """Hand an event to every queue whose binding matches"""
+        if 'timestamp' not in message:
+            message['timestamp'] = datetime.now().isoformat()
+        await self._route(message, routing_key)
+
+    async def publish_bytes(
+        self,
+        body: bytes,
+        routing_key: str = "temperature.reading",
+        exchange_name: Optional[str] = None,
+        content_type: str = CONTENT_TYPE_JSON,
+        headers: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Decode an encoded event and hand it over"""
+        await self._route(decode_body(body, content_type), routing_key)
+
+    async def _route(self, event: Dict[str, Any], routing_key: str):
+        for consumer in list(self.consumers.values()):
+            if topic_matches(consumer.binding, routing_key):
+                await consumer.queue.put((event, routing_key, 0))
+
+    async def consume(
+        self,
+        callback: Callable[..., Awaitable[None]],
+        queue_name: str = None,
+        routing_key: str = "temperature.#",
+        exchange_name: Optional[str] = None,
+        manual_ack: bool = False,
+        prefetch_count: Optional[int] = None
+    ) -> None:
+        """Start delivering a queue's events to a callback"""
+        queue_name = queue_name or self.default_queue_name
+        consumer = self.declare_queue(queue_name, routing_key)
+        if manual_ack and prefetch_count:
+            consumer.permits = asyncio.Semaphore(prefetch_count)
+
+        async def run():
+            while True:
+                if consumer.permits is not None:
+                    await consumer.permits.acquire()
+                delivery = consumer.deliver(await consumer.queue.get())
+                try:
+                    if manual_ack:
+                        await callback(delivery.event, delivery)
+                    else:
+                        await callback(delivery.event)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error processing message: {e}")
+                    await self.retry_or_dead_letter(delivery, queue_name, e)
+                    continue
+                if not manual_ack:
+                    await delivery.ack()
+
+        consumer.worker = asyncio.create_task(run())
+        logger.info(
+            f"Started in-process consumer for queue '{queue_name}' with routing key '{routing_key}'"
+            f" (manual_ack={manual_ack}, prefetch={prefetch_count or 'unlimited'})"
+        )
+
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds an event waits before its nth retry"""
+        return self.retry_base_delay * 2 ** (attempt - 1)
+
+    async def retry_or_dead_letter(self, message: InProcessDelivery, queue_name: str, error: Any) -> bool:
+        """Redeliver a failed event after a backoff, or dead-letter it"""
+        attempt = message.retry_count + 1
+        if attempt > self.max_retries:
+            return await self.dead_letter(message, queue_name, error)
+
+        consumer = message._consumer
+        consumer.settle(message.delivery_tag)
+        asyncio.get_running_loop().call_later(
+            self.retry_delay(attempt), consumer.redeliver, message.event, message.routing_key, attempt
+        )
+        logger.warning(f"Retrying event in {self.retry_delay(attempt):.0f}s "
+                       f"(attempt {attempt}/{self.max_retries}): {error}")
+        return True
+
+    async def dead_letter(self, message: InProcessDelivery, queue_name: str, error: Any) -> bool:
+        """Keep a failed event in memory for inspection"""
+        message._consumer.settle(message.delivery_tag)
+        self.dead_letters.setdefault(queue_name, deque(maxlen=self.max_dead_letters)).append({
+            'event': message.event,
+            'routing_key': message.routing_key,
+            'retry_count': message.retry_count,
+            'error': str(error),
+            'failed_at': datetime.now(timezone.utc).isoformat(),
+        })
+        logger.error(f"Dead-lettered event from '{queue_name}': {error}")
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Depth and unacknowledged count per queue"""
+        return {
+            name: {
+                'depth': consumer.queue.qsize(),
+                'unacked': len(consumer.unacked),
+                'dead_letters': len(self.dead_letters.get(name, ())),
+            }
+            for name, consumer in self.consumers.items()
+        }
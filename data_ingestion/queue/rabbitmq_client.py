@@ -3,11 +3,20 @@ import json
 import uuid
 import aio_pika
 import logging
-from typing import Dict, Any, Optional, Callable, Awaitable
-from datetime import datetime
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+from datetime import datetime, timezone
+
+from data_ingestion.queue.base import QueueBackend
+from data_ingestion.queue.wire_format import CONTENT_TYPE_JSON, decode_body
 
 logger = logging.getLogger(__name__)
 
+# Headers carried by retried and dead-lettered messages
+RETRY_COUNT_HEADER = "x-retry-count"
+LAST_ERROR_HEADER = "x-last-error"
+ORIGINAL_ROUTING_KEY_HEADER = "x-original-routing-key"
+FAILED_AT_HEADER = "x-failed-at"
+
 
 # Custom JSON encoder for UUID objects
 class CustomJSONEncoder(json.JSONEncoder):
@@ -19,7 +28,7 @@ class CustomJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-class RabbitMQClient:
+class RabbitMQClient(QueueBackend):
     def __init__(
         self,
         host: str = os.getenv("RABBITMQ_HOST", "localhost"),
@@ -27,6 +36,8 @@ class RabbitMQClient:
         username: str = os.getenv("RABBITMQ_USER", "guest"),
         password: str = os.getenv("RABBITMQ_PASSWORD", "guest"),
         vhost: str = os.getenv("RABBITMQ_VHOST", "/"),
+        max_retries: int = int(os.getenv("RABBITMQ_MAX_RETRIES", "5")),
+        retry_base_delay: float = float(os.getenv("RABBITMQ_RETRY_BASE_DELAY", "5")),
     ):
         self.host = host
         self.port = port
@@ -36,12 +47,13 @@ class RabbitMQClient:
         self.connection = None
         self.channel = None
         self.exchange = None
+        self.dead_letter_exchange = None
         self.default_exchange_name = "temperature_data"
         self.default_queue_name = "temperature_readings"
-
-
-
-
+        self.dead_letter_exchange_name = "temperature_data.dead"
+        self.max_retries = max_retries  # Failed deliveries before a message is dead-lettered
+        self.retry_base_delay = retry_base_delay  # Seconds before the first retry, doubled per attempt
+        self._failure_topology = set()  # Queues whose retry and dead-letter queues are declared
 
     async def connect(self) -> None:
         """Connect to RabbitMQ server"""
@@ -52,6 +64,7 @@ class RabbitMQClient:
             # Connect to RabbitMQ
             self.connection = await aio_pika.connect_robust(connection_str)
             self.channel = await self.connection.channel()
+            self._failure_topology.clear()
             
             # Declare the exchange
             self.exchange = await self.channel.declare_exchange(
@@ -69,8 +82,248 @@ class RabbitMQClient:
         """Close the connection"""
         if self.connection:
             await self.connection.close()
+            self._failure_topology.clear()
             logger.info("RabbitMQ connection closed")
 
+    @staticmethod
+    def retry_queue_name(queue_name: str, attempt: int) -> str:
+        """Name of the queue holding messages waiting for their nth retry"""
+        return f"{queue_name}.retry.{attempt}"
+
+    @staticmethod
+    def dead_letter_queue_name(queue_name: str) -> str:
+        """Name of the queue holding messages that exhausted their retries"""
+        return f"{queue_name}.dead"
+
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds a message waits before its nth retry"""
+        return self.retry_base_delay * 2 ** (attempt - 1)
+
+    async def declare_failure_topology(self, queue_name: str) -> None:
+        """
+        Declare the retry and dead-letter queues of a work queue
+
+        Each retry attempt has its own queue whose message TTL is the backoff
+        for that attempt; expired messages are dead-lettered by the broker
+        through the default exchange straight back onto the work queue.
+        Messages that run out of attempts go to the dead-letter queue.
+        """
+        if queue_name in self._failure_topology:
+            return
+        if not self.connection or self.connection.is_closed:
+            await self.connect()
+            
+        for attempt in range(1, self.max_retries + 1):
+            await self.channel.declare_queue(
+                self.retry_queue_name(queue_name, attempt),
+                durable=True,
+                arguments={
+                    'x-message-ttl': int(self.retry_delay(attempt) * 1000),
+                    'x-dead-letter-exchange': '',
+                    'x-dead-letter-routing-key': queue_name,
+                }
+            )
+            
+        self.dead_letter_exchange = await self.channel.declare_exchange(
+            self.dead_letter_exchange_name,
+            aio_pika.ExchangeType.DIRECT,
+            durable=True
+        )
+        dead_letter_queue = await self.channel.declare_queue(
+            self.dead_letter_queue_name(queue_name),
+            durable=True
+        )
+        await dead_letter_queue.bind(self.dead_letter_exchange, queue_name)
+        
+        self._failure_topology.add(queue_name)
+
+    @staticmethod
+    def _header(message: aio_pika.abc.AbstractMessage, name: str, default: Any = None) -> Any:
+        """Read a message header, decoding byte strings"""
+        value = (message.headers or {}).get(name, default)
+        if isinstance(value, bytes):
+            return value.decode(errors='replace')
+        return value
+
+    def _failure_message(self, message: aio_pika.abc.AbstractMessage, headers: Dict[str, Any]) -> aio_pika.Message:
+        """Copy of a failed message with extra headers"""
+        return aio_pika.Message(
+            body=message.body,
+            content_type=message.content_type,
+            message_id=message.message_id,
+            headers={**(message.headers or {}), **headers},
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+        )
+
+    async def retry_or_dead_letter(
+        self,
+        message: aio_pika.abc.AbstractIncomingMessage,
+        queue_name: str,
+        error: Any
+    ) -> bool:
+        """
+        Schedule a failed message for a delayed retry, or dead-letter it
+        once it has been retried `max_retries` times
+        
+        The copy is published before the original is acked, so a crash in
+        between duplicates the message rather than losing it.
+        
+        Returns:
+            True if the message was handed off and acked, False if it was
+            left unacked for the broker to redeliver
+        """
+        attempt = int(self._header(message, RETRY_COUNT_HEADER, 0)) + 1
+        if attempt > self.max_retries:
+            return await self.dead_letter(message, queue_name, error)
+            
+        try:
+            await self.declare_failure_topology(queue_name)
+            await self.channel.default_exchange.publish(
+                self._failure_message(message, {
+                    RETRY_COUNT_HEADER: attempt,
+                    LAST_ERROR_HEADER: str(error)[:1000],
+                    ORIGINAL_ROUTING_KEY_HEADER: self._header(message, ORIGINAL_ROUTING_KEY_HEADER, message.routing_key),
+                }),
+                routing_key=self.retry_queue_name(queue_name, attempt)
+            )
+            await message.ack()
+            logger.warning(f"Retrying message in {self.retry_delay(attempt):.0f}s "
+                           f"(attempt {attempt}/{self.max_retries}): {error}")
+            return True
+        except Exception as e:
+            # Left unacked, the broker redelivers it once the channel recovers
+            logger.error(f"Could not schedule retry for message: {e}")
+            return False
+
+    async def dead_letter(
+        self,
+        message: aio_pika.abc.AbstractIncomingMessage,
+        queue_name: str,
+        error: Any
+    ) -> bool:
+        """Move a message to the dead-letter queue of a work queue, returning True once acked"""
+        try:
+            await self.declare_failure_topology(queue_name)
+            await self.dead_letter_exchange.publish(
+                self._failure_message(message, {
+                    LAST_ERROR_HEADER: str(error)[:1000],
+                    ORIGINAL_ROUTING_KEY_HEADER: self._header(message, ORIGINAL_ROUTING_KEY_HEADER, message.routing_key),
+                    FAILED_AT_HEADER: datetime.now(timezone.utc).isoformat(),
+                }),
+                routing_key=queue_name
+            )
+            await message.ack()
+            logger.error(f"Dead-lettered message to '{self.dead_letter_queue_name(queue_name)}': {error}")
+            return True
+        except Exception as e:
+            logger.error(f"Could not dead-letter message: {e}")
+            return False
+
+    async def _get_dead_letters(self, channel, queue_name: str, limit: int) -> List[aio_pika.abc.AbstractIncomingMessage]:
+        """Fetch up to `limit` dead-lettered messages without acknowledging them"""
+        queue = await channel.declare_queue(self.dead_letter_queue_name(queue_name), durable=True)
+        messages = []
+        while len(messages) < limit:
+            message = await queue.get(no_ack=False, fail=False)
+            if message is None:
+                break
+            messages.append(message)
+        return messages
+
+    def describe_dead_letter(self, message: aio_pika.abc.AbstractMessage) -> Dict[str, Any]:
+        """Summary of a dead-lettered message for inspection"""
+        try:
+            payload = decode_body(message.body, message.content_type)
+        except Exception:
+            payload = None
+        return {
+            'message_id': message.message_id,
+            'routing_key': self._header(message, ORIGINAL_ROUTING_KEY_HEADER),
+            'content_type': message.content_type,
+            'retry_count': self._header(message, RETRY_COUNT_HEADER, 0),
+            'error': self._header(message, LAST_ERROR_HEADER),
+            'failed_at': self._header(message, FAILED_AT_HEADER),
+            'size': len(message.body),
+            'payload': payload,
+        }
+
+    async def inspect_dead_letters(self, queue_name: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """
+        Look at dead-lettered messages without removing them
+        
+        Returns:
+            Dict with the queue depth and up to `limit` message summaries
+        """
+        if not self.connection or self.connection.is_closed:
+            await self.connect()
+        queue_name = queue_name or self.default_queue_name
+        await self.declare_failure_topology(queue_name)
+        
+        # Closing the channel returns every fetched message to the queue in order
+        channel = await self.connection.channel()
+        try:
+            queue = await channel.declare_queue(self.dead_letter_queue_name(queue_name), durable=True)
+            depth = queue.declaration_result.message_count
+            messages = await self._get_dead_letters(channel, queue_name, limit)
+            items = [self.describe_dead_letter(message) for message in messages]
+        finally:
+            await channel.close()
+            
+        return {'queue': self.dead_letter_queue_name(queue_name), 'total': depth, 'items': items}
+
+    async def replay_dead_letters(self, queue_name: Optional[str] = None, limit: int = 1000) -> int:
+        """
+        Publish dead-lettered messages back to their original routing key
+        with a fresh retry budget
+        
+        Returns:
+            Number of messages replayed
+        """
+        if not self.connection or self.connection.is_closed:
+            await self.connect()
+        queue_name = queue_name or self.default_queue_name
+        await self.declare_failure_topology(queue_name)
+        
+        channel = await self.connection.channel()
+        replayed = 0
+        try:
+            for message in await self._get_dead_letters(channel, queue_name, limit):
+                headers = {
+                    k: v for k, v in (message.headers or {}).items()
+                    if k not in (RETRY_COUNT_HEADER, LAST_ERROR_HEADER, FAILED_AT_HEADER, 'x-death')
+                }
+                routing_key = self._header(message, ORIGINAL_ROUTING_KEY_HEADER) or "temperature.reading"
+                await self.publish_bytes(
+                    message.body,
+                    routing_key=routing_key,
+                    content_type=message.content_type or CONTENT_TYPE_JSON,
+                    headers=headers
+                )
+                await message.ack()
+                replayed += 1
+        finally:
+            await channel.close()
+            
+        logger.info(f"Replayed {replayed} dead-lettered messages from '{self.dead_letter_queue_name(queue_name)}'")
+        return replayed
+
+    async def purge_dead_letters(self, queue_name: Optional[str] = None) -> int:
+        """
+        Drop every dead-lettered message of a work queue
+        
+        Returns:
+            Number of messages purged
+        """
+        if not self.connection or self.connection.is_closed:
+            await self.connect()
+        queue_name = queue_name or self.default_queue_name
+        await self.declare_failure_topology(queue_name)
+        
+        queue = await self.channel.declare_queue(self.dead_letter_queue_name(queue_name), durable=True)
+        result = await queue.purge()
+        logger.warning(f"Purged {result.message_count} dead-lettered messages from '{self.dead_letter_queue_name(queue_name)}'")
+        return result.message_count
+
     async def publish(
         self, 
         message: Dict[str, Any], 
@@ -88,6 +341,25 @@ class RabbitMQClient:
         # Convert message to JSON using the custom encoder
         message_body = json.dumps(message, cls=CustomJSONEncoder).encode()
         
+        await self.publish_bytes(
+            message_body,
+            routing_key=routing_key,
+            exchange_name=exchange_name,
+            content_type=CONTENT_TYPE_JSON
+        )
+
+    async def publish_bytes(
+        self,
+        body: bytes,
+        routing_key: str = "temperature.reading",
+        exchange_name: Optional[str] = None,
+        content_type: str = CONTENT_TYPE_JSON,
+        headers: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Publish an already encoded message body to the exchange"""
+        if not self.connection or self.connection.is_closed:
+            await self.connect()
+            
         # Get the exchange
         if exchange_name and exchange_name != self.default_exchange_name:
             exchange = await self.channel.declare_exchange(
@@ -101,7 +373,9 @@ class RabbitMQClient:
         # Publish the message
         await exchange.publish(
             aio_pika.Message(
-                body=message_body,
+                body=body,
+                content_type=content_type,
+                headers=headers,
                 delivery_mode=aio_pika.DeliveryMode.PERSISTENT
             ),
             routing_key=routing_key
@@ -111,15 +385,35 @@ class RabbitMQClient:
 
     async def consume(
         self,
-        callback: Callable[[Dict[str, Any]], Awaitable[None]],
+        callback: Callable[..., Awaitable[None]],
         queue_name: str = None,
         routing_key: str = "temperature.#",
-        exchange_name: Optional[str] = None
+        exchange_name: Optional[str] = None,
+        manual_ack: bool = False,
+        prefetch_count: Optional[int] = None
     ) -> None:
-        """Set up a consumer for a queue"""
+        """
+        Set up a consumer for a queue
+        
+        Args:
+            callback: Coroutine called with the decoded message body. With
+                `manual_ack` it is called as `callback(data, message)` and
+                becomes responsible for acking or nacking the message. If it
+                raises, the message is retried with backoff and dead-lettered
+                after `max_retries` attempts.
+            queue_name: Queue to consume from (defaults to `default_queue_name`)
+            routing_key: Binding key for the queue
+            exchange_name: Exchange to bind to (defaults to `default_exchange_name`)
+            manual_ack: Leave acknowledgement to the callback instead of acking on receipt
+            prefetch_count: Maximum number of unacknowledged messages delivered to this channel
+        """
         if not self.connection or self.connection.is_closed:
             await self.connect()
             
+        # Bound the number of unacknowledged messages in flight
+        if prefetch_count:
+            await self.channel.set_qos(prefetch_count=prefetch_count)
+            
         # Use default queue name if not provided
         if queue_name is None:
             queue_name = self.default_queue_name
@@ -144,20 +438,37 @@ class RabbitMQClient:
         # Bind the queue to the exchange
         await queue.bind(exchange, routing_key)
         
+        # Failed messages are retried with backoff, then dead-lettered
+        await self.declare_failure_topology(queue_name)
+        
         # Set up the consumer
         async def process_message(message: aio_pika.IncomingMessage) -> None:
-            async with message.process():
-                try:
-                    data = json.loads(message.body.decode())
+            try:
+                data = decode_body(message.body, message.content_type)
+            except Exception as e:
+                # Retrying will not make it decodable
+                await self.dead_letter(message, queue_name, f"Undecodable message: {e}")
+                return
+                
+            try:
+                if manual_ack:
+                    await callback(data, message)
+                else:
                     await callback(data)
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
-                    # Reject the message and requeue it
-                    await message.reject(requeue=True)
+            except Exception as e:
+                logger.error(f"Error processing message: {e}")
+                await self.retry_or_dead_letter(message, queue_name, e)
+                return
+                
+            if not manual_ack:
+                await message.ack()
         
         # Start consuming
         await queue.consume(process_message)
-        logger.info(f"Started consuming from queue '{queue_name}' with routing key '{routing_key}'")
+        logger.info(
+            f"Started consuming from queue '{queue_name}' with routing key '{routing_key}'"
+            f" (manual_ack={manual_ack}, prefetch={prefetch_count or 'unlimited'})"
+        )
 
 
 
@@ -0,0 +1,184 @@
+import json
+import struct
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+# Content types carried in the AMQP message properties
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_COMPACT = "application/x-temperature-batch"
+
+# Header carrying the compact format version
+VERSION_HEADER = "x-wire-version"
+COMPACT_VERSION = 2
+# Version 2 added MISSING_TIMESTAMP, which version 1 bodies never contain
+_READABLE_VERSIONS = (1, COMPACT_VERSION)
+
+# version, customer uuid, facility uuid, unit count, string count, reading count
+_HEADER = struct.Struct("<B16s16sHHI")
+# unit index, recorded_at epoch ms, temperature, quality score,
+# sensor id / equipment status / temperature unit string indexes
+_READING = struct.Struct("<HqffHHH")
+_STRING_LENGTH = struct.Struct("<H")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MS = timedelta(milliseconds=1)
+
+# recorded_at of a reading whose timestamp was missing or invalid; the
+# consumer substitutes its own clock, as it does for JSON messages
+MISSING_TIMESTAMP = -2 ** 63
+
+
+class WireFormatError(ValueError):
+    """Raised when a message body cannot be decoded"""
+
+
+def _to_epoch_ms(value: Any) -> int:
+    """
+    Convert a raw timestamp to epoch milliseconds, treating naive times as
+    UTC, or to MISSING_TIMESTAMP if there is none to convert
+    """
+    if isinstance(value, datetime):
+        timestamp = value
+    elif value:
+        try:
+            timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            logger.warning(f"Invalid timestamp format: {value}, sending it as missing")
+            return MISSING_TIMESTAMP
+    else:
+        return MISSING_TIMESTAMP
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - _EPOCH) // _MS
+
+
+def _to_float(value: Any, default: float) -> float:
+    """Convert a raw numeric value, falling back to a default"""
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def encode_envelope(envelope: Dict[str, Any]) -> bytes:
+    """
+    Encode a batch envelope into the compact binary format
+
+    Readings are normalized on the way in: timestamps become epoch
+    milliseconds, unit UUIDs and repeated strings become table indexes.
+
+    Args:
+        envelope: Envelope as built by `DataProcessor`
+
+    Returns:
+        Encoded message body
+    """
+    units: Dict[str, int] = {}
+    strings: Dict[str, int] = {}
+
+    def unit_index(unit_id: str) -> int:
+        return units.setdefault(unit_id, len(units))
+
+    def string_index(value: Any) -> int:
+        return strings.setdefault('' if value is None else str(value), len(strings))
+
+    body = []
+    for item in envelope['readings']:
+        data = item['data']
+        body.append(_READING.pack(
+            unit_index(item['unit_id']),
+            _to_epoch_ms(data.get('timestamp') or data.get('recorded_at') or data.get('reading_time')),
+            _to_float(data.get('temperature'), 0.0),
+            _to_float(data.get('quality_score'), 1.0),
+            string_index(data.get('sensor_id', '')),
+            string_index(data.get('equipment_status', 'normal')),
+            string_index(data.get('temperature_unit', 'C')),
+        ))
+
+    parts = [_HEADER.pack(
+        COMPACT_VERSION,
+        uuid.UUID(str(envelope['customer_id'])).bytes,
+        uuid.UUID(str(envelope['facility_id'])).bytes,
+        len(units),
+        len(strings),
+        len(body)
+    )]
+    parts.extend(uuid.UUID(unit_id).bytes for unit_id in units)
+    for value in strings:
+        encoded = value.encode('utf-8')
+        parts.append(_STRING_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    parts.extend(body)
+
+    return b"".join(parts)
+
+
+def decode_envelope(body: bytes) -> Dict[str, Any]:
+    """
+    Decode a compact message body into a batch envelope
+
+    Args:
+        body: Encoded message body
+
+    Returns:
+        Envelope with normalized reading data (aware UTC `recorded_at`, or
+        None where the timestamp was missing)
+    """
+    try:
+        version, customer_id, facility_id, unit_count, string_count, reading_count = \
+            _HEADER.unpack_from(body, 0)
+        if version not in _READABLE_VERSIONS:
+            raise WireFormatError(f"Unsupported compact format version: {version}")
+        offset = _HEADER.size
+
+        units: List[str] = []
+        for _ in range(unit_count):
+            units.append(str(uuid.UUID(bytes=body[offset:offset + 16])))
+            offset += 16
+
+        strings: List[str] = []
+        for _ in range(string_count):
+            (length,) = _STRING_LENGTH.unpack_from(body, offset)
+            offset += _STRING_LENGTH.size
+            strings.append(body[offset:offset + length].decode('utf-8'))
+            offset += length
+
+        readings = []
+        for unit, epoch_ms, temperature, quality, sensor, status, temp_unit in \
+                _READING.iter_unpack(body[offset:offset + reading_count * _READING.size]):
+            readings.append({
+                'unit_id': units[unit],
+                'data': {
+                    'recorded_at': None if epoch_ms == MISSING_TIMESTAMP else _EPOCH + epoch_ms * _MS,
+                    'temperature': temperature,
+                    'quality_score': quality,
+                    'sensor_id': strings[sensor],
+                    'equipment_status': strings[status],
+                    'temperature_unit': strings[temp_unit],
+                }
+            })
+        if len(readings) != reading_count:
+            raise WireFormatError(f"Expected {reading_count} readings, found {len(readings)}")
+    except (struct.error, IndexError, ValueError) as e:
+        raise WireFormatError(f"Malformed compact message: {e}") from e
+
+    return {
+        'event_type': 'temperature_reading_batch',
+        'customer_id': str(uuid.UUID(bytes=customer_id)),
+        'facility_id': str(uuid.UUID(bytes=facility_id)),
+        'readings': readings
+    }
+
+
+def decode_body(body: bytes, content_type: str = None) -> Dict[str, Any]:
+    """Decode a message body according to its AMQP content type"""
+    if content_type == CONTENT_TYPE_COMPACT:
+        return decode_envelope(body)
+    return json.loads(body.decode())
@@ -1,30 +1,77 @@
+import os
+import math
+import heapq
+import random
 import logging
 import asyncio
-import schedule
 import time
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 from database.connection import db
 from database.repositories.repositories import (
-    CustomerRepository, IngestionLogRepository
+    CustomerRepository, IngestionLogRepository, IngestionWatermarkRepository
 )
 from data_ingestion.collectors.api_collector import APICollector
 from data_ingestion.collectors.csv_collector import CSVCollector
 from data_ingestion.processors.data_processor import DataProcessor
+from data_ingestion.schedulers.sharding import ConsistentHashRing
+from data_ingestion.schedulers.leases import LeaseManager
 
 logger = logging.getLogger(__name__)
 
 
 class IngestionScheduler:
-    """Schedules data ingestion jobs based on customer configurations"""
+    """
+    Schedules data ingestion jobs based on customer configurations
+    
+    Runs are kept in a timer heap ordered by their next due time. Each
+    customer starts at a random offset within its period so customers with
+    the same frequency do not all fire together. A customer never has more
+    than one run in flight: a run that falls due while the previous one is
+    still going is coalesced into it, and missed runs are skipped rather
+    than replayed. A global semaphore bounds concurrent ingestions.
+    
+    With `shard_count` > 1 the scheduler only polls the customers that the
+    consistent hash ring assigns to `shard_index`, so several worker
+    processes can split the customer base between them. With leases, the
+    scheduler instead polls exactly the customers it holds a lease on,
+    which spreads them over replicas on any number of hosts and moves the
+    customers of a dead replica to the survivors.
+    """
 
-    def __init__(self):
+    supported_methods = ('api', 'csv')
+
+    def __init__(
+        self,
+        max_concurrent: int = int(os.getenv("INGESTION_MAX_CONCURRENT", "50")),
+        jitter_ratio: float = float(os.getenv("INGESTION_START_JITTER", "1.0")),
+        shard_index: int = int(os.getenv("INGESTION_SHARD_INDEX", "0")),
+        shard_count: int = int(os.getenv("INGESTION_SHARD_COUNT", "1")),
+        leases: Optional[LeaseManager] = None,
+        use_leases: bool = os.getenv("INGESTION_LEASES_ENABLED", "false").lower() == "true",
+    ):
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"Shard index {shard_index} is outside 0..{shard_count - 1}")
         self.api_collector = APICollector()
         self.csv_collector = CSVCollector()
         self.processor = DataProcessor()
         self.running_tasks = {}
         self.is_running = False
+        self.max_concurrent = max_concurrent
+        self.jitter_ratio = jitter_ratio  # Fraction of the period used to spread first runs
+        self.shard_index = shard_index
+        self.ring = ConsistentHashRing(shard_count)
+        self.leases = leases if leases is not None else (LeaseManager() if use_leases else None)
+        self._lease_task = None
+        self.customers: Dict[Any, Dict[str, Any]] = {}
+        self.coalesced_runs: Dict[Any, int] = {}
+        self._heap: List[Tuple[float, int, Any, int]] = []  # (due, seq, customer_id, generation)
+        self._generations: Dict[Any, int] = {}
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._loop_task = None
 
     async def start(self):
         """Start the scheduler"""
@@ -39,10 +86,14 @@ class IngestionScheduler:
         await self.csv_collector.initialize()
         
         # Schedule the initial runs
-        await self.schedule_all_customers()
+        if self.leases:
+            await self.sync_leases()
+            self._lease_task = asyncio.create_task(self._renew_leases())
+        else:
+            await self.schedule_all_customers()
         
         # Start the scheduler loop
-        asyncio.create_task(self._run_scheduler())
+        self._loop_task = asyncio.create_task(self._run_scheduler())
 
     async def stop(self):
         """Stop the scheduler"""
@@ -52,35 +103,144 @@ class IngestionScheduler:
         self.is_running = False
         logger.info("Stopping ingestion scheduler")
         
-        # Cancel all running tasks
-        for task in self.running_tasks.values():
+        # Stop the timer loop and cancel all running tasks
+        tasks = list(self.running_tasks.values())
+        if self._loop_task:
+            tasks.append(self._loop_task)
+        if self._lease_task:
+            tasks.append(self._lease_task)
+        for task in tasks:
             task.cancel()
-            
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
         # Clear the schedule
-        schedule.clear()
+        self._heap.clear()
+        self.customers.clear()
+        self.running_tasks.clear()
+        
+        # Hand our customers to the other replicas straight away
+        if self.leases:
+            try:
+                await self.leases.release_all()
+            except Exception as e:
+                logger.error(f"Error releasing customer leases: {e}")
         
         # Close collectors
         await self.api_collector.close()
         await self.csv_collector.close()
 
     async def _run_scheduler(self):
-        """Run the scheduler loop"""
+        """Run the timer loop, sleeping until the earliest due run"""
         while self.is_running:
-            # Run pending scheduled jobs
-            schedule.run_pending()
+            self._wakeup.clear()
+            
+            if self._heap:
+                delay = self._heap[0][0] - time.monotonic()
+            else:
+                delay = None
             
-            # Sleep for a short time
-            await asyncio.sleep(1)
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            due, _, customer_id, generation = heapq.heappop(self._heap)
+            
+            # Entries from before a reschedule or unschedule are dropped lazily
+            if self._generations.get(customer_id) != generation:
+                continue
+            
+            try:
+                self._dispatch(customer_id)
+                
+                # Next slot on the customer's grid, skipping any that were missed
+                frequency = self.customers[customer_id]['data_frequency_seconds']
+                now = time.monotonic()
+                periods = max(1, math.ceil((now - due) / frequency))
+                self._push(customer_id, due + periods * frequency, generation)
+            except Exception as e:
+                # One bad entry must not end polling for every other customer
+                logger.error(f"Dropping customer {customer_id} from the schedule: {e}", exc_info=True)
+                self.unschedule_customer(customer_id)
+
+    def _push(self, customer_id: Any, due: float, generation: int):
+        """Add a run to the timer heap"""
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, customer_id, generation))
+
+    def _dispatch(self, customer_id: Any):
+        """Start a run unless the previous one is still in flight"""
+        running = self.running_tasks.get(customer_id)
+        if running and not running.done():
+            self.coalesced_runs[customer_id] = self.coalesced_runs.get(customer_id, 0) + 1
+            logger.warning(f"Previous ingestion for customer {self.customers[customer_id]['customer_code']} "
+                           f"still running, coalescing this run into it")
+            return
+        
+        customer = self.customers[customer_id]
+        self.running_tasks[customer_id] = asyncio.create_task(self._run_job(customer))
+
+    async def _run_job(self, customer: Dict[str, Any]):
+        """Run one ingestion under the global concurrency limit"""
+        async with self._semaphore:
+            try:
+                await self.ingest_customer_data(customer)
+            except Exception as e:
+                logger.error(f"Error ingesting data for customer {customer['customer_code']}: {e}", exc_info=True)
             
+    def owns(self, customer_id: Any) -> bool:
+        """Whether this scheduler is responsible for a customer"""
+        if self.leases:
+            return customer_id in self.leases.owned
+        return self.ring.shard_for(customer_id) == self.shard_index
+
+    async def sync_leases(self):
+        """Renew and rebalance leases, then poll exactly the leased customers"""
+        owned = await self.leases.rebalance()
+        
+        # Start polling newly leased customers
+        customers = await CustomerRepository.get_all_active()
+        for customer in customers:
+            if customer['id'] in owned and customer['id'] not in self.customers:
+                await self.schedule_customer(customer)
+        
+        # Stop polling customers handed to other replicas
+        for customer_id in list(self.customers):
+            if customer_id not in owned:
+                self.unschedule_customer(customer_id)
+
+    async def _renew_leases(self):
+        """Keep the leases renewed while the scheduler runs"""
+        while self.is_running:
+            await asyncio.sleep(self.leases.renew_interval)
+            try:
+                await self.sync_leases()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error renewing customer leases: {e}")
+                if not self.leases.is_valid() and self.customers:
+                    # A peer may own these customers by now
+                    logger.warning(f"Leases expired without renewal, pausing {len(self.customers)} customers")
+                    for customer_id in list(self.customers):
+                        self.unschedule_customer(customer_id)
+
     async def schedule_all_customers(self):
-        """Schedule ingestion for all active customers"""
+        """Schedule ingestion for all active customers in this shard"""
         # Get all active customers
         customers = await CustomerRepository.get_all_active()
+        owned = [customer for customer in customers if self.owns(customer['id'])]
         
-        for customer in customers:
+        for customer in owned:
             await self.schedule_customer(customer)
             
-        logger.info(f"Scheduled ingestion for {len(customers)} active customers")
+        if self.ring.shard_count > 1:
+            logger.info(f"Scheduled ingestion for {len(owned)} of {len(customers)} active customers "
+                        f"(shard {self.shard_index + 1}/{self.ring.shard_count})")
+        else:
+            logger.info(f"Scheduled ingestion for {len(customers)} active customers")
 
     async def schedule_customer(self, customer: Dict[str, Any]):
         """Schedule ingestion for a single customer"""
@@ -89,36 +249,51 @@ class IngestionScheduler:
         method = customer['data_sharing_method']
         frequency = customer['data_frequency_seconds']
         
-        if customer_id in self.running_tasks:
-            logger.info(f"Rescheduling customer {customer_code}")
-            self.running_tasks[customer_id].cancel()
-            
-        # Define the job function
-        async def job():
-            try:
-                await self.ingest_customer_data(customer)
-            except Exception as e:
-                logger.error(f"Error ingesting data for customer {customer_code}: {e}", exc_info=True)
-                
-        # Schedule the job
-        if method == 'api':
-            # For API ingestion, use schedule library
-            schedule.every(frequency).seconds.do(
-                lambda: asyncio.create_task(job())
-            )
-        elif method == 'csv':
-            # For CSV ingestion, use schedule library
-            schedule.every(frequency).seconds.do(
-                lambda: asyncio.create_task(job())
-            )
-        else:
+        if method not in self.supported_methods:
             logger.warning(f"Unknown data sharing method for customer {customer_code}: {method}")
+            self.unschedule_customer(customer_id)
+            return
+        
+        # The column has no CHECK constraint; a zero period would spin the timer loop
+        if not isinstance(frequency, (int, float)) or not frequency > 0:
+            logger.warning(f"Invalid data frequency for customer {customer_code}: {frequency!r}, not scheduling")
+            self.unschedule_customer(customer_id)
             return
             
-        # Run immediately for the first time
-        self.running_tasks[customer_id] = asyncio.create_task(job())
+        if customer_id in self.customers:
+            logger.info(f"Rescheduling customer {customer_code}")
+            
+        # A new generation invalidates any run already in the heap
+        generation = self._generations.get(customer_id, 0) + 1
+        self._generations[customer_id] = generation
+        self.customers[customer_id] = customer
         
-        logger.info(f"Scheduled {method} ingestion for customer {customer_code} every {frequency} seconds")
+        # Spread first runs over the period so equal frequencies do not align
+        offset = random.uniform(0, frequency * self.jitter_ratio)
+        self._push(customer_id, time.monotonic() + offset, generation)
+        self._wakeup.set()
+        
+        logger.info(f"Scheduled {method} ingestion for customer {customer_code} every {frequency} seconds "
+                    f"(first run in {offset:.1f}s)")
+
+    def unschedule_customer(self, customer_id: Any):
+        """Stop scheduling a customer; a run in flight is allowed to finish"""
+        if customer_id in self._generations:
+            self._generations[customer_id] += 1
+        self.customers.pop(customer_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Scheduler load figures"""
+        return {
+            'shard_index': self.shard_index,
+            'shard_count': self.ring.shard_count,
+            'scheduled_customers': len(self.customers),
+            'in_flight': sum(1 for t in self.running_tasks.values() if not t.done()),
+            'max_concurrent': self.max_concurrent,
+            'coalesced_runs': sum(self.coalesced_runs.values()),
+            'fetches': self.api_collector.transport.get_stats(),
+            'leases': self.leases.get_stats() if self.leases else None,
+        }
 
     async def ingest_customer_data(self, customer: Dict[str, Any]):
         """Ingest data for a single customer"""
@@ -126,29 +301,50 @@ class IngestionScheduler:
         customer_code = customer['customer_code']
         method = customer['data_sharing_method']
         
+        # Leave the slot to healthy customers while this one is backing off
+        collector = self.csv_collector if method == 'csv' else self.api_collector
+        if not collector.transport.breaker(customer_id).available():
+            logger.debug(f"Skipping ingestion for customer {customer_code}: circuit open")
+            return
+        
         logger.info(f"Starting ingestion for customer {customer_code} via {method}")
         
+        # Only ask for data newer than what is already committed
+        since = await IngestionWatermarkRepository.get_high_water_mark(customer_id)
+        
         # Collect data based on method
         if method == 'api':
-            readings, log_data = await self.api_collector.collect(customer)
+            count = 0
+            
+            # Process readings into events before the response counts as fetched
+            async def process_readings(readings: List[Dict[str, Any]]):
+                nonlocal count
+                count = await self.processor.process_api_readings(customer_id, readings)
+            
+            _, log_data = await self.api_collector.collect(customer, since=since, on_batch=process_readings)
             
             # Create ingestion log
-            await IngestionLogRepository.create_log(log_data)
+            if log_data:
+                await IngestionLogRepository.create_log(log_data)
             
-            # Process readings into events
-            if readings:
-                count = await self.processor.process_api_readings(customer_id, readings)
+            if count:
                 logger.info(f"Processed {count} readings into events for customer {customer_code}")
                 
         elif method == 'csv':
-            readings, log_data = await self.csv_collector.collect(customer)
+            count = 0
+            
+            # Process rows into events while the file is still downloading
+            async def process_batch(rows: List[Dict[str, Any]]):
+                nonlocal count
+                count += await self.processor.process_csv_readings(customer_id, rows)
+            
+            _, log_data = await self.csv_collector.collect(customer, since=since, on_batch=process_batch)
             
             # Create ingestion log
-            await IngestionLogRepository.create_log(log_data)
+            if log_data:
+                await IngestionLogRepository.create_log(log_data)
             
-            # Process readings into events
-            if readings:
-                count = await self.processor.process_csv_readings(customer_id, readings)
+            if count:
                 logger.info(f"Processed {count} readings into events for customer {customer_code}")
                 
         else:
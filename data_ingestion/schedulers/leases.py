@@ -0,0 +1,103 @@
+import os
+import math
+import time
+import socket
+import logging
+from typing import Dict, Any, Optional, Set
+
+from database.repositories.repositories import IngestionLeaseRepository
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseManager:
+    """
+    Divides customers between ingestion replicas through database leases
+
+    Every `renew_interval` the replica heartbeats, renews the leases it
+    holds, and then moves towards its fair share of the active customers
+    (ceil(customers / live replicas)): it claims unleased or expired
+    customers while below the share and releases the excess when above it,
+    for instance after a peer joins. A replica that dies stops renewing and
+    its customers are claimed by the survivors once the leases expire.
+
+    Lease expiry is decided by the database clock. Locally the leases are
+    only trusted until `lease_ttl` after the start of the last successful
+    renewal, so a replica cut off from the database stops polling before a
+    peer can take its customers over.
+    """
+
+    def __init__(
+        self,
+        replica_id: Optional[str] = None,
+        lease_ttl: float = float(os.getenv("INGESTION_LEASE_TTL", "30")),
+        renew_interval: Optional[float] = None,
+    ):
+        # Unique per process, so supervisor workers are separate replicas
+        self.replica_id = replica_id or f"{os.getenv('INGESTION_REPLICA_ID') or socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+        self.renew_interval = renew_interval or lease_ttl / 3
+        self.owned: Set[Any] = set()
+        self.replicas = 1
+        self.fair_share = 0
+        self.valid_until = 0.0  # Monotonic time until which the leases are trusted
+        self.claimed = 0
+        self.released = 0
+
+    def is_valid(self) -> bool:
+        """Whether the leases were renewed recently enough to act on"""
+        return time.monotonic() < self.valid_until
+
+    async def rebalance(self) -> Set[Any]:
+        """
+        Renew leases and claim or release customers towards the fair share
+
+        Returns:
+            IDs of the customers this replica should poll
+        """
+        started = time.monotonic()
+
+        sizes = await IngestionLeaseRepository.heartbeat(self.replica_id, self.lease_ttl)
+        owned = await IngestionLeaseRepository.renew(self.replica_id, self.lease_ttl)
+        self.replicas = sizes['replicas']
+        self.fair_share = math.ceil(sizes['customers'] / self.replicas)
+
+        if len(owned) > self.fair_share:
+            excess = owned[self.fair_share:]
+            await IngestionLeaseRepository.release(self.replica_id, excess)
+            owned = owned[:self.fair_share]
+            self.released += len(excess)
+            logger.info(f"Released {len(excess)} customer leases to {self.replicas - 1} peer replicas")
+        elif len(owned) < self.fair_share:
+            claimed = await IngestionLeaseRepository.claim(
+                self.replica_id, self.lease_ttl, self.fair_share - len(owned)
+            )
+            owned.extend(claimed)
+            self.claimed += len(claimed)
+            if claimed:
+                logger.info(f"Claimed {len(claimed)} customer leases")
+
+        await IngestionLeaseRepository.prune_replicas(self.lease_ttl * 10)
+
+        self.owned = set(owned)
+        self.valid_until = started + self.lease_ttl
+        return self.owned
+
+    async def release_all(self):
+        """Give up every lease so peers can take over immediately"""
+        await IngestionLeaseRepository.release(self.replica_id)
+        self.owned = set()
+        self.valid_until = 0.0
+        logger.info(f"Released all customer leases held by replica {self.replica_id}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Lease ownership figures"""
+        return {
+            'replica_id': self.replica_id,
+            'owned': len(self.owned),
+            'fair_share': self.fair_share,
+            'live_replicas': self.replicas,
+            'valid': self.is_valid(),
+            'claimed_total': self.claimed,
+            'released_total': self.released,
+        }
@@ -0,0 +1,47 @@
+import bisect
+import hashlib
+from typing import Any, Dict, List
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash, identical in every process (unlike hash())"""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class ConsistentHashRing:
+    """
+    Maps customers to ingestion workers
+
+    Each shard owns `replicas` points on a hash ring and a key belongs to
+    the first point at or after its own hash. Growing from N to N+1 shards
+    moves only about 1/(N+1) of the customers, so a restart with more
+    workers does not reshuffle every customer's connection pool and
+    circuit breaker state.
+    """
+
+    def __init__(self, shard_count: int, replicas: int = 100):
+        if shard_count < 1:
+            raise ValueError(f"shard_count must be at least 1, got {shard_count}")
+        self.shard_count = shard_count
+        self.replicas = replicas
+        points = sorted(
+            (_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shard_count)
+            for replica in range(replicas)
+        )
+        self._points: List[int] = [point for point, _ in points]
+        self._shards: List[int] = [shard for _, shard in points]
+
+    def shard_for(self, key: Any) -> int:
+        """Shard index that owns a key"""
+        if self.shard_count == 1:
+            return 0
+        position = bisect.bisect_left(self._points, _hash(str(key)))
+        return self._shards[position % len(self._points)]
+
+    def distribution(self, keys: List[Any]) -> Dict[int, int]:
+        """Number of keys owned by each shard"""
+        counts = {shard: 0 for shard in range(self.shard_count)}
+        for key in keys:
+            counts[self.shard_for(key)] += 1
+        return counts
@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import queue
+import signal
+import asyncio
+import logging
+import multiprocessing
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _run_worker(shard_index: int, shard_count: int, status_queue: Any):
+    """Entry point of a worker process"""
+    # Imported here so the supervisor process never opens pools or queues
+    from data_ingestion.main import IngestionService
+
+    async def run():
+        service = IngestionService(shard_index=shard_index, shard_count=shard_count, status_queue=status_queue)
+        await service.run()
+
+    asyncio.run(run())
+
+
+class WorkerState:
+    """Supervisor's view of one worker process"""
+
+    def __init__(self, shard_index: int):
+        self.shard_index = shard_index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at: Optional[float] = None
+        self.restarts = 0
+        self.consecutive_failures = 0
+        self.restart_at: Optional[float] = None  # Set while waiting to restart a dead worker
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_report_at: Optional[float] = None
+
+
+class IngestionSupervisor:
+    """
+    Runs the ingestion service as several worker processes
+
+    Worker `i` of `N` runs its own scheduler, collectors and consumer and
+    polls only the customers that the consistent hash ring assigns to shard
+    `i`, so parsing and mapping spread across cores. Every event published
+    by a worker carries the `temperature.{customer}.{facility}.{unit}`
+    routing key; with the in-process queue a worker consumes exactly the
+    routing keys of its own customers, and with RabbitMQ the workers are
+    competing consumers of the shared queue. With database leases enabled
+    each worker is a lease replica of its own and the leases, not the
+    ring, decide which customers it polls.
+
+    Workers report their load every few seconds. The supervisor restarts
+    workers that exit, with exponential backoff, marks workers that stop
+    reporting as unhealthy, and writes the combined picture to
+    `status_file`.
+    """
+
+    def __init__(
+        self,
+        workers: int = int(os.getenv("INGESTION_WORKERS", "0")) or os.cpu_count() or 1,
+        status_interval: float = float(os.getenv("INGESTION_STATUS_INTERVAL", "10")),
+        status_file: Optional[str] = os.getenv("INGESTION_STATUS_FILE", "logs/ingestion_status.json"),
+        restart_backoff: float = 1.0,
+        max_restart_backoff: float = 60.0,
+        stop_timeout: float = 30.0,
+        poll_interval: float = 0.5,
+        target: Any = _run_worker,
+    ):
+        self.workers = workers
+        self.status_interval = status_interval
+        self.stale_after = status_interval * 3  # A worker silent for longer is unhealthy
+        self.status_file = status_file
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.stop_timeout = stop_timeout
+        self.poll_interval = poll_interval
+        self.target = target
+        # Spawned workers start from a fresh interpreter instead of a copy
+        # of the supervisor's event loop
+        self.context = multiprocessing.get_context("spawn")
+        self.status_queue = self.context.Queue()
+        self.states = {index: WorkerState(index) for index in range(workers)}
+        self.is_running = False
+        self.stop_event = asyncio.Event()
+
+    def start_worker(self, shard_index: int):
+        """Start (or restart) the worker for a shard"""
+        state = self.states[shard_index]
+        process = self.context.Process(
+            target=self.target,
+            args=(shard_index, self.workers, self.status_queue),
+            name=f"ingestion-worker-{shard_index}",
+            daemon=False,
+        )
+        process.start()
+        state.process = process
+        state.started_at = time.time()
+        state.restart_at = None
+        logger.info(f"Started ingestion worker {shard_index + 1}/{self.workers} (pid {process.pid})")
+
+    def check_workers(self):
+        """Restart workers that have exited, backing off if they keep dying"""
+        now = time.time()
+        for state in self.states.values():
+            if state.process is None or state.process.is_alive():
+                continue
+
+            if state.restart_at is None:
+                delay = min(self.max_restart_backoff, self.restart_backoff * 2 ** state.consecutive_failures)
+                state.consecutive_failures += 1
+                state.restart_at = now + delay
+                logger.error(f"Ingestion worker {state.shard_index} (pid {state.process.pid}) exited with "
+                             f"code {state.process.exitcode}, restarting in {delay:.0f}s")
+            elif now >= state.restart_at:
+                state.restarts += 1
+                self.start_worker(state.shard_index)
+
+    def collect_reports(self):
+        """Take every pending status report off the queue"""
+        while True:
+            try:
+                report = self.status_queue.get_nowait()
+            except queue.Empty:
+                return
+            state = self.states.get(report.get('shard_index'))
+            if state is None:
+                continue
+            state.last_report = report
+            state.last_report_at = time.time()
+            # A worker that reports is up, so the next crash starts a fresh backoff
+            state.consecutive_failures = 0
+
+    def get_status(self) -> Dict[str, Any]:
+        """Health and load of every worker, and totals across them"""
+        now = time.time()
+        workers = {}
+        totals = {
+            'healthy_workers': 0,
+            'scheduled_customers': 0,
+            'in_flight': 0,
+            'open_circuits': 0,
+            'pending_readings': 0,
+            'spooled_readings': 0,
+        }
+
+        for index, state in self.states.items():
+            alive = state.process is not None and state.process.is_alive()
+            report_age = now - state.last_report_at if state.last_report_at else None
+            # A worker that has not reported yet gets the same grace period
+            since = state.last_report_at or state.started_at or now
+            healthy = alive and now - since <= self.stale_after
+            workers[index] = {
+                'pid': state.process.pid if state.process else None,
+                'alive': alive,
+                'healthy': healthy,
+                'restarts': state.restarts,
+                'report_age_seconds': report_age,
+                'stats': state.last_report,
+            }
+
+            totals['healthy_workers'] += healthy
+            if state.last_report and alive:
+                scheduler = state.last_report['scheduler']
+                consumer = state.last_report['consumer']
+                totals['scheduled_customers'] += scheduler['scheduled_customers']
+                totals['in_flight'] += scheduler['in_flight']
+                totals['open_circuits'] += scheduler['open_circuits']
+                totals['pending_readings'] += consumer['pending_readings']
+                if consumer.get('spool'):
+                    totals['spooled_readings'] += consumer['spool']['readings']
+
+        return {'workers': workers, 'totals': totals, 'updated_at': now}
+
+    def write_status(self):
+        """Write the combined status to the status file"""
+        if not self.status_file:
+            return
+        status = self.get_status()
+        directory = os.path.dirname(self.status_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.status_file + ".tmp"
+        with open(temporary, 'w') as f:
+            json.dump(status, f, indent=2, default=str)
+        os.replace(temporary, self.status_file)
+
+    async def start(self):
+        """Start every worker"""
+        if self.is_running:
+            return
+        self.is_running = True
+        logger.info(f"Starting ingestion supervisor with {self.workers} workers")
+        for index in self.states:
+            self.start_worker(index)
+
+    async def stop(self):
+        """Ask every worker to stop, killing those that do not exit in time"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        logger.info("Stopping ingestion supervisor")
+
+        processes = [s.process for s in self.states.values() if s.process is not None and s.process.is_alive()]
+        for process in processes:
+            process.terminate()  # SIGTERM: the worker's own handler shuts it down cleanly
+
+        deadline = time.monotonic() + self.stop_timeout
+        for process in processes:
+            await asyncio.get_running_loop().run_in_executor(
+                None, process.join, max(0.0, deadline - time.monotonic())
+            )
+            if process.is_alive():
+                logger.warning(f"Worker pid {process.pid} did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+        self.collect_reports()
+        self.write_status()
+        self.stop_event.set()
+        logger.info("Ingestion supervisor stopped")
+
+    async def supervise(self):
+        """Collect reports, restart dead workers and publish the status until stopped"""
+        last_write = 0.0
+        while self.is_running:
+            self.collect_reports()
+            self.check_workers()
+
+            if time.monotonic() - last_write >= self.status_interval:
+                last_write = time.monotonic()
+                self.write_status()
+                totals = self.get_status()['totals']
+                logger.info(f"Ingestion workers healthy: {totals['healthy_workers']}/{self.workers}, "
+                            f"customers: {totals['scheduled_customers']}, in flight: {totals['in_flight']}, "
+                            f"pending readings: {totals['pending_readings']}, "
+                            f"spooled readings: {totals['spooled_readings']}")
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self):
+        """Run the workers until stopped"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, lambda: asyncio.create_task(self.stop()))
+
+        await self.start()
+        supervise_task = asyncio.create_task(self.supervise())
+        await self.stop_event.wait()
+        await asyncio.gather(supervise_task, return_exceptions=True)
@@ -0,0 +1,187 @@
+import os
+import re
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from database.connection import db
+
+logger = logging.getLogger(__name__)
+
+# Numbered files only; unnumbered scripts in the directory are ad hoc
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# Transaction control lines of a file; the runner supplies its own transaction
+_TRANSACTION_LINE = re.compile(r"^\s*(BEGIN|COMMIT)\s*;\s*$", re.IGNORECASE | re.MULTILINE)
+
+# Serializes runners started at the same time, e.g. by several replicas
+_MIGRATION_LOCK_KEY = "schema_migrations"
+
+
+class Migration:
+    """One numbered SQL file"""
+
+    def __init__(self, path: Path):
+        match = MIGRATION_FILE.match(path.name)
+        self.path = path
+        self.version = match.group(1)
+        self.name = match.group(2)
+        self.sql = path.read_text()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+        # The file's statements without its own BEGIN; / COMMIT; lines
+        self.body = _TRANSACTION_LINE.sub("", self.sql)
+
+
+class MigrationRunner:
+    """
+    Applies the numbered SQL files of `directory` in order
+
+    Every applied version is recorded in `table_name` with the checksum of
+    its file, so each migration runs once and edited files are reported.
+    Files keep their BEGIN; / COMMIT; lines so they can be run by hand with
+    psql; the runner drops those lines and runs each file together with
+    the insert recording it in one transaction, so a crash never leaves a
+    migration applied but unrecorded.
+
+    The early migrations are stubs, so the base schema only comes from
+    schema.sql: a new database is created from it and baselined (versions
+    recorded without running them), and migrating a database with nothing
+    recorded is refused.
+    """
+
+    def __init__(
+        self,
+        directory: str = os.getenv("MIGRATIONS_DIR", str(Path(__file__).parent / "migrations")),
+        table_name: str = "public.schema_migrations",
+    ):
+        self.directory = Path(directory)
+        self.table_name = table_name
+
+    def discover(self) -> List[Migration]:
+        """Migration files in version order"""
+        migrations = [
+            Migration(path) for path in self.directory.iterdir()
+            if MIGRATION_FILE.match(path.name)
+        ]
+        migrations.sort(key=lambda m: int(m.version))
+        versions = [m.version for m in migrations]
+        duplicates = {v for v in versions if versions.count(v) > 1}
+        if duplicates:
+            raise ValueError(f"Duplicate migration versions: {', '.join(sorted(duplicates))}")
+        return migrations
+
+    async def _ensure_table(self, conn):
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                version TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+
+    async def _applied(self, conn) -> Dict[str, Dict[str, Any]]:
+        rows = await conn.fetch(f"SELECT version, name, checksum, applied_at FROM {self.table_name}")
+        return {row['version']: dict(row) for row in rows}
+
+    async def _record(self, conn, migration: Migration):
+        await conn.execute(
+            f"INSERT INTO {self.table_name} (version, name, checksum) VALUES ($1, $2, $3)",
+            migration.version, migration.name, migration.checksum
+        )
+
+    async def status(self) -> List[Dict[str, Any]]:
+        """
+        State of every migration file
+
+        Returns:
+            One dict per file with its version, name, applied_at (None if
+            pending) and whether the file changed since it was applied
+        """
+        async with await db.transaction() as conn:
+            await self._ensure_table(conn)
+            applied = await self._applied(conn)
+
+        return [
+            {
+                'version': m.version,
+                'name': m.name,
+                'applied_at': applied[m.version]['applied_at'] if m.version in applied else None,
+                'changed': m.version in applied and applied[m.version]['checksum'] != m.checksum,
+            }
+            for m in self.discover()
+        ]
+
+    async def migrate(self, target: Optional[str] = None) -> List[str]:
+        """
+        Apply every pending migration up to `target` (default: the latest)
+
+        Returns:
+            Versions applied
+
+        Raises:
+            RuntimeError: If no migration is recorded yet: the database is
+                either empty or was created from schema.sql, and in both
+                cases needs schema.sql and a baseline rather than the
+                migrations
+        """
+        applied_now = []
+        async with await db.transaction() as conn:
+            await conn.execute("SELECT pg_advisory_lock(hashtext($1))", _MIGRATION_LOCK_KEY)
+            try:
+                await self._ensure_table(conn)
+                applied = await self._applied(conn)
+
+                if not applied:
+                    if await conn.fetchval("SELECT to_regclass('public.temperature_readings') IS NOT NULL"):
+                        raise RuntimeError(
+                            f"{self.table_name} is empty but the schema already exists; "
+                            f"record the versions it contains with a baseline first"
+                        )
+                    raise RuntimeError(
+                        "The database is empty and the early migrations are stubs; "
+                        "load database/schema.sql and then record a baseline"
+                    )
+
+                for migration in self.discover():
+                    if target is not None and int(migration.version) > int(target):
+                        break
+                    if migration.version in applied:
+                        if applied[migration.version]['checksum'] != migration.checksum:
+                            logger.warning(f"Migration {migration.path.name} changed after it was applied")
+                        continue
+
+                    logger.info(f"Applying migration {migration.path.name}")
+                    async with conn.transaction():
+                        await conn.execute(migration.body)
+                        await self._record(conn, migration)
+                    applied_now.append(migration.version)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(hashtext($1))", _MIGRATION_LOCK_KEY)
+
+        return applied_now
+
+    async def baseline(self, version: Optional[str] = None) -> List[str]:
+        """
+        Record migrations up to `version` (default: the latest) as applied without running them
+
+        Returns:
+            Versions recorded
+        """
+        recorded = []
+        async with await db.transaction() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", _MIGRATION_LOCK_KEY)
+                await self._ensure_table(conn)
+                applied = await self._applied(conn)
+                for migration in self.discover():
+                    if version is not None and int(migration.version) > int(version):
+                        break
+                    if migration.version not in applied:
+                        await self._record(conn, migration)
+                        recorded.append(migration.version)
+
+        if recorded:
+            logger.info(f"Baselined migrations {', '.join(recorded)}")
+        return recorded
@@ -1,2 +1,3 @@
 -- SQL stub for 003_add_indexes.sql
--- TODO: add migration / schema
+-- The reading index set depends on the natural key (004) and the partition
+-- layout (007), so it is created by 010_reading_indexes.sql.
@@ -0,0 +1,28 @@
+-- =============================================================================
+-- 004: Natural key on temperature_readings
+-- =============================================================================
+-- Readings are identified by (storage_unit_id, recorded_at, sensor_id) so the
+-- ingestion pipeline can insert with ON CONFLICT DO NOTHING and overlapping
+-- customer API windows no longer create duplicate rows.
+-- =============================================================================
+
+BEGIN;
+
+-- NULL sensor IDs never conflict, so store them as ''
+UPDATE public.temperature_readings SET sensor_id = '' WHERE sensor_id IS NULL;
+ALTER TABLE public.temperature_readings ALTER COLUMN sensor_id SET DEFAULT '';
+ALTER TABLE public.temperature_readings ALTER COLUMN sensor_id SET NOT NULL;
+
+-- Keep the first copy of every reading that was ingested more than once
+DELETE FROM public.temperature_readings a
+USING public.temperature_readings b
+WHERE a.storage_unit_id = b.storage_unit_id
+  AND a.recorded_at = b.recorded_at
+  AND a.sensor_id = b.sensor_id
+  AND a.id > b.id;
+
+ALTER TABLE public.temperature_readings
+    ADD CONSTRAINT temperature_readings_natural_key
+    UNIQUE (storage_unit_id, recorded_at, sensor_id);
+
+COMMIT;
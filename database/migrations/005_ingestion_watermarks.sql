@@ -0,0 +1,24 @@
+-- =============================================================================
+-- 005: Per-customer ingestion high-water marks
+-- =============================================================================
+-- The consumer records the latest committed recorded_at per customer and the
+-- collectors pass it upstream as `since`, so each poll only transfers new data.
+-- =============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.ingestion_watermarks (
+    customer_id UUID PRIMARY KEY REFERENCES public.customers(id) ON DELETE CASCADE,
+    high_water_mark TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.ingestion_watermarks IS 'Latest committed reading time per customer, used for incremental polling.';
+
+-- Seed from the readings that are already stored
+INSERT INTO public.ingestion_watermarks (customer_id, high_water_mark)
+SELECT customer_id, MAX(recorded_at)
+FROM public.temperature_readings
+GROUP BY customer_id
+ON CONFLICT (customer_id) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,30 @@
+-- =============================================================================
+-- 006: Poll ownership leases for ingestion replicas
+-- =============================================================================
+-- Each ingestion replica heartbeats into ingestion_replicas and holds a
+-- time-limited lease on every customer it polls. Replicas renew their leases,
+-- claim expired or unowned ones up to a fair share of the active customers,
+-- and release any excess when peers join, so customers of a dead replica are
+-- picked up once its leases expire. All times are database times.
+-- =============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.ingestion_replicas (
+    replica_id TEXT PRIMARY KEY,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.ingestion_replicas IS 'Live ingestion replicas, used to size each replica''s share of customers.';
+
+CREATE TABLE IF NOT EXISTS public.ingestion_leases (
+    customer_id UUID PRIMARY KEY REFERENCES public.customers(id) ON DELETE CASCADE,
+    owner TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    acquired_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.ingestion_leases IS 'Which ingestion replica polls each customer, and until when.';
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_leases_owner ON public.ingestion_leases(owner);
+
+COMMIT;
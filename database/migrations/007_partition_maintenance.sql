@@ -0,0 +1,36 @@
+-- =============================================================================
+-- 007: Pre-created partitions instead of the per-row partition trigger
+-- =============================================================================
+-- insert_temperature_trigger looked up pg_tables for every inserted reading.
+-- Partitions are now created ahead of time by the partition manager
+-- (database/partitions.py), which the ingestion service runs periodically and
+-- which is also available as scripts/manage_partitions.py for backfills.
+-- This migration creates the current and next three monthly partitions so
+-- inserts keep working until the manager first runs.
+-- =============================================================================
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS insert_temperature_trigger ON public.temperature_readings;
+DROP FUNCTION IF EXISTS create_temperature_partition_if_not_exists();
+
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+    partition_name TEXT;
+BEGIN
+    FOR i IN 0..3 LOOP
+        month_start := date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => i);
+        partition_name := 'temperature_readings_history_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.temperature_readings FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start AT TIME ZONE 'UTC',
+                (month_start + interval '1 month') AT TIME ZONE 'UTC'
+            );
+        END IF;
+    END LOOP;
+END $$;
+
+COMMIT;
@@ -0,0 +1,88 @@
+-- =============================================================================
+-- 008: Hourly and daily reading rollups per storage unit
+-- =============================================================================
+-- Analytics used to group the raw temperature_readings on every request.
+-- Each rollup row holds the count, sum, sum of squares, min and max of one
+-- storage unit's temperatures in one UTC hour or day, plus good-quality and
+-- per-status counts. Inserts update both rollups in the same statement
+-- (ReadingRollupRepository.wrap_insert) and the ingestion service rebuilds
+-- recent buckets periodically (database/rollups.py); older ranges can be
+-- rebuilt with scripts/rebuild_rollups.py.
+-- This migration backfills the rollups from the existing readings, which
+-- reads the whole readings table once.
+-- =============================================================================
+
+BEGIN;
+
+-- Adds up two {status: count} objects, used when new readings join a rollup bucket
+CREATE OR REPLACE FUNCTION public.merge_status_counts(a JSONB, b JSONB)
+RETURNS JSONB AS $$
+    SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+    FROM (
+        SELECT key, SUM(value::bigint) AS total
+        FROM (SELECT * FROM jsonb_each_text(a) UNION ALL SELECT * FROM jsonb_each_text(b)) counts
+        GROUP BY key
+    ) merged
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Table: temperature_rollup_hourly
+CREATE TABLE IF NOT EXISTS public.temperature_rollup_hourly (
+    storage_unit_id UUID NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL, -- start of the UTC hour
+    customer_id UUID NOT NULL,
+    facility_id UUID NOT NULL,
+    reading_count BIGINT NOT NULL,
+    temperature_sum DOUBLE PRECISION NOT NULL,
+    temperature_sum_squares DOUBLE PRECISION NOT NULL,
+    temperature_min REAL NOT NULL,
+    temperature_max REAL NOT NULL,
+    good_quality_count BIGINT NOT NULL, -- readings with quality_score = 1
+    status_counts JSONB NOT NULL DEFAULT '{}', -- readings per equipment_status
+    first_recorded_at TIMESTAMPTZ NOT NULL,
+    last_recorded_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (storage_unit_id, bucket)
+);
+COMMENT ON TABLE public.temperature_rollup_hourly IS 'Per storage unit hourly reading aggregates, maintained on insert.';
+
+-- Table: temperature_rollup_daily
+CREATE TABLE IF NOT EXISTS public.temperature_rollup_daily (LIKE public.temperature_rollup_hourly INCLUDING ALL);
+COMMENT ON COLUMN public.temperature_rollup_daily.bucket IS 'Start of the UTC day';
+COMMENT ON TABLE public.temperature_rollup_daily IS 'Per storage unit daily reading aggregates, maintained on insert.';
+
+CREATE INDEX IF NOT EXISTS idx_temperature_rollup_hourly_customer ON public.temperature_rollup_hourly(customer_id, bucket);
+CREATE INDEX IF NOT EXISTS idx_temperature_rollup_daily_customer ON public.temperature_rollup_daily(customer_id, bucket);
+
+-- Backfill from the existing readings
+DO $$
+DECLARE
+    granularity TEXT;
+BEGIN
+    FOREACH granularity IN ARRAY ARRAY['hour', 'day'] LOOP
+        EXECUTE format($sql$
+            INSERT INTO public.%I (
+                storage_unit_id, bucket, customer_id, facility_id, reading_count,
+                temperature_sum, temperature_sum_squares, temperature_min, temperature_max,
+                good_quality_count, status_counts, first_recorded_at, last_recorded_at, updated_at
+            )
+            SELECT storage_unit_id, bucket, customer_id, facility_id,
+                   SUM(n), SUM(s), SUM(ss), MIN(lo), MAX(hi), SUM(good),
+                   jsonb_object_agg(status, n), MIN(first_at), MAX(last_at), NOW()
+            FROM (
+                SELECT storage_unit_id, date_trunc(%L, recorded_at, 'UTC') AS bucket,
+                       customer_id, facility_id, COALESCE(equipment_status, 'unknown') AS status,
+                       COUNT(*) AS n, SUM(temperature::float8) AS s,
+                       SUM(temperature::float8 * temperature::float8) AS ss,
+                       MIN(temperature) AS lo, MAX(temperature) AS hi,
+                       COUNT(*) FILTER (WHERE quality_score = 1) AS good,
+                       MIN(recorded_at) AS first_at, MAX(recorded_at) AS last_at
+                FROM public.temperature_readings
+                GROUP BY 1, 2, 3, 4, 5
+            ) per_status
+            GROUP BY storage_unit_id, bucket, customer_id, facility_id
+            ON CONFLICT (storage_unit_id, bucket) DO NOTHING
+        $sql$, CASE granularity WHEN 'hour' THEN 'temperature_rollup_hourly' ELSE 'temperature_rollup_daily' END, granularity);
+    END LOOP;
+END $$;
+
+COMMIT;
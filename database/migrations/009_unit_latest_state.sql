@@ -0,0 +1,58 @@
+-- =============================================================================
+-- 009: Latest reading of every storage unit
+-- =============================================================================
+-- "Current temperature" queries used DISTINCT ON or ORDER BY recorded_at DESC
+-- LIMIT 1 subqueries over the readings. unit_latest_state holds each unit's
+-- newest reading and is upserted by the same statement that inserts the
+-- readings (TemperatureReadingRepository.wrap_insert), so those queries are
+-- primary key lookups. Late readings never replace a newer state. This
+-- migration fills the table from the existing readings and points the
+-- latest_temperature_readings view at it.
+-- =============================================================================
+
+BEGIN;
+
+-- Table: unit_latest_state
+CREATE TABLE IF NOT EXISTS public.unit_latest_state (
+    storage_unit_id UUID PRIMARY KEY, -- no foreign key, so a reading for an unknown unit never fails the insert
+    customer_id UUID NOT NULL,
+    facility_id UUID NOT NULL,
+    reading_id BIGINT NOT NULL, -- id of the reading in temperature_readings
+    temperature REAL NOT NULL,
+    temperature_unit VARCHAR(8) NOT NULL,
+    recorded_at TIMESTAMPTZ NOT NULL,
+    sensor_id VARCHAR(255) NOT NULL DEFAULT '',
+    quality_score REAL,
+    equipment_status VARCHAR(64),
+    reading_created_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.unit_latest_state IS 'Latest reading of every storage unit, maintained on insert.';
+
+CREATE INDEX IF NOT EXISTS idx_unit_latest_state_customer ON public.unit_latest_state(customer_id, recorded_at DESC);
+
+INSERT INTO public.unit_latest_state (
+    storage_unit_id, customer_id, facility_id, reading_id, temperature, temperature_unit,
+    recorded_at, sensor_id, quality_score, equipment_status, reading_created_at, updated_at
+)
+SELECT DISTINCT ON (r.storage_unit_id)
+    r.storage_unit_id, r.customer_id, r.facility_id, r.id, r.temperature, r.temperature_unit,
+    r.recorded_at, r.sensor_id, r.quality_score, r.equipment_status, r.created_at, NOW()
+FROM public.temperature_readings r
+ORDER BY r.storage_unit_id, r.recorded_at DESC, r.id DESC
+ON CONFLICT (storage_unit_id) DO NOTHING;
+
+CREATE OR REPLACE VIEW public.latest_temperature_readings AS
+SELECT
+    s.reading_id AS id,
+    s.customer_id,
+    s.facility_id,
+    s.storage_unit_id,
+    s.temperature,
+    s.temperature_unit,
+    s.recorded_at,
+    s.sensor_id,
+    s.quality_score
+FROM public.unit_latest_state s;
+
+COMMIT;
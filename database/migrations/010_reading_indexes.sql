@@ -0,0 +1,48 @@
+-- =============================================================================
+-- 010: Index set for the API's reading queries
+-- =============================================================================
+-- The readings were indexed on recorded_at and storage_unit_id separately,
+-- while the API filters on customer_id or facility_id and pages by
+-- recorded_at DESC, and the alarm history only wants warning/error rows.
+--   * (customer_id, recorded_at DESC) and (facility_id, recorded_at DESC)
+--     serve the listings without a sort.
+--   * A partial index serves the alarm history.
+--   * Unit listings use the natural key (storage_unit_id, recorded_at,
+--     sensor_id) scanned backwards, so the single-column unit index goes.
+--   * The parent-level recorded_at B-tree becomes one index per partition,
+--     so the partition manager can swap it for BRIN on old partitions
+--     (READINGS_BRIN_AFTER_PERIODS).
+-- scripts/check_query_plans.py checks that the API queries use these.
+-- =============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_temperature_readings_customer_time ON public.temperature_readings (customer_id, recorded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_temperature_readings_facility_time ON public.temperature_readings (facility_id, recorded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_temperature_readings_alarms ON public.temperature_readings (customer_id, recorded_at DESC)
+    WHERE equipment_status IN ('warning', 'error');
+
+DROP INDEX IF EXISTS public.idx_temperature_readings_unit_id;
+DROP INDEX IF EXISTS public.idx_temperature_readings_recorded_at;
+
+DO $$
+DECLARE
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.temperature_readings'::regclass
+    LOOP
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON public.%I (recorded_at DESC)',
+            partition_name || '_recorded_at_idx',
+            partition_name
+        );
+    END LOOP;
+END $$;
+
+COMMIT;
+
+ANALYZE public.temperature_readings;
@@ -0,0 +1,16 @@
+-- =============================================================================
+-- 011: Index for paging ingestion logs
+-- =============================================================================
+-- The admin ingestion log listing pages by (start_time DESC, id DESC), with
+-- OFFSET or with a keyset cursor, optionally for one customer. ingestion_logs
+-- had no index besides its primary key, so every page sorted the whole table.
+-- The reading listings page by (recorded_at DESC, id DESC) on the indexes
+-- from 010; the id tiebreak is an incremental sort within equal timestamps.
+-- =============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_logs_start_time ON public.ingestion_logs (start_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_ingestion_logs_customer_start_time ON public.ingestion_logs (customer_id, start_time DESC, id DESC);
+
+COMMIT;
@@ -0,0 +1,42 @@
+-- =============================================================================
+-- 012: Notify the ingestion service of hierarchy changes
+-- =============================================================================
+-- The ingestion service caches the facility/unit code -> ID hierarchy
+-- (HierarchyIndex) and LISTENs on 'hierarchy_changed' to reload it. The
+-- triggers sending those notifications were only in schema.sql, so a
+-- database upgraded through the migrations never reloaded the cache and
+-- dropped readings for new units until a restart. The statements are
+-- idempotent, so databases created from schema.sql are unaffected.
+-- =============================================================================
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.notify_hierarchy_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_customer UUID;
+BEGIN
+    IF TG_TABLE_NAME = 'facilities' THEN
+        changed_customer := COALESCE(NEW.customer_id, OLD.customer_id);
+    ELSE
+        SELECT customer_id INTO changed_customer
+        FROM public.facilities
+        WHERE id = COALESCE(NEW.facility_id, OLD.facility_id);
+    END IF;
+    
+    PERFORM pg_notify('hierarchy_changed', COALESCE(changed_customer::TEXT, ''));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS facilities_hierarchy_notify ON public.facilities;
+CREATE TRIGGER facilities_hierarchy_notify
+    AFTER INSERT OR UPDATE OR DELETE ON public.facilities
+    FOR EACH ROW EXECUTE FUNCTION public.notify_hierarchy_changed();
+
+DROP TRIGGER IF EXISTS storage_units_hierarchy_notify ON public.storage_units;
+CREATE TRIGGER storage_units_hierarchy_notify
+    AFTER INSERT OR UPDATE OR DELETE ON public.storage_units
+    FOR EACH ROW EXECUTE FUNCTION public.notify_hierarchy_changed();
+
+COMMIT;
@@ -0,0 +1,311 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import asyncpg
+
+from database.connection import db
+
+logger = logging.getLogger(__name__)
+
+MONTHLY = "month"
+DAILY = "day"
+
+# Serializes maintenance across ingestion replicas and the CLI
+_MAINTENANCE_LOCK_KEY = "temperature_readings_partitions"
+
+
+class TimestampOutOfRangeError(ValueError):
+    """A reading time outside the window partitions are created for"""
+
+
+class PartitionManager:
+    """
+    Creates the range partitions of `temperature_readings` ahead of time
+
+    Partitions cover whole UTC months (`temperature_readings_history_YYYY_MM`)
+    or, for high-volume fleets, whole UTC days
+    (`temperature_readings_history_YYYY_MM_DD`). `maintain` keeps the
+    current period and the next `periods_ahead` in place, and
+    `ensure_range` creates whatever a backfill needs. Each partition gets
+    the parent's indexes (the natural key, recorded_at and storage unit)
+    as it is created, so inserts are plain appends with no per-row
+    catalog lookups.
+
+    Periods that overlap a partition of another granularity (after
+    switching from monthly to daily) are skipped with a warning, so old
+    data keeps its monthly partitions.
+
+    Partitions get their own index on recorded_at: a B-tree while they are
+    recent, swapped for a much smaller BRIN index once their period ended
+    more than `brin_after` periods ago. Old readings arrive in time order,
+    so block ranges summarize them well and range scans stay cheap.
+
+    Partitions are only created on demand for readings at most
+    `max_age_days` old and `max_future_hours` ahead; see `accepts`.
+    """
+
+    def __init__(
+        self,
+        interval: str = os.getenv("READINGS_PARTITION_INTERVAL", MONTHLY),
+        periods_ahead: Optional[int] = None,
+        maintenance_interval: float = float(os.getenv("READINGS_PARTITION_MAINTENANCE_INTERVAL", "3600")),
+        table_name: str = "public.temperature_readings",
+        brin_after: Optional[int] = None,
+        max_age_days: float = float(os.getenv("READINGS_MAX_AGE_DAYS", "1095")),
+        max_future_hours: float = float(os.getenv("READINGS_MAX_FUTURE_HOURS", "24")),
+    ):
+        if interval not in (MONTHLY, DAILY):
+            raise ValueError(f"Unknown partition interval: {interval}")
+        if periods_ahead is None:
+            # Enough runway to survive a few missed maintenance runs
+            periods_ahead = int(os.getenv("READINGS_PARTITIONS_AHEAD", "3" if interval == MONTHLY else "14"))
+        if brin_after is None:
+            brin_after = int(os.getenv("READINGS_BRIN_AFTER_PERIODS", "1" if interval == MONTHLY else "7"))
+        self.interval = interval
+        self.periods_ahead = periods_ahead
+        self.brin_after = brin_after
+        self.maintenance_interval = maintenance_interval
+        # Readings outside this window are rejected rather than given partitions
+        self.max_age = timedelta(days=max_age_days)
+        self.max_future = timedelta(hours=max_future_hours)
+        self.table_name = table_name
+        self.partition_prefix = f"{table_name.split('.', 1)[1]}_history_"
+        self._task = None
+
+    # Period arithmetic
+
+    def period_start(self, moment: datetime) -> datetime:
+        """Start of the UTC period containing a moment (naive moments are UTC)"""
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        moment = moment.astimezone(timezone.utc)
+        if self.interval == DAILY:
+            return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    def next_period(self, start: datetime) -> datetime:
+        """Start of the period after the one starting at `start`"""
+        if self.interval == DAILY:
+            return start + timedelta(days=1)
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+
+    def previous_period(self, start: datetime) -> datetime:
+        """Start of the period before the one starting at `start`"""
+        if self.interval == DAILY:
+            return start - timedelta(days=1)
+        if start.month == 1:
+            return start.replace(year=start.year - 1, month=12)
+        return start.replace(month=start.month - 1)
+
+    def partition_name(self, start: datetime) -> str:
+        """Name of the partition for the period starting at `start`"""
+        suffix = start.strftime("%Y_%m_%d" if self.interval == DAILY else "%Y_%m")
+        return f"{self.partition_prefix}{suffix}"
+
+    def partition_end(self, name: str) -> Optional[datetime]:
+        """End of the period a partition covers, from its name (either granularity)"""
+        suffix = name[len(self.partition_prefix):]
+        for fmt, interval in (("%Y_%m_%d", DAILY), ("%Y_%m", MONTHLY)):
+            try:
+                start = datetime.strptime(suffix, fmt).replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            if interval == DAILY:
+                return start + timedelta(days=1)
+            return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+        return None
+
+    def periods(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Bounds of every period overlapping [start, end]"""
+        bounds = []
+        current = self.period_start(start)
+        end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+        while current <= end:
+            following = self.next_period(current)
+            bounds.append((current, following))
+            current = following
+        return bounds
+
+    def accepts(self, moment: datetime, now: Optional[datetime] = None) -> bool:
+        """
+        Whether a reading time is recent enough, and not too far ahead, to
+        be given a partition
+
+        A garbage timestamp such as the epoch would otherwise create every
+        partition between it and now in one DDL transaction.
+        """
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        now = now or datetime.now(timezone.utc)
+        return now - self.max_age <= moment <= now + self.max_future
+
+    # Database operations
+
+    async def existing_partitions(self, conn=None) -> Dict[str, str]:
+        """Partition names and bound expressions attached to the table"""
+        query = """
+            SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = $1::regclass
+            ORDER BY c.relname
+        """
+        rows = await (conn.fetch(query, self.table_name) if conn else db.fetch(query, self.table_name))
+        return {row['name']: row['bound'] for row in rows}
+
+    async def ensure_range(self, start: datetime, end: datetime) -> List[str]:
+        """
+        Create any missing partitions for readings between two moments
+
+        Args:
+            start: Earliest reading time to cover
+            end: Latest reading time to cover
+
+        Returns:
+            Names of the partitions created
+        """
+        return await self._create(self.periods(start, end))
+
+    async def ensure_periods(self, moments: Iterable[datetime]) -> List[str]:
+        """
+        Create any missing partitions for the periods containing the given
+        reading times, and none of the periods in between
+
+        Args:
+            moments: Reading times to cover
+
+        Returns:
+            Names of the partitions created
+        """
+        starts = sorted({self.period_start(moment) for moment in moments})
+        return await self._create([(start, self.next_period(start)) for start in starts])
+
+    async def _create(self, bounds: List[Tuple[datetime, datetime]]) -> List[str]:
+        """Create the partitions for the given period bounds that do not exist yet"""
+        schema = self.table_name.split('.', 1)[0]
+        created = []
+        async with await db.transaction() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", _MAINTENANCE_LOCK_KEY)
+                existing = await self.existing_partitions(conn)
+
+                for lower, upper in bounds:
+                    name = self.partition_name(lower)
+                    if name in existing:
+                        continue
+                    try:
+                        # Savepoint so an overlapping period does not abort the others
+                        async with conn.transaction():
+                            await conn.execute(
+                                f"CREATE TABLE {schema}.{name} PARTITION OF {self.table_name} "
+                                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+                            )
+                            await conn.execute(
+                                f"CREATE INDEX IF NOT EXISTS {name}_recorded_at_idx ON {schema}.{name} (recorded_at DESC)"
+                            )
+                    except asyncpg.exceptions.InvalidObjectDefinitionError as e:
+                        logger.warning(f"Skipping partition {name}: {e}")
+                        continue
+                    created.append(name)
+
+        if created:
+            logger.info(f"Created {len(created)} {self.table_name} partitions: {', '.join(created)}")
+        return created
+
+    async def index_partitions(self, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """
+        Give recent partitions a B-tree on recorded_at and old ones a BRIN index
+
+        Returns:
+            Partitions that were given a B-tree ('btree') or moved to BRIN ('brin')
+        """
+        schema = self.table_name.split('.', 1)[0]
+        cutoff = self.period_start(now or datetime.now(timezone.utc))
+        for _ in range(self.brin_after):
+            cutoff = self.previous_period(cutoff)
+
+        changed = {'btree': [], 'brin': []}
+        async with await db.transaction() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", _MAINTENANCE_LOCK_KEY)
+                partitions = await self.existing_partitions(conn)
+                rows = await conn.fetch(
+                    "SELECT indexname FROM pg_indexes WHERE schemaname = $1 AND tablename LIKE $2",
+                    schema, f"{self.partition_prefix}%"
+                )
+                indexes = {row['indexname'] for row in rows}
+
+                for name in partitions:
+                    end = self.partition_end(name)
+                    if end is None:
+                        continue
+                    btree, brin = f"{name}_recorded_at_idx", f"{name}_recorded_at_brin"
+                    if end <= cutoff:
+                        if brin not in indexes:
+                            await conn.execute(f"CREATE INDEX {brin} ON {schema}.{name} USING brin (recorded_at)")
+                            changed['brin'].append(name)
+                        if btree in indexes:
+                            await conn.execute(f"DROP INDEX {schema}.{btree}")
+                    elif btree not in indexes:
+                        await conn.execute(f"CREATE INDEX {btree} ON {schema}.{name} (recorded_at DESC)")
+                        changed['btree'].append(name)
+
+        if changed['btree'] or changed['brin']:
+            logger.info(f"Indexed {self.table_name} partitions on recorded_at: "
+                        f"B-tree {changed['btree']}, BRIN {changed['brin']}")
+        return changed
+
+    async def maintain(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Make sure the current period and the next `periods_ahead` have
+        partitions, and that every partition has the right recorded_at index
+
+        Returns:
+            Names of the partitions created
+        """
+        start = self.period_start(now or datetime.now(timezone.utc))
+        end = start
+        for _ in range(self.periods_ahead):
+            end = self.next_period(end)
+        created = await self.ensure_range(start, end)
+        await self.index_partitions(now)
+        return created
+
+    @staticmethod
+    def is_missing_partition_error(error: Exception) -> bool:
+        """Whether an insert failed because no partition accepts the row"""
+        return isinstance(error, asyncpg.exceptions.CheckViolationError) and "no partition" in str(error)
+
+    # Background maintenance
+
+    async def _run(self):
+        while True:
+            try:
+                await self.maintain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Partition maintenance failed: {e}")
+            await asyncio.sleep(self.maintenance_interval)
+
+    def start(self):
+        """Run maintenance now and then every `maintenance_interval` seconds"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background maintenance"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+# Manager shared by the ingestion service and the consumer's backfill path
+partition_manager = PartitionManager()
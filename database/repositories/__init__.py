@@ -1,6 +1,8 @@
 
 from .repositories import (
     CustomerRepository, CustomerTokenRepository, FacilityRepository,
-    StorageUnitRepository, TemperatureReadingRepository,
-    SystemConfigRepository, IngestionLogRepository
+    StorageUnitRepository, TemperatureReadingRepository, ReadingRollupRepository,
+    UnitLatestStateRepository,
+    SystemConfigRepository, IngestionLogRepository,
+    IngestionWatermarkRepository, IngestionLeaseRepository
 )
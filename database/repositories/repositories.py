@@ -1,7 +1,9 @@
+import os
 import uuid
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+import asyncpg
 from database.connection import db
 from database.models.models import (
     Customer, CustomerToken, Facility, StorageUnit, 
@@ -10,6 +12,13 @@ from database.models.models import (
 
 logger = logging.getLogger(__name__)
 
+# Failures of COPY itself, after which the VALUES insert can still succeed
+_COPY_ERRORS = (
+    asyncpg.exceptions.FeatureNotSupportedError,
+    asyncpg.exceptions.InsufficientPrivilegeError,  # No TEMPORARY privilege for the staging table
+    asyncpg.InterfaceError,                         # COPY protocol errors on the client
+)
+
 
 class BaseRepository:
     """Base repository with common CRUD operations"""
@@ -126,34 +135,183 @@ class TemperatureReadingRepository(BaseRepository):
     """Repository for TemperatureReading table operations"""
     table_name = "public.temperature_readings"
 
+    # Column order of the tuple records used by the bulk insert paths.
+    # `id` is a BIGSERIAL and is always left to the database.
+    record_columns = (
+        'customer_id', 'facility_id', 'storage_unit_id', 'temperature',
+        'temperature_unit', 'recorded_at', 'sensor_id', 'quality_score',
+        'equipment_status', 'created_at'
+    )
+
+    # Natural key used to drop re-delivered and re-polled readings
+    natural_key = ('storage_unit_id', 'recorded_at', 'sensor_id')
+
+    # Session-local table the COPY path loads before merging into the parent table
+    staging_table = "temperature_readings_staging"
+
+    # 'copy' uses binary COPY, 'values' uses multi-row INSERT ... VALUES
+    insert_mode = os.getenv("READINGS_INSERT_MODE", "copy")
+
+    # Skip rows whose natural key already exists (ON CONFLICT DO NOTHING)
+    skip_duplicates = os.getenv("READINGS_SKIP_DUPLICATES", "true").lower() == "true"
+
+    # Postgres rejects statements with more than 32767 bind parameters
+    max_bind_params = 32767
+
     @classmethod
-    async def create_batch(cls, readings: List[Dict[str, Any]]) -> int:
-        """Create multiple temperature readings in a batch"""
+    def to_record(cls, reading: Dict[str, Any]) -> tuple:
+        """Convert a mapped reading dict to a tuple in `record_columns` order"""
+        return (
+            reading['customer_id'],
+            reading['facility_id'],
+            reading['storage_unit_id'],
+            reading['temperature'],
+            reading.get('temperature_unit', 'C'),
+            reading['recorded_at'],
+            # NULLs never conflict, so a missing sensor is stored as ''
+            reading.get('sensor_id') or '',
+            reading.get('quality_score'),
+            reading.get('equipment_status', 'normal'),
+            reading.get('created_at') or datetime.now(),
+        )
+
+    @classmethod
+    async def create_batch(cls, readings: List[Any], use_copy: Optional[bool] = None, conn=None) -> int:
+        """
+        Create multiple temperature readings in a batch
+        
+        Args:
+            readings: Mapped reading dicts or tuples in `record_columns` order
+            use_copy: Force the COPY path on or off (defaults to `insert_mode`)
+            conn: Connection with an open transaction to write on; a pooled
+                connection and transaction are used when omitted
+            
+        Returns:
+            Number of rows inserted (duplicates are not counted)
+        """
         if not readings:
             return 0
+        
+        records = [r if isinstance(r, tuple) else cls.to_record(r) for r in readings]
+        
+        if use_copy is None:
+            use_copy = cls.insert_mode == 'copy'
+        
+        if conn is None:
+            async with await db.transaction() as conn:
+                async with conn.transaction():
+                    return await cls._write_records(conn, records, use_copy)
+        
+        return await cls._write_records(conn, records, use_copy)
+
+    @classmethod
+    async def _write_records(cls, conn, records: List[tuple], use_copy: bool) -> int:
+        """
+        Write tuple records with COPY, falling back to INSERT ... VALUES
+        when COPY itself is unavailable; any other error is raised as is
+        """
+        if use_copy:
+            try:
+                # Savepoint so a failed COPY leaves the outer transaction usable
+                async with conn.transaction():
+                    return await cls._copy_records(conn, records)
+            except _COPY_ERRORS as e:
+                # Bad values and lost connections would fail the VALUES insert too
+                if isinstance(e, ValueError) or conn.is_closed():
+                    raise
+                logger.warning(f"COPY insert failed, falling back to VALUES insert: {e}")
+        
+        return await cls._insert_values(conn, records)
+
+    @classmethod
+    def _conflict_clause(cls) -> str:
+        """ON CONFLICT clause for the natural key, if duplicates are skipped"""
+        if not cls.skip_duplicates:
+            return ""
+        return f" ON CONFLICT ({', '.join(cls.natural_key)}) DO NOTHING"
+
+    @classmethod
+    async def _copy_records(cls, conn, records: List[tuple]) -> int:
+        """Insert tuple records using binary COPY"""
+        column_str = ", ".join(cls.record_columns)
+        
+        # COPY can neither skip conflicts nor feed the derived tables, so
+        # load a staging table and merge from it
+        await conn.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {cls.staging_table}
+            AS SELECT {column_str} FROM {cls.table_name} WITH NO DATA
+        """)
+        await conn.copy_records_to_table(
+            cls.staging_table,
+            records=records,
+            columns=list(cls.record_columns)
+        )
+        count = await cls._execute_insert(
+            conn,
+            f"INSERT INTO {cls.table_name} ({column_str}) "
+            f"SELECT {column_str} FROM {cls.staging_table}"
+            f"{cls._conflict_clause()}"
+        )
+        await conn.execute(f"TRUNCATE {cls.staging_table}")
+        
+        return count
+
+    @classmethod
+    async def _insert_values(cls, conn, records: List[tuple]) -> int:
+        """Insert tuple records with multi-row INSERT statements below the bind parameter limit"""
+        column_count = len(cls.record_columns)
+        column_str = ", ".join(cls.record_columns)
+        rows_per_statement = cls.max_bind_params // column_count
+        
+        count = 0
+        for start in range(0, len(records), rows_per_statement):
+            chunk = records[start:start + rows_per_statement]
+            
+            # Build VALUES part with placeholders
+            placeholder_rows = []
+            values = []
+            for i, record in enumerate(chunk):
+                placeholders = ", ".join(f"${j + 1 + i * column_count}" for j in range(column_count))
+                placeholder_rows.append(f"({placeholders})")
+                values.extend(record)
+            
+            values_str = ", ".join(placeholder_rows)
             
-        # Prepare batch insert
-        columns = readings[0].keys()
-        column_str = ", ".join(columns)
-        
-        # Build VALUES part with placeholders
-        placeholder_rows = []
-        values = []
-        for i, reading in enumerate(readings):
-            placeholders = ", ".join(f"${j + 1 + i * len(columns)}" for j in range(len(columns)))
-            placeholder_rows.append(f"({placeholders})")
-            values.extend([reading[col] for col in columns])
-        
-        values_str = ", ".join(placeholder_rows)
-        
-        # Execute batch insert
-        query = f"INSERT INTO {cls.table_name} ({column_str}) VALUES {values_str}"
-        result = await db.execute(query, *values)
-        
-        # Parse count from result string like "INSERT 0 42"
-        count = int(result.split(" ")[2]) if result else 0
+            # Execute batch insert
+            query = (
+                f"INSERT INTO {cls.table_name} ({column_str}) VALUES {values_str}"
+                f"{cls._conflict_clause()}"
+            )
+            count += await cls._execute_insert(conn, query, *values)
+        
         return count
 
+    @classmethod
+    def wrap_insert(cls, insert_sql: str, select: str = "COUNT(*)") -> str:
+        """
+        Extend an INSERT into the readings table with the writes derived from its rows
+        
+        The latest state of each unit and, when enabled, the rollups are
+        updated by the same statement, so they commit with the readings.
+        
+        Args:
+            insert_sql: INSERT statement without a RETURNING clause
+            select: What the statement returns, computed over the inserted rows
+            
+        Returns:
+            A single statement; rows skipped by ON CONFLICT DO NOTHING are
+            not returned by the INSERT and so never reach the derived tables
+        """
+        derived = [f"latest_state AS ({UnitLatestStateRepository.upsert_sql('inserted')})"]
+        if ReadingRollupRepository.enabled:
+            derived.extend(ReadingRollupRepository.upsert_ctes('inserted'))
+        return f"WITH inserted AS ({insert_sql} RETURNING *), {', '.join(derived)} SELECT {select} FROM inserted"
+
+    @classmethod
+    async def _execute_insert(cls, conn, query: str, *args) -> int:
+        """Run an INSERT into the readings table along with its derived writes"""
+        return await conn.fetchval(cls.wrap_insert(query), *args)
+
     @classmethod
     async def get_recent_by_unit(cls, storage_unit_id: str, limit: int = 100) -> List[Dict[str, Any]]:
         """Get recent readings for a storage unit"""
@@ -166,6 +324,306 @@ class TemperatureReadingRepository(BaseRepository):
         return await db.fetch(query, storage_unit_id, limit)
 
 
+class UnitLatestStateRepository(BaseRepository):
+    """
+    Repository for the latest reading of every storage unit
+
+    Kept current by every insert into `temperature_readings` (see
+    `TemperatureReadingRepository.wrap_insert`), so "current temperature"
+    queries are primary key lookups instead of scans of the readings.
+    """
+    table_name = "public.unit_latest_state"
+
+    @classmethod
+    def upsert_sql(cls, source: str) -> str:
+        """INSERT moving each unit's state to its newest reading in `source`, unless it already has a newer one"""
+        return f"""
+            INSERT INTO {cls.table_name} AS s (
+                storage_unit_id, customer_id, facility_id, reading_id, temperature, temperature_unit,
+                recorded_at, sensor_id, quality_score, equipment_status, reading_created_at, updated_at
+            )
+            SELECT DISTINCT ON (storage_unit_id)
+                storage_unit_id, customer_id, facility_id, id, temperature, temperature_unit,
+                recorded_at, sensor_id, quality_score, equipment_status, created_at, NOW()
+            FROM {source}
+            ORDER BY storage_unit_id, recorded_at DESC, id DESC
+            ON CONFLICT (storage_unit_id) DO UPDATE SET
+                customer_id = EXCLUDED.customer_id, facility_id = EXCLUDED.facility_id,
+                reading_id = EXCLUDED.reading_id, temperature = EXCLUDED.temperature,
+                temperature_unit = EXCLUDED.temperature_unit, recorded_at = EXCLUDED.recorded_at,
+                sensor_id = EXCLUDED.sensor_id, quality_score = EXCLUDED.quality_score,
+                equipment_status = EXCLUDED.equipment_status, reading_created_at = EXCLUDED.reading_created_at,
+                updated_at = EXCLUDED.updated_at
+            -- Late readings never replace a newer state
+            WHERE EXCLUDED.recorded_at >= s.recorded_at
+        """
+
+
+class ReadingRollupRepository(BaseRepository):
+    """
+    Repository for the hourly and daily per-storage-unit reading rollups
+
+    Each rollup row holds the count, sum, sum of squares, min and max of the
+    temperatures of one storage unit in one UTC bucket, along with the
+    number of good-quality readings and a count per equipment status.
+    Inserts into `temperature_readings` update both rollups in the same
+    statement (see `TemperatureReadingRepository.wrap_insert`), and `rebuild` recomputes buckets from the
+    raw readings for late or out-of-band writes.
+    """
+    tables = {
+        'day': "public.temperature_rollup_daily",
+        'hour': "public.temperature_rollup_hourly",
+    }
+    bucket_sizes = {'day': timedelta(days=1), 'hour': timedelta(hours=1)}
+
+    # Written on every insert and read by the analytics endpoints
+    enabled = os.getenv("READINGS_ROLLUPS_ENABLED", "true").lower() == "true"
+
+    columns = (
+        'storage_unit_id', 'bucket', 'customer_id', 'facility_id', 'reading_count',
+        'temperature_sum', 'temperature_sum_squares', 'temperature_min', 'temperature_max',
+        'good_quality_count', 'status_counts', 'first_recorded_at', 'last_recorded_at', 'updated_at'
+    )
+
+    # How an incremental update combines an existing row with the new rows
+    merge_expressions = {
+        'reading_count': "r.reading_count + EXCLUDED.reading_count",
+        'temperature_sum': "r.temperature_sum + EXCLUDED.temperature_sum",
+        'temperature_sum_squares': "r.temperature_sum_squares + EXCLUDED.temperature_sum_squares",
+        'temperature_min': "LEAST(r.temperature_min, EXCLUDED.temperature_min)",
+        'temperature_max': "GREATEST(r.temperature_max, EXCLUDED.temperature_max)",
+        'good_quality_count': "r.good_quality_count + EXCLUDED.good_quality_count",
+        'status_counts': "public.merge_status_counts(r.status_counts, EXCLUDED.status_counts)",
+        'first_recorded_at': "LEAST(r.first_recorded_at, EXCLUDED.first_recorded_at)",
+        'last_recorded_at': "GREATEST(r.last_recorded_at, EXCLUDED.last_recorded_at)",
+        'updated_at': "EXCLUDED.updated_at",
+    }
+
+    @classmethod
+    def _aggregate_sql(cls, granularity: str, source: str) -> str:
+        """SELECT that rolls the readings of `source` up into `granularity` buckets"""
+        return f"""
+            SELECT storage_unit_id, bucket, customer_id, facility_id,
+                   SUM(n) AS reading_count, SUM(s) AS temperature_sum, SUM(ss) AS temperature_sum_squares,
+                   MIN(lo) AS temperature_min, MAX(hi) AS temperature_max, SUM(good) AS good_quality_count,
+                   jsonb_object_agg(status, n) AS status_counts,
+                   MIN(first_at) AS first_recorded_at, MAX(last_at) AS last_recorded_at, NOW() AS updated_at
+            FROM (
+                SELECT storage_unit_id, date_trunc('{granularity}', recorded_at, 'UTC') AS bucket,
+                       customer_id, facility_id, COALESCE(equipment_status, 'unknown') AS status,
+                       COUNT(*) AS n, SUM(temperature::float8) AS s,
+                       SUM(temperature::float8 * temperature::float8) AS ss,
+                       MIN(temperature) AS lo, MAX(temperature) AS hi,
+                       COUNT(*) FILTER (WHERE quality_score = 1) AS good,
+                       MIN(recorded_at) AS first_at, MAX(recorded_at) AS last_at
+                FROM {source}
+                GROUP BY 1, 2, 3, 4, 5
+            ) per_status
+            GROUP BY storage_unit_id, bucket, customer_id, facility_id
+            -- A fixed row order keeps concurrent writers from deadlocking
+            ORDER BY storage_unit_id, bucket
+        """
+
+    @classmethod
+    def _upsert_sql(cls, granularity: str, source: str, replace: bool = False) -> str:
+        """INSERT that adds the readings of `source` to the rollup, or replaces the buckets"""
+        updates = ", ".join(
+            f"{column} = {'EXCLUDED.' + column if replace else cls.merge_expressions[column]}"
+            for column in cls.merge_expressions
+        )
+        return f"""
+            INSERT INTO {cls.tables[granularity]} AS r ({', '.join(cls.columns)})
+            {cls._aggregate_sql(granularity, source)}
+            ON CONFLICT (storage_unit_id, bucket) DO UPDATE SET {updates}
+        """
+
+    @classmethod
+    def upsert_ctes(cls, source: str) -> List[str]:
+        """CTEs adding the readings of `source` to every rollup (see TemperatureReadingRepository.wrap_insert)"""
+        return [
+            f"{granularity}_rollup AS ({cls._upsert_sql(granularity, source)})"
+            for granularity in cls.tables
+        ]
+
+    @classmethod
+    async def rebuild(cls, start: datetime, end: datetime) -> Dict[str, int]:
+        """
+        Recompute every hourly and daily bucket overlapping [start, end] from the raw readings
+
+        Buckets that no longer have readings are removed.
+
+        Args:
+            start: Earliest reading time to cover
+            end: Latest reading time to cover
+
+        Returns:
+            Number of buckets written per granularity
+        """
+        rebuilt = {}
+        async with await db.transaction() as conn:
+            async with conn.transaction():
+                # Waits for in-flight incremental updates and holds new ones
+                # back until commit, so neither overwrites the other; reads
+                # are not blocked
+                await conn.execute(f"LOCK TABLE {', '.join(cls.tables.values())} IN EXCLUSIVE MODE")
+
+                for granularity, table in cls.tables.items():
+                    lower = cls.bucket_floor(start, granularity)
+                    upper = cls.bucket_floor(end, granularity) + cls.bucket_sizes[granularity]
+                    source = (
+                        f"(SELECT * FROM {TemperatureReadingRepository.table_name} "
+                        f"WHERE recorded_at >= $1 AND recorded_at < $2) readings"
+                    )
+                    query = f"""
+                        WITH fresh AS ({cls._aggregate_sql(granularity, source)}),
+                        written AS (
+                            INSERT INTO {table} AS r ({', '.join(cls.columns)})
+                            SELECT * FROM fresh
+                            ON CONFLICT (storage_unit_id, bucket) DO UPDATE
+                            SET {', '.join(f'{column} = EXCLUDED.{column}' for column in cls.merge_expressions)}
+                            RETURNING 1
+                        ),
+                        removed AS (
+                            DELETE FROM {table} t
+                            WHERE t.bucket >= $1 AND t.bucket < $2
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM fresh
+                                  WHERE fresh.storage_unit_id = t.storage_unit_id AND fresh.bucket = t.bucket
+                              )
+                        )
+                        SELECT COUNT(*) FROM written
+                    """
+                    rebuilt[granularity] = await conn.fetchval(query, lower, upper)
+
+        return rebuilt
+
+    # Query planning for readers
+
+    @staticmethod
+    def _as_utc(moment: datetime) -> datetime:
+        """Aware UTC datetime for a moment (naive moments are UTC)"""
+        if moment.tzinfo is None:
+            return moment.replace(tzinfo=timezone.utc)
+        return moment.astimezone(timezone.utc)
+
+    @classmethod
+    def bucket_floor(cls, moment: datetime, granularity: str) -> datetime:
+        """Start of the UTC bucket containing a moment (naive moments are UTC)"""
+        moment = cls._as_utc(moment)
+        if granularity == 'day':
+            return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def bucket_ceil(cls, moment: datetime, granularity: str) -> datetime:
+        """Start of the first UTC bucket at or after a moment"""
+        floor = cls.bucket_floor(moment, granularity)
+        return floor if floor == cls._as_utc(moment) else floor + cls.bucket_sizes[granularity]
+
+    @classmethod
+    def levels_for(cls, group_by: List[str]) -> List[str]:
+        """
+        Rollups able to answer a query grouped by `group_by`, coarsest first
+
+        Returns:
+            An empty list when only the raw readings can answer it (per-sensor groups)
+        """
+        if not cls.enabled or 'sensor' in group_by:
+            return []
+        if 'hour' in group_by:
+            return ['hour']
+        return ['day', 'hour']
+
+    @classmethod
+    def cover(cls, levels: List[str], start: Optional[datetime], end: Optional[datetime],
+              end_inclusive: bool = True) -> List[Tuple[Optional[str], Optional[datetime], Optional[datetime], bool]]:
+        """
+        Split a time range into whole buckets of the coarsest rollup and
+        ever finer pieces towards its edges
+
+        Returns:
+            (granularity, lower, upper, upper_inclusive) segments, where a
+            granularity of None means raw readings and None bounds are open
+        """
+        start = cls._as_utc(start) if start is not None else None
+        end = cls._as_utc(end) if end is not None else None
+        if not levels:
+            if start is not None and end is not None and (start > end or (start == end and not end_inclusive)):
+                return []
+            return [(None, start, end, end_inclusive)]
+
+        granularity, finer = levels[0], levels[1:]
+        lower = cls.bucket_ceil(start, granularity) if start is not None else None
+        upper = cls.bucket_floor(end, granularity) if end is not None else None
+        if lower is not None and upper is not None and lower >= upper:
+            return cls.cover(finer, start, end, end_inclusive)
+
+        segments = [(granularity, lower, upper, False)]
+        if start is not None:
+            segments += cls.cover(finer, start, lower, False)
+        if end is not None:
+            segments += cls.cover(finer, upper, end, end_inclusive)
+        return segments
+
+    @classmethod
+    def partials_sql(cls, levels: List[str], filters: str, params: List[Any],
+                     start: Optional[datetime] = None, end: Optional[datetime] = None) -> str:
+        """
+        Partial aggregates over readings recorded in [start, end]
+
+        Whole buckets come from the rollups and the uneven edges from the
+        raw readings, so results match a scan of `temperature_readings`.
+        Every part has the rollup columns, with `bucket` holding the reading
+        time for raw rows.
+
+        Args:
+            levels: Rollups to use, coarsest first (see `levels_for`)
+            filters: SQL condition on customer_id, facility_id and
+                storage_unit_id, shared by the rollups and raw readings
+            params: Query parameters; the time bounds are appended
+
+        Returns:
+            SQL of a UNION ALL query, to be used as a CTE or subquery
+        """
+        def bound(column: str, op: str, value: datetime) -> str:
+            params.append(value)
+            return f"{column} {op} ${len(params)}"
+
+        conditions: Dict[Optional[str], List[str]] = {}
+        for granularity, lower, upper, upper_inclusive in cls.cover(levels, start, end):
+            column = 'bucket' if granularity else 'recorded_at'
+            clauses = []
+            if lower is not None:
+                clauses.append(bound(column, '>=', lower))
+            if upper is not None:
+                clauses.append(bound(column, '<=' if upper_inclusive else '<', upper))
+            conditions.setdefault(granularity, []).append(" AND ".join(clauses) or "TRUE")
+
+        parts = []
+        for granularity, ranges in conditions.items():
+            where = f"({filters}) AND ({' OR '.join(f'({r})' for r in ranges)})"
+            if granularity:
+                parts.append(f"""
+                    SELECT customer_id, facility_id, storage_unit_id, bucket, reading_count,
+                           temperature_sum, temperature_sum_squares, temperature_min, temperature_max,
+                           good_quality_count, status_counts
+                    FROM {cls.tables[granularity]}
+                    WHERE {where}
+                """)
+            else:
+                parts.append(f"""
+                    SELECT customer_id, facility_id, storage_unit_id, recorded_at AS bucket,
+                           1::bigint AS reading_count, temperature::float8 AS temperature_sum,
+                           temperature::float8 * temperature::float8 AS temperature_sum_squares,
+                           temperature AS temperature_min, temperature AS temperature_max,
+                           CASE WHEN quality_score = 1 THEN 1 ELSE 0 END::bigint AS good_quality_count,
+                           jsonb_build_object(COALESCE(equipment_status, 'unknown'), 1) AS status_counts
+                    FROM {TemperatureReadingRepository.table_name}
+                    WHERE {where}
+                """)
+        return " UNION ALL ".join(parts)
+
+
 class SystemConfigRepository(BaseRepository):
     """Repository for SystemConfig table operations"""
     table_name = "public.system_config"
@@ -200,4 +658,125 @@ class IngestionLogRepository(BaseRepository):
         if 'created_at' not in log_data:
             log_data['created_at'] = datetime.now()
             
-        return await cls.create(log_data)
\ No newline at end of file
+        return await cls.create(log_data)
+
+
+class IngestionWatermarkRepository(BaseRepository):
+    """Repository for per-customer ingestion high-water marks"""
+    table_name = "public.ingestion_watermarks"
+
+    @classmethod
+    async def get_high_water_mark(cls, customer_id: str) -> Optional[datetime]:
+        """Get the latest committed recorded_at for a customer, never later than now"""
+        # Marks written before they were capped at commit time may lie in the future
+        query = f"SELECT LEAST(high_water_mark, NOW()) FROM {cls.table_name} WHERE customer_id = $1"
+        return await db.fetchval(query, customer_id)
+
+    @classmethod
+    async def advance(cls, marks: Dict[str, datetime]) -> None:
+        """Move customers' high-water marks forward; marks never move back"""
+        if not marks:
+            return
+        
+        query = f"""
+            INSERT INTO {cls.table_name} AS w (customer_id, high_water_mark, updated_at)
+            SELECT m.customer_id, m.high_water_mark, NOW()
+            FROM unnest($1::uuid[], $2::timestamptz[]) AS m(customer_id, high_water_mark)
+            ON CONFLICT (customer_id) DO UPDATE
+            SET high_water_mark = GREATEST(w.high_water_mark, EXCLUDED.high_water_mark),
+                updated_at = EXCLUDED.updated_at
+        """
+        await db.execute(query, [str(c) for c in marks], list(marks.values()))
+
+
+class IngestionLeaseRepository(BaseRepository):
+    """Repository for the customer poll leases held by ingestion replicas"""
+    table_name = "public.ingestion_leases"
+    replicas_table = "public.ingestion_replicas"
+
+    @classmethod
+    async def heartbeat(cls, replica_id: str, ttl: float) -> Dict[str, int]:
+        """
+        Mark a replica as alive and size the pool of work
+
+        Returns:
+            Dictionary with the number of live replicas (including this one)
+            and the number of active customers
+        """
+        query = f"""
+            WITH beat AS (
+                INSERT INTO {cls.replicas_table} (replica_id, heartbeat_at)
+                VALUES ($1, NOW())
+                ON CONFLICT (replica_id) DO UPDATE SET heartbeat_at = NOW()
+            )
+            SELECT
+                1 + (SELECT COUNT(*) FROM {cls.replicas_table}
+                     WHERE replica_id <> $1 AND heartbeat_at > NOW() - make_interval(secs => $2)) AS replicas,
+                (SELECT COUNT(*) FROM public.customers WHERE is_active = true) AS customers
+        """
+        row = await db.fetchrow(query, replica_id, float(ttl))
+        return {'replicas': row['replicas'], 'customers': row['customers']}
+
+    @classmethod
+    async def renew(cls, replica_id: str, ttl: float) -> List[Any]:
+        """Extend a replica's leases on active customers; returns the customer IDs it still holds"""
+        query = f"""
+            UPDATE {cls.table_name} AS l
+            SET expires_at = NOW() + make_interval(secs => $2)
+            FROM public.customers c
+            WHERE l.owner = $1 AND c.id = l.customer_id AND c.is_active = true
+            RETURNING l.customer_id
+        """
+        rows = await db.fetch(query, replica_id, float(ttl))
+        return [row['customer_id'] for row in rows]
+
+    @classmethod
+    async def claim(cls, replica_id: str, ttl: float, limit: int) -> List[Any]:
+        """
+        Take up to `limit` active customers that are unleased or whose lease
+        has expired
+
+        Candidates are picked in random order so replicas claiming at the
+        same moment rarely contend; a row taken by a peer in the meantime is
+        skipped by the conflict guard.
+
+        Returns:
+            Customer IDs now leased to the replica
+        """
+        query = f"""
+            WITH candidates AS (
+                SELECT c.id
+                FROM public.customers c
+                LEFT JOIN {cls.table_name} existing ON existing.customer_id = c.id
+                WHERE c.is_active = true
+                  AND (existing.customer_id IS NULL OR existing.expires_at < NOW())
+                ORDER BY random()
+                LIMIT $3
+            )
+            INSERT INTO {cls.table_name} AS l (customer_id, owner, expires_at, acquired_at)
+            SELECT id, $1, NOW() + make_interval(secs => $2), NOW() FROM candidates
+            ON CONFLICT (customer_id) DO UPDATE
+            SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at, acquired_at = EXCLUDED.acquired_at
+            WHERE l.expires_at < NOW()
+            RETURNING l.customer_id
+        """
+        rows = await db.fetch(query, replica_id, float(ttl), limit)
+        return [row['customer_id'] for row in rows]
+
+    @classmethod
+    async def release(cls, replica_id: str, customer_ids: Optional[List[Any]] = None) -> None:
+        """Give up some of a replica's leases, or all of them and its heartbeat"""
+        if customer_ids is None:
+            await db.execute(f"DELETE FROM {cls.table_name} WHERE owner = $1", replica_id)
+            await db.execute(f"DELETE FROM {cls.replicas_table} WHERE replica_id = $1", replica_id)
+            return
+        if not customer_ids:
+            return
+        query = f"DELETE FROM {cls.table_name} WHERE owner = $1 AND customer_id = ANY($2::uuid[])"
+        await db.execute(query, replica_id, [str(c) for c in customer_ids])
+
+    @classmethod
+    async def prune_replicas(cls, older_than: float) -> None:
+        """Forget replicas that have not heartbeated for `older_than` seconds"""
+        query = f"DELETE FROM {cls.replicas_table} WHERE heartbeat_at < NOW() - make_interval(secs => $1)"
+        await db.execute(query, float(older_than))
@@ -0,0 +1,88 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from database.repositories.repositories import ReadingRollupRepository
+
+logger = logging.getLogger(__name__)
+
+
+class RollupRepairJob:
+    """
+    Recomputes recent hourly and daily rollup buckets from the raw readings
+
+    The insert paths keep the rollups current, late readings included. The
+    repair catches what they cannot see: readings written while rollups
+    were disabled, loaded with plain SQL, or deleted. Every
+    `repair_interval` seconds it rebuilds the buckets of the last
+    `window_hours`, one UTC day per transaction so writers are never held
+    back for long.
+    """
+
+    def __init__(
+        self,
+        window_hours: float = float(os.getenv("READINGS_ROLLUP_REPAIR_WINDOW_HOURS", "48")),
+        repair_interval: float = float(os.getenv("READINGS_ROLLUP_REPAIR_INTERVAL", "3600")),
+    ):
+        self.window = timedelta(hours=window_hours)
+        self.repair_interval = repair_interval
+        self.last_repair: Optional[Dict[str, int]] = None
+        self._task = None
+
+    async def rebuild(self, start: datetime, end: datetime) -> Dict[str, int]:
+        """
+        Rebuild every bucket overlapping [start, end], a day at a time
+
+        Returns:
+            Number of buckets written per granularity
+        """
+        totals = {granularity: 0 for granularity in ReadingRollupRepository.tables}
+        start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+        end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+        day = ReadingRollupRepository.bucket_floor(start, 'day')
+        while day <= end:
+            # Stop a microsecond short of midnight so the next day is left to the next chunk
+            chunk_end = min(day + timedelta(days=1) - timedelta(microseconds=1), end)
+            rebuilt = await ReadingRollupRepository.rebuild(max(day, start), chunk_end)
+            for granularity, count in rebuilt.items():
+                totals[granularity] += count
+            day += timedelta(days=1)
+        return totals
+
+    async def repair(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Rebuild the buckets of the last `window_hours`"""
+        end = now or datetime.now(timezone.utc)
+        self.last_repair = await self.rebuild(end - self.window, end)
+        logger.info(f"Repaired reading rollups for the last {self.window}: {self.last_repair}")
+        return self.last_repair
+
+    # Background repair
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.repair_interval)
+            try:
+                await self.repair()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Rollup repair failed: {e}")
+
+    def start(self):
+        """Repair every `repair_interval` seconds, starting one interval from now"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background repair"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+# Job run by the first ingestion worker
+rollup_repair = RollupRepairJob()
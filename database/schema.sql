@@ -114,9 +114,66 @@ CREATE TABLE IF NOT EXISTS public.ingestion_logs (
 );
 COMMENT ON TABLE public.ingestion_logs IS 'Logs each data ingestion attempt for traceability.';
 
+-- Table: ingestion_watermarks
+CREATE TABLE IF NOT EXISTS public.ingestion_watermarks (
+    customer_id UUID PRIMARY KEY REFERENCES public.customers(id) ON DELETE CASCADE,
+    high_water_mark TIMESTAMPTZ NOT NULL, -- latest recorded_at committed for the customer
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.ingestion_watermarks IS 'Latest committed reading time per customer, used for incremental polling.';
+
+-- Table: ingestion_replicas
+CREATE TABLE IF NOT EXISTS public.ingestion_replicas (
+    replica_id TEXT PRIMARY KEY,
+    heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- renewed every lease cycle
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.ingestion_replicas IS 'Live ingestion replicas, used to size each replica''s share of customers.';
+
+-- Table: ingestion_leases
+CREATE TABLE IF NOT EXISTS public.ingestion_leases (
+    customer_id UUID PRIMARY KEY REFERENCES public.customers(id) ON DELETE CASCADE,
+    owner TEXT NOT NULL, -- replica_id of the replica polling the customer
+    expires_at TIMESTAMPTZ NOT NULL,
+    acquired_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.ingestion_leases IS 'Which ingestion replica polls each customer, and until when.';
+
+
+-- Hierarchy change notifications
+-- The ingestion service caches the facility/unit code -> ID hierarchy and
+-- LISTENs on this channel to reload a customer as soon as it changes.
+CREATE OR REPLACE FUNCTION notify_hierarchy_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_customer UUID;
+BEGIN
+    IF TG_TABLE_NAME = 'facilities' THEN
+        changed_customer := COALESCE(NEW.customer_id, OLD.customer_id);
+    ELSE
+        SELECT customer_id INTO changed_customer
+        FROM public.facilities
+        WHERE id = COALESCE(NEW.facility_id, OLD.facility_id);
+    END IF;
+    
+    PERFORM pg_notify('hierarchy_changed', COALESCE(changed_customer::TEXT, ''));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS facilities_hierarchy_notify ON public.facilities;
+CREATE TRIGGER facilities_hierarchy_notify
+    AFTER INSERT OR UPDATE OR DELETE ON public.facilities
+    FOR EACH ROW EXECUTE FUNCTION notify_hierarchy_changed();
+
+DROP TRIGGER IF EXISTS storage_units_hierarchy_notify ON public.storage_units;
+CREATE TRIGGER storage_units_hierarchy_notify
+    AFTER INSERT OR UPDATE OR DELETE ON public.storage_units
+    FOR EACH ROW EXECUTE FUNCTION notify_hierarchy_changed();
+
 
 -- -- 4. Partitioned Table for Time-Series Data --
--- This is the main "hot" table for recent data. It is partitioned by month.
+-- This is the main "hot" table for recent data. It is partitioned by month (or by day, see READINGS_PARTITION_INTERVAL).
 CREATE TABLE IF NOT EXISTS public.temperature_readings (
     id BIGSERIAL NOT NULL,
     customer_id UUID NOT NULL,
@@ -125,72 +182,134 @@ CREATE TABLE IF NOT EXISTS public.temperature_readings (
     temperature REAL NOT NULL,
     temperature_unit VARCHAR(8) NOT NULL,
     recorded_at TIMESTAMPTZ NOT NULL,
-    sensor_id VARCHAR(255),
+    sensor_id VARCHAR(255) NOT NULL DEFAULT '',
     quality_score REAL,
     equipment_status VARCHAR(64) DEFAULT 'normal',
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     -- Define the primary key to include the partition key for efficiency
-    PRIMARY KEY (id, recorded_at)
+    PRIMARY KEY (id, recorded_at),
+    -- Natural key: re-polled or re-delivered readings are skipped with ON CONFLICT DO NOTHING
+    CONSTRAINT temperature_readings_natural_key UNIQUE (storage_unit_id, recorded_at, sensor_id)
 ) PARTITION BY RANGE (recorded_at);
 
-COMMENT ON TABLE public.temperature_readings IS 'Parent table for storing all temperature readings. Partitioned by month.';
+COMMENT ON TABLE public.temperature_readings IS 'Parent table for storing all temperature readings. Partitioned by month or day.';
 
--- Automated Partition Creation Function
--- This function will automatically create a new monthly partition if one doesn't exist
--- when data is inserted. This is much more robust than manual partition creation.
-CREATE OR REPLACE FUNCTION create_temperature_partition_if_not_exists()
-RETURNS TRIGGER AS $$
+-- Partitions are created ahead of time by the partition manager
+-- (database/partitions.py), run by the ingestion service and available as
+-- scripts/manage_partitions.py for backfills, so inserts need no per-row
+-- partition checks. The current and next three months are created here so
+-- a fresh database accepts readings before the manager first runs.
+DO $$
 DECLARE
-    partition_date TEXT;
+    month_start TIMESTAMP;
     partition_name TEXT;
 BEGIN
-    partition_date := to_char(NEW.recorded_at, 'YYYY_MM');
-    partition_name := 'temperature_readings_history_' || partition_date;
-    
-    -- Check if the partition already exists
-    IF NOT EXISTS(SELECT 1 FROM pg_tables WHERE tablename=partition_name) THEN
-        -- Create the new partition
-        EXECUTE format(
-            'CREATE TABLE %I PARTITION OF public.temperature_readings FOR VALUES FROM (%L) TO (%L)',
-            partition_name,
-            date_trunc('month', NEW.recorded_at),
-            date_trunc('month', NEW.recorded_at) + interval '1 month'
-        );
-        RAISE NOTICE 'Created partition %', partition_name;
-    END IF;
-    
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
+    FOR i IN 0..3 LOOP
+        month_start := date_trunc('month', NOW() AT TIME ZONE 'UTC') + make_interval(months => i);
+        partition_name := 'temperature_readings_history_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass('public.' || partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.temperature_readings FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start AT TIME ZONE 'UTC',
+                (month_start + interval '1 month') AT TIME ZONE 'UTC'
+            );
+            EXECUTE format(
+                'CREATE INDEX IF NOT EXISTS %I ON public.%I (recorded_at DESC)',
+                partition_name || '_recorded_at_idx',
+                partition_name
+            );
+        END IF;
+    END LOOP;
+END $$;
+
+-- Latest reading of every unit, maintained by every insert (see UnitLatestStateRepository)
+-- Table: unit_latest_state
+CREATE TABLE IF NOT EXISTS public.unit_latest_state (
+    storage_unit_id UUID PRIMARY KEY, -- no foreign key, so a reading for an unknown unit never fails the insert
+    customer_id UUID NOT NULL,
+    facility_id UUID NOT NULL,
+    reading_id BIGINT NOT NULL, -- id of the reading in temperature_readings
+    temperature REAL NOT NULL,
+    temperature_unit VARCHAR(8) NOT NULL,
+    recorded_at TIMESTAMPTZ NOT NULL,
+    sensor_id VARCHAR(255) NOT NULL DEFAULT '',
+    quality_score REAL,
+    equipment_status VARCHAR(64),
+    reading_created_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.unit_latest_state IS 'Latest reading of every storage unit, maintained on insert.';
+
+-- Rollups of the readings, maintained by every insert (see ReadingRollupRepository)
+-- Adds up two {status: count} objects, used when new readings join a rollup bucket
+CREATE OR REPLACE FUNCTION public.merge_status_counts(a JSONB, b JSONB)
+RETURNS JSONB AS $$
+    SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+    FROM (
+        SELECT key, SUM(value::bigint) AS total
+        FROM (SELECT * FROM jsonb_each_text(a) UNION ALL SELECT * FROM jsonb_each_text(b)) counts
+        GROUP BY key
+    ) merged
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Table: temperature_rollup_hourly
+CREATE TABLE IF NOT EXISTS public.temperature_rollup_hourly (
+    storage_unit_id UUID NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL, -- start of the UTC hour
+    customer_id UUID NOT NULL,
+    facility_id UUID NOT NULL,
+    reading_count BIGINT NOT NULL,
+    temperature_sum DOUBLE PRECISION NOT NULL,
+    temperature_sum_squares DOUBLE PRECISION NOT NULL,
+    temperature_min REAL NOT NULL,
+    temperature_max REAL NOT NULL,
+    good_quality_count BIGINT NOT NULL, -- readings with quality_score = 1
+    status_counts JSONB NOT NULL DEFAULT '{}', -- readings per equipment_status
+    first_recorded_at TIMESTAMPTZ NOT NULL,
+    last_recorded_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (storage_unit_id, bucket)
+);
+COMMENT ON TABLE public.temperature_rollup_hourly IS 'Per storage unit hourly reading aggregates, maintained on insert.';
 
--- Trigger to execute the function before an insert
-DROP TRIGGER IF EXISTS insert_temperature_trigger ON public.temperature_readings;
-CREATE TRIGGER insert_temperature_trigger
-    BEFORE INSERT ON public.temperature_readings
-    FOR EACH ROW EXECUTE FUNCTION create_temperature_partition_if_not_exists();
+-- Table: temperature_rollup_daily
+CREATE TABLE IF NOT EXISTS public.temperature_rollup_daily (LIKE public.temperature_rollup_hourly INCLUDING ALL);
+COMMENT ON COLUMN public.temperature_rollup_daily.bucket IS 'Start of the UTC day';
+COMMENT ON TABLE public.temperature_rollup_daily IS 'Per storage unit daily reading aggregates, maintained on insert.';
 
 -- Create Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_temperature_readings_recorded_at ON public.temperature_readings (recorded_at DESC);
-CREATE INDEX IF NOT EXISTS idx_temperature_readings_unit_id ON public.temperature_readings (storage_unit_id);
+-- Listings filter on the customer or facility and page by recorded_at DESC;
+-- unit listings use the natural key. recorded_at alone is indexed per
+-- partition: B-tree while recent, BRIN once old (see the partition manager).
+CREATE INDEX IF NOT EXISTS idx_temperature_readings_customer_time ON public.temperature_readings (customer_id, recorded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_temperature_readings_facility_time ON public.temperature_readings (facility_id, recorded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_temperature_readings_alarms ON public.temperature_readings (customer_id, recorded_at DESC)
+    WHERE equipment_status IN ('warning', 'error');
+CREATE INDEX IF NOT EXISTS idx_ingestion_leases_owner ON public.ingestion_leases (owner);
+CREATE INDEX IF NOT EXISTS idx_temperature_rollup_hourly_customer ON public.temperature_rollup_hourly (customer_id, bucket);
+CREATE INDEX IF NOT EXISTS idx_temperature_rollup_daily_customer ON public.temperature_rollup_daily (customer_id, bucket);
+CREATE INDEX IF NOT EXISTS idx_unit_latest_state_customer ON public.unit_latest_state (customer_id, recorded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_ingestion_logs_start_time ON public.ingestion_logs (start_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_ingestion_logs_customer_start_time ON public.ingestion_logs (customer_id, start_time DESC, id DESC);
 
 
 -- -- 5. Views --
 
 -- View: latest_temperature_readings
--- Efficiently gets the most recent reading for every storage unit.
+-- The most recent reading of every storage unit, read from unit_latest_state.
 CREATE OR REPLACE VIEW public.latest_temperature_readings AS
-SELECT DISTINCT ON (r.storage_unit_id)
-    r.id,
-    r.customer_id,
-    r.facility_id,
-    r.storage_unit_id,
-    r.temperature,
-    r.temperature_unit,
-    r.recorded_at,
-    r.sensor_id,
-    r.quality_score
-FROM public.temperature_readings r
-ORDER BY r.storage_unit_id, r.recorded_at DESC;
+SELECT
+    s.reading_id AS id,
+    s.customer_id,
+    s.facility_id,
+    s.storage_unit_id,
+    s.temperature,
+    s.temperature_unit,
+    s.recorded_at,
+    s.sensor_id,
+    s.quality_score
+FROM public.unit_latest_state s;
 
 -- View: customer_summary
 -- Provides a high-level overview of each customer's assets.
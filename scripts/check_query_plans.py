@@ -0,0 +1,156 @@
+# scripts/check_query_plans.py
+#!/usr/bin/env python3
+"""
+Check that the main API queries are answered from indexes
+
+Runs EXPLAIN on the reading, alarm, latest-state and rollup queries the API
+issues, for a real customer/facility/unit, and fails if any of them reads
+a readings, latest-state or rollup table with a sequential scan. By default
+sequential scans are disabled for the check, so a failure means no index
+can serve the query; with --as-planned the planner's own choice is checked
+(small tables are legitimately scanned).
+
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --as-planned --verbose
+"""
+import sys
+import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.connection import db
+
+# Tables whose scans must be index-backed (partitions match by prefix)
+CHECKED_TABLES = ("temperature_readings", "unit_latest_state", "temperature_rollup_")
+
+READINGS_SELECT = """
+    SELECT tr.*, f.name as facility_name, su.name as unit_name
+    FROM temperature_readings tr
+    JOIN facilities f ON tr.facility_id = f.id
+    JOIN storage_units su ON tr.storage_unit_id = su.id
+"""
+
+# name -> (query, parameter names), mirroring the API's SQL
+QUERIES = {
+    'customer readings': (
+        READINGS_SELECT + " WHERE tr.customer_id = $1 ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT 100 OFFSET 0",
+        ('customer_id',),
+    ),
+    'customer readings since': (
+        READINGS_SELECT + " WHERE tr.customer_id = $1 AND tr.recorded_at >= $2 ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT 100",
+        ('customer_id', 'since'),
+    ),
+    'customer readings after cursor': (
+        READINGS_SELECT + " WHERE tr.customer_id = $1 AND tr.recorded_at <= $2 AND (tr.recorded_at, tr.id) < ($2, $3)"
+                          " ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT 100",
+        ('customer_id', 'since', 'last_id'),
+    ),
+    'facility readings': (
+        READINGS_SELECT + " WHERE tr.customer_id = $1 AND tr.facility_id = $2 ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT 100",
+        ('customer_id', 'facility_id'),
+    ),
+    'unit readings': (
+        READINGS_SELECT + " WHERE tr.customer_id = $1 AND tr.storage_unit_id = $2 ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT 100",
+        ('customer_id', 'storage_unit_id'),
+    ),
+    'alarm history': (
+        READINGS_SELECT + " WHERE tr.customer_id = $1 AND tr.equipment_status IN ('warning', 'error')"
+                          " ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT 100",
+        ('customer_id',),
+    ),
+    'admin readings since': (
+        READINGS_SELECT + " WHERE 1=1 AND tr.recorded_at >= $1 ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT 100",
+        ('since',),
+    ),
+    'latest readings': (
+        "SELECT ls.* FROM unit_latest_state ls WHERE ls.customer_id = $1 ORDER BY ls.recorded_at DESC LIMIT 20",
+        ('customer_id',),
+    ),
+    'unit current state': (
+        "SELECT su.*, ls.temperature FROM storage_units su "
+        "LEFT JOIN unit_latest_state ls ON ls.storage_unit_id = su.id WHERE su.id = $1",
+        ('storage_unit_id',),
+    ),
+    'daily rollup': (
+        "SELECT * FROM temperature_rollup_daily WHERE customer_id = $1 AND bucket >= $2",
+        ('customer_id', 'since'),
+    ),
+    'hourly rollup': (
+        "SELECT * FROM temperature_rollup_hourly WHERE customer_id = $1 AND bucket >= $2",
+        ('customer_id', 'since'),
+    ),
+}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check that API queries use indexes")
+    parser.add_argument("--as-planned", action="store_true",
+                        help="keep sequential scans enabled and check the planner's own choice")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    return parser.parse_args(argv)
+
+
+def sequential_scans(plan: dict) -> list:
+    """Checked tables read with a sequential scan anywhere in a plan"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name', '').startswith(CHECKED_TABLES):
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(sequential_scans(child))
+    return found
+
+
+async def run(args: argparse.Namespace) -> int:
+    try:
+        sample = await db.fetchrow("""
+            SELECT f.customer_id, f.id AS facility_id, su.id AS storage_unit_id
+            FROM storage_units su
+            JOIN facilities f ON su.facility_id = f.id
+            LIMIT 1
+        """)
+        if not sample:
+            print("❌ No storage units to build sample queries from")
+            return 2
+        values = {
+            'customer_id': str(sample['customer_id']),
+            'facility_id': str(sample['facility_id']),
+            'storage_unit_id': str(sample['storage_unit_id']),
+            'since': datetime.now(timezone.utc) - timedelta(days=1),
+            'last_id': 2 ** 62,
+        }
+
+        failures = 0
+        async with await db.transaction() as conn:
+            async with conn.transaction():
+                if not args.as_planned:
+                    await conn.execute("SET LOCAL enable_seqscan = off")
+
+                for name, (query, param_names) in QUERIES.items():
+                    result = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *[values[p] for p in param_names])
+                    plan = (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+                    scans = sequential_scans(plan)
+                    if scans:
+                        failures += 1
+                        print(f"❌ {name}: sequential scan of {', '.join(sorted(set(scans)))}")
+                    else:
+                        print(f"✅ {name}")
+                    if args.verbose:
+                        print(json.dumps(plan, indent=2))
+
+        print(f"{len(QUERIES) - failures}/{len(QUERIES)} queries use index plans")
+        return 1 if failures else 0
+    finally:
+        await db.close()
+
+
+def main():
+    sys.exit(asyncio.run(run(parse_args())))
+
+
+if __name__ == "__main__":
+    main()
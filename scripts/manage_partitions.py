@@ -0,0 +1,68 @@
+# scripts/manage_partitions.py
+#!/usr/bin/env python3
+"""
+Create temperature_readings partitions ahead of time or for a backfill
+
+    python scripts/manage_partitions.py                      # current period + READINGS_PARTITIONS_AHEAD
+    python scripts/manage_partitions.py --interval day --ahead 30
+    python scripts/manage_partitions.py --from 2024-01-01 --to 2024-12-31
+    python scripts/manage_partitions.py --list
+"""
+import sys
+import asyncio
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.connection import db
+from database.partitions import PartitionManager, MONTHLY, DAILY
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Manage temperature_readings partitions")
+    parser.add_argument("--interval", choices=(MONTHLY, DAILY),
+                        help="partition granularity (default: READINGS_PARTITION_INTERVAL or month)")
+    parser.add_argument("--ahead", type=int, help="periods to create after the current one")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat,
+                        help="create partitions for readings from this date (backfill)")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat,
+                        help="last date of the backfill (default: today)")
+    parser.add_argument("--list", action="store_true", help="list existing partitions and exit")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace):
+    options = {}
+    if args.interval:
+        options['interval'] = args.interval
+    if args.ahead is not None:
+        options['periods_ahead'] = args.ahead
+    manager = PartitionManager(**options)
+
+    try:
+        if args.list:
+            partitions = await manager.existing_partitions()
+            print(f"📦 {len(partitions)} partitions of {manager.table_name}")
+            for name, bound in partitions.items():
+                print(f"  {name}: {bound}")
+            return
+
+        if args.start:
+            created = await manager.ensure_range(args.start, args.end or datetime.now())
+        else:
+            created = await manager.maintain()
+
+        print(f"✅ Created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+    finally:
+        await db.close()
+
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
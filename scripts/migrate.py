@@ -0,0 +1,63 @@
+# scripts/migrate.py
+#!/usr/bin/env python3
+"""
+Apply the numbered migrations in database/migrations
+
+A new database is created from database/schema.sql and baselined; the
+migrations then upgrade it as new ones are added.
+
+    python scripts/migrate.py                  # apply every pending migration
+    python scripts/migrate.py --to 008         # stop after version 008
+    python scripts/migrate.py --status
+    python scripts/migrate.py --baseline       # new database loaded from schema.sql: record, don't run
+    python scripts/migrate.py --baseline 007   # database migrated by hand up to 007
+"""
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.connection import db
+from database.migrate import MigrationRunner
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--to", dest="target", help="last version to apply")
+    parser.add_argument("--status", action="store_true", help="list migrations and exit")
+    parser.add_argument("--baseline", nargs="?", const="latest", metavar="VERSION",
+                        help="record migrations up to VERSION (default: all) as applied without running them")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace):
+    runner = MigrationRunner()
+
+    try:
+        if args.status:
+            for migration in await runner.status():
+                state = migration['applied_at'] or "pending"
+                changed = " (file changed since applied)" if migration['changed'] else ""
+                print(f"  {migration['version']}_{migration['name']}: {state}{changed}")
+            return
+
+        if args.baseline:
+            recorded = await runner.baseline(None if args.baseline == "latest" else args.baseline)
+            print(f"✅ Baselined {len(recorded)} migrations" + (f": {', '.join(recorded)}" if recorded else ""))
+            return
+
+        applied = await runner.migrate(args.target)
+        print(f"✅ Applied {len(applied)} migrations" + (f": {', '.join(applied)}" if applied else ""))
+    finally:
+        await db.close()
+
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# scripts/rebuild_rollups.py
+#!/usr/bin/env python3
+"""
+Rebuild the hourly and daily reading rollups from the raw readings
+
+    python scripts/rebuild_rollups.py                        # last READINGS_ROLLUP_REPAIR_WINDOW_HOURS
+    python scripts/rebuild_rollups.py --hours 168
+    python scripts/rebuild_rollups.py --from 2024-01-01 --to 2024-12-31
+"""
+import sys
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.connection import db
+from database.rollups import RollupRepairJob
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild temperature reading rollups")
+    parser.add_argument("--hours", type=float, help="rebuild the last N hours (default: the repair window)")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat,
+                        help="rebuild buckets from this date (UTC)")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat,
+                        help="last date to rebuild (default: now)")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace):
+    job = RollupRepairJob(window_hours=args.hours) if args.hours else RollupRepairJob()
+
+    try:
+        if args.start:
+            rebuilt = await job.rebuild(args.start, args.end or datetime.now(timezone.utc))
+        else:
+            rebuilt = await job.repair()
+
+        print(f"✅ Rebuilt {rebuilt.get('hour', 0)} hourly and {rebuilt.get('day', 0)} daily buckets")
+    finally:
+        await db.close()
+
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,74 @@
 # simulation/manager.py
 import asyncio
+import hashlib
+import json
+import time
 import pandas as pd
-from fastapi import FastAPI, Response
-from typing import List, Dict, Any
-from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from datetime import datetime, timezone
 import uvicorn
 
 from .customer_generator import GeneratedCustomer
 from .enhanced_data_generator import generate_customer_data
 
-def create_customer_app(customer: GeneratedCustomer) -> FastAPI:
+def parse_since(since: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a `since` query parameter into a naive datetime.
+    Simulated readings use naive timestamps, which the ingestion pipeline stores as UTC.
+    """
+    if not since:
+        return None
+    parsed = datetime.fromisoformat(since.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    last_modified: datetime,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Build a response carrying ETag / Last-Modified validators.
+    Returns 304 Not Modified when the request's If-None-Match or
+    If-Modified-Since header shows the client already has this body.
+    """
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    response_headers = {
+        'ETag': etag,
+        'Last-Modified': format_datetime(last_modified, usegmt=True),
+        **(headers or {})
+    }
+    
+    if_none_match = request.headers.get('if-none-match')
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_none_match:
+        if if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]:
+            return Response(status_code=304, headers=response_headers)
+    elif if_modified_since:
+        try:
+            if parsedate_to_datetime(if_modified_since) >= last_modified:
+                return Response(status_code=304, headers=response_headers)
+        except (TypeError, ValueError):
+            pass
+    
+    return Response(content=body, media_type=media_type, headers=response_headers)
+
+
+def create_customer_app(customer: GeneratedCustomer, content_ttl: float = 60.0) -> FastAPI:
     """
     Factory function to create a FastAPI application for a single customer.
     The endpoints will vary based on the customer's data_sharing_method.
+    
+    Generated payloads are kept for `content_ttl` seconds so that repeated
+    polls see an unchanged resource, which exercises conditional requests.
+    Responses are gzip-compressed for clients that accept it.
     """
     app = FastAPI(
         title=f"Simulation API for {customer.name}",
@@ -21,6 +77,23 @@ def create_customer_app(customer: GeneratedCustomer) -> FastAPI:
         docs_url="/docs",
         redoc_url="/redoc"
     )
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+    
+    payload_cache: Dict[Tuple, Tuple[float, datetime, Optional[bytes]]] = {}
+    
+    def cached_payload(key: Tuple, build: Callable[[], Optional[bytes]]) -> Tuple[datetime, Optional[bytes]]:
+        """Return the cached payload for a request, regenerating it after `content_ttl`"""
+        now = time.monotonic()
+        for stale_key in [k for k, v in payload_cache.items() if now - v[0] >= content_ttl]:
+            del payload_cache[stale_key]
+        
+        if key not in payload_cache:
+            # HTTP dates have second precision
+            generated_at = datetime.now(timezone.utc).replace(microsecond=0)
+            payload_cache[key] = (now, generated_at, build())
+        
+        _, generated_at, body = payload_cache[key]
+        return generated_at, body
 
     @app.get("/", summary="Customer Information")
     def get_customer_info():
@@ -37,46 +110,66 @@ def create_customer_app(customer: GeneratedCustomer) -> FastAPI:
     if customer.data_sharing_method == 'api':
         # --- Endpoints for API-type customers ---
         @app.get("/temperature/current", summary="Get Current Temperature Data (JSON)")
-        def get_current_temperatures(hours: float = 0.25):
+        def get_current_temperatures(request: Request, hours: float = 0.25, since: Optional[str] = None):
             """
             Generates and returns the latest temperature readings for all units as JSON.
             The `hours` query parameter defines the lookback period for "current" data.
+            The optional `since` parameter (ISO 8601) drops readings recorded before it.
+            Supports If-None-Match / If-Modified-Since and gzip transfer encoding.
             """
             print(f"🔗 [API Request] Received request for JSON data from {customer.name} ({customer.id})")
-            readings = generate_customer_data(customer, hours=hours) 
-            return {
-                "customer_id": customer.id,
-                "generated_at": datetime.now().isoformat(),
-                "reading_count": len(readings),
-                "readings": [r.to_dict() for r in readings]
-            }
+            
+            def build() -> bytes:
+                readings = generate_customer_data(customer, hours=hours) 
+                since_dt = parse_since(since)
+                if since_dt:
+                    readings = [r for r in readings if r.timestamp >= since_dt]
+                return json.dumps({
+                    "customer_id": customer.id,
+                    "generated_at": datetime.now().isoformat(),
+                    "reading_count": len(readings),
+                    "readings": [r.to_dict() for r in readings]
+                }).encode()
+            
+            generated_at, body = cached_payload(('api', hours, since), build)
+            return conditional_response(request, body, generated_at, media_type='application/json')
 
     elif customer.data_sharing_method == 'csv':
         # --- Endpoint for CSV-type customers ---
         @app.get("/data/download.csv", summary="Download Temperature Data (CSV)")
-        def download_csv_data(hours: int = 24):
+        def download_csv_data(request: Request, hours: int = 24, since: Optional[str] = None):
             """
             Generates a CSV file with historical data and returns it for download.
             The `hours` query parameter defines how many hours of data to include.
+            The optional `since` parameter (ISO 8601) drops readings recorded before it.
+            Supports If-None-Match / If-Modified-Since and gzip transfer encoding.
             """
             print(f"📄 [CSV Request] Received request for CSV file from {customer.name} ({customer.id})")
-            readings = generate_customer_data(customer, hours=hours)
             
-            if not readings:
-                return Response(content="No data generated for the requested period.", status_code=204)
+            def build() -> Optional[bytes]:
+                readings = generate_customer_data(customer, hours=hours)
+                since_dt = parse_since(since)
+                if since_dt:
+                    readings = [r for r in readings if r.timestamp >= since_dt]
+                if not readings:
+                    return None
+                
+                # Convert to DataFrame and then to a CSV string in memory
+                df = pd.DataFrame([r.to_dict() for r in readings])
+                return df.to_csv(index=False).encode()
             
-            # Convert to DataFrame and then to a CSV string in memory
-            df = pd.DataFrame([r.to_dict() for r in readings])
-            csv_data = df.to_csv(index=False)
+            generated_at, csv_data = cached_payload(('csv', hours, since), build)
+            if csv_data is None:
+                return Response(content="No data generated for the requested period.", status_code=204)
             
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            timestamp = generated_at.strftime('%Y%m%d_%H%M%S')
             filename = f"customer_{customer.id}_data_{timestamp}.csv"
             
             headers = {
                 'Content-Disposition': f'attachment; filename="{filename}"'
             }
             
-            return Response(content=csv_data, media_type='text/csv', headers=headers)
+            return conditional_response(request, csv_data, generated_at, media_type='text/csv', headers=headers)
 
     return app
 
@@ -85,11 +178,11 @@ class SimulationManager:
     """
     Manages all customer simulations, running each as a dedicated FastAPI server.
     """
-    def __init__(self, customers: List[GeneratedCustomer], port_start: int = 8001):
+    def __init__(self, customers: List[GeneratedCustomer], port_start: int = 8001, content_ttl: float = 60.0):
         self.servers = []
         port = port_start
         for customer in customers:
-            app = create_customer_app(customer)
+            app = create_customer_app(customer, content_ttl=content_ttl)
             config = uvicorn.Config(app, host="0.0.0.0", port=port, log_level="info")
             server = uvicorn.Server(config)
             self.servers.append({
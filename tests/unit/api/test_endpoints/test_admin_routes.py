@@ -0,0 +1,19 @@
+import pytest
+from fastapi import HTTPException
+
+from api.endpoints.admin_routes import get_ingestion_logs
+
+
+class TestIngestionLogRoutes:
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_is_a_bad_request(self):
+        """Test a malformed cursor is answered with 400, not a server error."""
+        with pytest.raises(HTTPException) as error:
+            await get_ingestion_logs(
+                limit=10, offset=0, cursor="garbage", customer_id=None, status_filter=None,
+                start_date=None, end_date=None, admin={}
+            )
+
+        assert error.value.status_code == 400
+        assert "Invalid cursor" in error.value.detail
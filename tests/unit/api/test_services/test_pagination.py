@@ -0,0 +1,74 @@
+import pytest
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from api.services.pagination import encode_cursor, decode_cursor, keyset_condition, next_cursor, page_clause, build_page
+
+
+class TestCursorPagination:
+
+    def test_cursor_round_trip(self):
+        """Test reading and UUID ids survive encoding with the timestamp's zone."""
+        position = datetime(2025, 6, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+        log_id = uuid4()
+
+        assert decode_cursor(encode_cursor(position, 42)) == (position, 42)
+        assert decode_cursor(encode_cursor(position, log_id)) == (position, str(log_id))
+
+    def test_cursor_is_url_safe(self):
+        """Test cursors need no escaping in a query string."""
+        cursor = encode_cursor(datetime(2025, 6, 1, tzinfo=timezone.utc), 2 ** 40)
+
+        assert all(c.isalnum() or c in "-_" for c in cursor)
+
+    @pytest.mark.parametrize("cursor", ["", "not-a-cursor", "eyJ0IjogMX0"])
+    def test_invalid_cursor(self, cursor):
+        """Test anything but an encoded cursor is rejected."""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor(cursor)
+
+    def test_keyset_condition(self):
+        """Test the condition bounds the sort column and breaks ties on the id."""
+        assert keyset_condition("tr.recorded_at", "tr.id", 3) == (
+            " AND tr.recorded_at <= $3 AND (tr.recorded_at, tr.id) < ($3, $4)"
+        )
+
+    def test_next_cursor_only_for_full_pages(self):
+        """Test a short page is the last one and a full page points at its last row."""
+        position = datetime(2025, 6, 1, tzinfo=timezone.utc)
+        rows = [{'id': 2, 'start_time': position}, {'id': 1, 'start_time': position}]
+
+        assert next_cursor(rows, limit=3, position_key='start_time') is None
+        assert next_cursor([], limit=3) is None
+        assert decode_cursor(next_cursor(rows, limit=2, position_key='start_time')) == (position, 1)
+
+    def test_page_clause_offset(self):
+        """Test an offset page numbers its parameters after the filters."""
+        params = ['customer']
+
+        clause = page_clause(params, limit=50, offset=100)
+
+        assert clause == " ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT $2 OFFSET $3"
+        assert params == ['customer', 50, 100]
+
+    def test_page_clause_cursor(self):
+        """Test a cursor page seeks past the cursor and ignores the offset."""
+        position = datetime(2025, 6, 1, tzinfo=timezone.utc)
+        params = []
+
+        clause = page_clause(params, 10, 500, encode_cursor(position, 'log-1'), "il.start_time", "il.id")
+
+        assert clause == (" AND il.start_time <= $1 AND (il.start_time, il.id) < ($1, $2)"
+                          " ORDER BY il.start_time DESC, il.id DESC LIMIT $3")
+        assert params == [position, 'log-1', 10]
+
+    def test_build_page(self):
+        """Test offset pages are numbered and cursor pages are not."""
+        rows = [{'id': 1, 'recorded_at': datetime(2025, 6, 1, tzinfo=timezone.utc)}]
+
+        offset_page = build_page(rows, total=5, limit=1, offset=2)
+        cursor_page = build_page(rows, total=None, limit=1, cursor=offset_page.next_cursor)
+
+        assert (offset_page.page, offset_page.pages, offset_page.total) == (3, 5, 5)
+        assert (cursor_page.page, cursor_page.pages, cursor_page.total) == (None, None, None)
+        assert cursor_page.next_cursor == offset_page.next_cursor
@@ -1,9 +1,12 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
 from api.services.temperature_service import TemperatureService
+from api.services.pagination import encode_cursor
+from database.repositories.repositories import ReadingRollupRepository
+from database.partitions import PartitionManager, TimestampOutOfRangeError
 
 class TestTemperatureService:
     
@@ -20,6 +23,7 @@ class TestTemperatureService:
         query.sensor_id = None
         query.limit = 100
         query.offset = 0
+        query.cursor = None
         return query
     
     @pytest.fixture
@@ -83,6 +87,37 @@ class TestTemperatureService:
         assert "equipment_status =" in sql_query
         assert "facility_id =" in sql_query
     
+    @pytest.mark.asyncio
+    @patch('api.services.temperature_service.db')
+    async def test_get_readings_with_cursor(self, mock_db, sample_customer, mock_query):
+        """Test a cursor page seeks past the cursor's reading and skips the count."""
+        position = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+        mock_query.cursor = encode_cursor(position, 42)
+        mock_db.fetch = AsyncMock(return_value=[])
+        mock_db.fetchrow = AsyncMock()
+
+        readings, total = await TemperatureService.get_readings(sample_customer, mock_query)
+
+        assert total is None
+        mock_db.fetchrow.assert_not_called()
+        sql_query, *params = mock_db.fetch.call_args[0]
+        assert "(tr.recorded_at, tr.id) < ($2, $3)" in sql_query
+        assert "ORDER BY tr.recorded_at DESC, tr.id DESC LIMIT $4" in sql_query
+        assert "OFFSET" not in sql_query
+        assert params == [sample_customer['id'], position, 42, 100]
+
+    @pytest.mark.asyncio
+    @patch('api.services.temperature_service.db')
+    async def test_get_readings_rejects_bad_cursor(self, mock_db, sample_customer, mock_query):
+        """Test a malformed cursor is a ValueError and runs no query."""
+        mock_query.cursor = "not-a-cursor"
+        mock_db.fetch = AsyncMock()
+
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            await TemperatureService.get_readings(sample_customer, mock_query)
+
+        mock_db.fetch.assert_not_called()
+
     @pytest.mark.asyncio
     @patch('api.services.temperature_service.db')
     async def test_create_reading_success(self, mock_db, sample_temperature_data):
@@ -123,9 +158,27 @@ class TestTemperatureService:
         
         reading_data = MagicMock()
         reading_data.storage_unit_id = 'nonexistent_unit'
+        reading_data.recorded_at = datetime.now()
         
         with pytest.raises(ValueError, match="Storage unit not found"):
             await TemperatureService.create_reading(customer_id, reading_data)
+
+    @pytest.mark.asyncio
+    @patch('api.services.temperature_service.partition_manager')
+    @patch('api.services.temperature_service.db')
+    async def test_create_reading_rejects_out_of_window_timestamp(self, mock_db, mock_partitions):
+        """Test an epoch timestamp is rejected before any partition is created."""
+        mock_db.fetchrow = AsyncMock()
+        mock_partitions.accepts = PartitionManager().accepts
+        mock_partitions.ensure_periods = AsyncMock()
+        
+        reading_data = MagicMock()
+        reading_data.recorded_at = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        
+        with pytest.raises(TimestampOutOfRangeError):
+            await TemperatureService.create_reading(uuid4(), reading_data)
+        mock_db.fetchrow.assert_not_called()
+        mock_partitions.ensure_periods.assert_not_called()
     
     @pytest.mark.asyncio
     @patch('api.services.temperature_service.db')
@@ -188,3 +241,45 @@ class TestTemperatureService:
         assert 'metrics' in results[0]
         assert results[0]['group_key']['facility_id'] == 'facility_1'
         assert results[0]['metrics']['avg_temperature'] == -20.0
+
+    @pytest.mark.asyncio
+    @patch('api.services.temperature_service.db')
+    async def test_get_aggregation_reads_rollups(self, mock_db):
+        """Test time and unit groupings are answered from the rollups."""
+        aggregation_params = MagicMock()
+        aggregation_params.group_by = ['day', 'unit']
+        aggregation_params.aggregations = ['avg', 'count']
+        aggregation_params.facility_id = None
+        aggregation_params.storage_unit_id = None
+        aggregation_params.start_date = datetime(2024, 1, 1, 10, 30)
+        aggregation_params.end_date = datetime(2024, 1, 8)
+        mock_db.fetch = AsyncMock(return_value=[])
+
+        with patch.object(ReadingRollupRepository, 'enabled', True):
+            await TemperatureService.get_aggregation(uuid4(), aggregation_params)
+
+        sql_query = mock_db.fetch.call_args[0][0]
+        assert "FROM public.temperature_rollup_daily" in sql_query
+        assert "SUM(p.temperature_sum) / NULLIF(SUM(p.reading_count), 0) as avg_temperature" in sql_query
+        assert "DATE_TRUNC('day', p.bucket, 'UTC')" in sql_query
+
+    @pytest.mark.asyncio
+    @patch('api.services.temperature_service.db')
+    async def test_get_aggregation_by_sensor_scans_readings(self, mock_db):
+        """Test per-sensor groupings still scan the raw readings."""
+        aggregation_params = MagicMock()
+        aggregation_params.group_by = ['day', 'sensor']
+        aggregation_params.aggregations = ['max']
+        aggregation_params.facility_id = None
+        aggregation_params.storage_unit_id = None
+        aggregation_params.start_date = None
+        aggregation_params.end_date = None
+        mock_db.fetch = AsyncMock(return_value=[{'sensor_id': 's1', 'max_temperature': -18.0}])
+
+        results = await TemperatureService.get_aggregation(uuid4(), aggregation_params)
+
+        sql_query = mock_db.fetch.call_args[0][0]
+        assert "FROM temperature_readings tr" in sql_query
+        # Same UTC day boundaries as the rollup path
+        assert "DATE_TRUNC('day', tr.recorded_at, 'UTC')" in sql_query
+        assert results[0]['group_key']['sensor_id'] == 's1'
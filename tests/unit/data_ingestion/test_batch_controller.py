@@ -0,0 +1,68 @@
+import pytest
+from unittest.mock import patch
+
+from data_ingestion.consumer.batch_controller import BatchController
+
+
+class TestBatchController:
+
+    def run_window(self, controller, mock_time, arrivals, batch_size, insert_latency):
+        """Simulate one second of traffic followed by a flush."""
+        controller.observe_arrivals(arrivals)
+        mock_time.return_value += 1.0
+        controller.observe_flush(batch_size, insert_latency)
+
+    @patch('data_ingestion.consumer.batch_controller.time.monotonic', return_value=0.0)
+    def test_low_volume_shortens_flush_interval(self, mock_time):
+        """Test a trickle of readings is flushed well before the fixed timeout."""
+        controller = BatchController(batch_size=100, flush_interval=10, target_latency=2, smoothing=1.0)
+
+        self.run_window(controller, mock_time, arrivals=5, batch_size=5, insert_latency=0.01)
+
+        assert controller.batch_size == 100
+        assert controller.flush_interval < 2
+
+    @patch('data_ingestion.consumer.batch_controller.time.monotonic', return_value=0.0)
+    def test_high_volume_grows_batches(self, mock_time):
+        """Test a heavy stream with cheap inserts uses large batches."""
+        controller = BatchController(batch_size=100, max_batch_size=5000, flush_interval=10,
+                                     target_latency=2, smoothing=1.0)
+
+        self.run_window(controller, mock_time, arrivals=20000, batch_size=100, insert_latency=0.01)
+
+        # 2s / (1/20000 + 0.0001) ~= 13333, capped at the maximum
+        assert controller.batch_size == 5000
+
+    @patch('data_ingestion.consumer.batch_controller.time.monotonic', return_value=0.0)
+    def test_slow_inserts_shrink_batches(self, mock_time):
+        """Test batches shrink when each reading is expensive to insert."""
+        controller = BatchController(batch_size=10, max_batch_size=5000, flush_interval=10,
+                                     target_latency=2, smoothing=1.0)
+
+        self.run_window(controller, mock_time, arrivals=2000, batch_size=1000, insert_latency=1.0)
+
+        # 2s / (1/2000 + 0.001) ~= 1333
+        assert controller.batch_size == 1333
+        assert controller.flush_interval == pytest.approx(2 - 1333 * 0.001)
+
+    @patch('data_ingestion.consumer.batch_controller.time.monotonic', return_value=0.0)
+    def test_setpoints_hold_within_update_interval(self, mock_time):
+        """Test setpoints only move once per update interval."""
+        controller = BatchController(batch_size=100, flush_interval=10, target_latency=2, smoothing=1.0)
+
+        controller.observe_arrivals(20000)
+        mock_time.return_value = 0.5
+        controller.observe_flush(100, 0.01)
+
+        assert controller.batch_size == 100
+        assert controller.flush_interval == 10
+
+    def test_fixed_mode_never_adapts(self):
+        """Test the configured size and interval are kept when adaptation is off."""
+        controller = BatchController(batch_size=100, flush_interval=10, adaptive=False, update_interval=0)
+
+        controller.observe_arrivals(100000)
+        controller.observe_flush(100, 0.01)
+
+        assert controller.get_stats()['batch_size'] == 100
+        assert controller.get_stats()['flush_interval_seconds'] == 10
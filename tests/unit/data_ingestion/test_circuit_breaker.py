@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import patch
+
+from data_ingestion.collectors.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class TestCircuitBreaker:
+
+    @pytest.fixture
+    def breaker(self):
+        return CircuitBreaker(failure_threshold=3, base_backoff=10, max_backoff=40,
+                              timeout_multiplier=3, min_timeout=1, max_timeout=20, min_samples=5)
+
+    def test_opens_after_consecutive_failures(self, breaker):
+        """Test the circuit opens only after the failure threshold."""
+        breaker.record_failure()
+        breaker.record_success(0.1)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.available()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request('c1')
+
+    @patch('data_ingestion.collectors.circuit_breaker.time.monotonic')
+    def test_probe_backs_off_exponentially(self, mock_time, breaker):
+        """Test a failed probe doubles the backoff and a good one closes the circuit."""
+        mock_time.return_value = 100.0
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.open_until == 110.0
+
+        mock_time.return_value = 110.0
+        breaker.before_request('c1')
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # Only one probe at a time
+        assert not breaker.available()
+
+        breaker.record_failure()
+        assert breaker.open_until == 130.0
+
+        mock_time.return_value = 130.0
+        breaker.before_request('c1')
+        breaker.record_success(0.2)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.backoff == 10
+
+    def test_abandoned_probe_can_be_retried(self, breaker):
+        """Test a cancelled probe does not leave the circuit half open."""
+        for _ in range(3):
+            breaker.record_failure()
+        breaker.open_until = 0
+        breaker.before_request('c1')
+
+        breaker.abandon()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.available()
+
+    def test_timeout_follows_p99_latency(self, breaker):
+        """Test the deadline is a multiple of p99 within bounds."""
+        assert breaker.timeout() is None
+
+        for latency in (0.5, 0.5, 0.6, 0.7, 2.0):
+            breaker.record_success(latency)
+        assert breaker.percentile(99) == 2.0
+        assert breaker.timeout() == 6.0
+
+        for _ in range(50):
+            breaker.record_success(0.01)
+        assert breaker.timeout() == 1
+
+    def test_success_rate_is_rolling(self, breaker):
+        """Test the success rate covers the outcome window."""
+        breaker.record_success(0.1)
+        breaker.record_failure()
+
+        assert breaker.success_rate() == 0.5
@@ -0,0 +1,153 @@
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from data_ingestion.collectors.api_collector import APICollector
+from data_ingestion.collectors.csv_collector import CSVCollector, CSVStreamParser
+from data_ingestion.collectors.conditional import ConditionalRequestState
+from data_ingestion.collectors.transport import CollectorTransport
+
+
+@asynccontextmanager
+async def serve_readings():
+    """Local API endpoint returning readings with an ETag"""
+    async def readings(request):
+        return web.json_response({'readings': [{'temperature': -18.5}]}, headers={'ETag': '"v1"'})
+
+    app = web.Application()
+    app.router.add_get('/readings', readings)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        yield server
+    finally:
+        await server.close()
+
+
+class TestCSVCollector:
+
+    @pytest.fixture
+    def since(self):
+        return datetime(2025, 6, 18, 11, 0, tzinfo=timezone.utc)
+
+    def test_rows_before_watermark_are_skipped(self, since):
+        """Test rows recorded before the high-water mark are detected."""
+        assert CSVCollector.is_before({'timestamp': '2025-06-18T10:59:59'}, since)
+        assert CSVCollector.is_before({'recorded_at': '2025-06-18T12:59:00+02:00'}, since)
+
+    def test_rows_at_or_after_watermark_are_kept(self, since):
+        """Test rows at the mark, later rows and unparseable rows are kept."""
+        assert not CSVCollector.is_before({'timestamp': '2025-06-18T11:00:00Z'}, since)
+        assert not CSVCollector.is_before({'timestamp': '2025-06-18T11:30:00'}, since)
+        assert not CSVCollector.is_before({'timestamp': 'yesterday'}, since)
+        assert not CSVCollector.is_before({}, since)
+
+
+class TestAPICollector:
+
+    @pytest.mark.asyncio
+    async def test_validators_stored_after_readings_are_handled(self):
+        """Test the ETag is remembered once the readings were handed to on_batch."""
+        collector = APICollector(transport=CollectorTransport())
+        received = []
+
+        async def on_batch(readings):
+            received.extend(readings)
+
+        async with serve_readings() as server:
+            customer = {'id': 'c1', 'customer_code': 'C1', 'api_url': str(server.make_url('/readings'))}
+            try:
+                readings, log_data = await collector.collect(customer, on_batch=on_batch)
+            finally:
+                await collector.close()
+
+        assert readings == []
+        assert received == [{'temperature': -18.5}]
+        assert log_data['records_succeeded'] == 1
+        assert collector.conditional.request_headers('c1')['If-None-Match'] == '"v1"'
+
+    @pytest.mark.asyncio
+    async def test_failed_publish_keeps_validators(self):
+        """Test a publish failure leaves no validators, so the next poll fetches the readings again."""
+        collector = APICollector(transport=CollectorTransport())
+
+        async def on_batch(readings):
+            raise ConnectionError("queue down")
+
+        async with serve_readings() as server:
+            customer = {'id': 'c1', 'customer_code': 'C1', 'api_url': str(server.make_url('/readings'))}
+            try:
+                _, log_data = await collector.collect(customer, on_batch=on_batch)
+            finally:
+                await collector.close()
+
+        assert log_data['status'] == 'failure'
+        assert 'If-None-Match' not in collector.conditional.request_headers('c1')
+
+
+class TestCSVStreamParser:
+
+    @pytest.fixture
+    def content(self):
+        rows = [
+            'timestamp,facility_id,unit_id,temperature,notes',
+            '2025-06-18T11:00:00,F1,U1,-18.5,"door opened, closed"',
+            '2025-06-18T11:01:00,F1,U2,-19.0,"multi',
+            'line ""quoted"" note"',
+            '2025-06-18T11:02:00,F1,U1,-18.4',
+        ]
+        return ('﻿' + '\n'.join(rows) + '\n').encode('utf-8')
+
+    def test_matches_dict_reader_for_any_chunk_size(self, content):
+        """Test rows are identical to csv.DictReader however the bytes are split."""
+        import csv
+        import io
+        expected = list(csv.DictReader(io.StringIO(content.decode('utf-8-sig'))))
+
+        for chunk_size in (1, 7, 64, len(content)):
+            parser = CSVStreamParser()
+            rows = []
+            for start in range(0, len(content), chunk_size):
+                rows.extend(parser.feed(content[start:start + chunk_size]))
+            rows.extend(parser.feed(b'', final=True))
+
+            assert rows == [dict(r) for r in expected]
+
+    def test_rows_are_released_as_they_complete(self, content):
+        """Test complete records are returned before the end of the stream."""
+        parser = CSVStreamParser()
+
+        rows = parser.feed(content[:content.index(b'multi')])
+
+        assert len(rows) == 1
+        assert rows[0]['notes'] == 'door opened, closed'
+
+    def test_unterminated_last_row_is_flushed(self):
+        """Test a final row without a trailing newline is returned on the final feed."""
+        parser = CSVStreamParser()
+
+        assert parser.feed(b'a,b\n1,2') == []
+        assert parser.feed(b'', final=True) == [{'a': '1', 'b': '2'}]
+
+
+class TestConditionalRequestState:
+
+    def test_validators_round_trip(self):
+        """Test stored validators are sent back as conditional headers."""
+        state = ConditionalRequestState()
+        state.update('c1', {'ETag': '"abc"', 'Last-Modified': 'Wed, 18 Jun 2025 11:00:00 GMT'})
+
+        headers = state.request_headers('c1')
+
+        assert headers['If-None-Match'] == '"abc"'
+        assert headers['If-Modified-Since'] == 'Wed, 18 Jun 2025 11:00:00 GMT'
+        assert 'gzip' in headers['Accept-Encoding']
+
+    def test_unknown_customer_sends_plain_request(self):
+        """Test no conditional headers are sent before the first response."""
+        headers = ConditionalRequestState().request_headers('c1')
+
+        assert 'If-None-Match' not in headers
+        assert 'If-Modified-Since' not in headers
@@ -0,0 +1,169 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from data_ingestion.processors.data_processor import DataProcessor, ENVELOPE_EVENT_TYPE
+from data_ingestion.processors.hierarchy_index import HierarchyIndex
+from database.repositories.repositories import TemperatureReadingRepository
+
+
+class TestDataProcessor:
+
+    @pytest.fixture
+    def customer_id(self):
+        return str(uuid4())
+
+    @pytest.fixture
+    def processor(self, customer_id):
+        """Processor with a preloaded mapping for one facility and two units."""
+        index = HierarchyIndex(negative_ttl=60)
+        facility_id = str(uuid4())
+        index.apply(customer_id, [
+            {'facility_id': facility_id, 'facility_code': 'F1', 'unit_id': str(uuid4()), 'unit_code': 'U1'},
+            {'facility_id': facility_id, 'facility_code': 'F1', 'unit_id': str(uuid4()), 'unit_code': 'U2'},
+        ])
+        return DataProcessor(envelope_size=2, index=index)
+
+    @pytest.fixture
+    def readings(self):
+        return [
+            {'facility_id': 'F1', 'unit_id': 'U1', 'temperature': -18.0, 'timestamp': '2025-06-18T11:00:00Z'},
+            {'facility_id': 'F1', 'unit_id': 'U2', 'temperature': -19.0, 'timestamp': '2025-06-18T11:00:00Z'},
+            {'facility_id': 'F1', 'unit_id': 'U1', 'temperature': -18.5, 'timestamp': '2025-06-18T11:01:00Z'},
+            {'facility_id': 'F1', 'unit_id': 'UNKNOWN', 'temperature': -17.0, 'timestamp': '2025-06-18T11:00:00Z'},
+        ]
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.processors.hierarchy_index.db')
+    async def test_readings_are_published_in_envelopes(self, mock_db, processor, customer_id, readings):
+        """Test readings are grouped per facility and split at the envelope size."""
+        mock_queue = processor.queue = MagicMock()
+        mock_queue.publish = AsyncMock()
+        mock_db.fetch = AsyncMock(return_value=[])
+
+        count = await processor.process_api_readings(customer_id, readings)
+
+        assert count == 3
+        assert mock_queue.publish.await_count == 2
+        envelope = mock_queue.publish.call_args_list[0][0][0]
+        assert envelope['event_type'] == ENVELOPE_EVENT_TYPE
+        assert len(envelope['readings']) == 2
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.processors.hierarchy_index.db')
+    async def test_envelopes_can_be_disabled(self, mock_db, processor, customer_id, readings):
+        """Test an envelope size of 1 keeps the one-message-per-reading format."""
+        mock_queue = processor.queue = MagicMock()
+        mock_queue.publish = AsyncMock()
+        mock_db.fetch = AsyncMock(return_value=[])
+        processor.envelope_size = 1
+
+        count = await processor.process_api_readings(customer_id, readings)
+
+        assert count == 3
+        assert mock_queue.publish.await_count == 3
+        assert mock_queue.publish.call_args_list[0][0][0]['event_type'] == 'temperature_reading'
+
+    def test_expand_event_round_trip(self):
+        """Test envelopes expand into events carrying their shared IDs."""
+        envelope = {
+            'event_type': ENVELOPE_EVENT_TYPE,
+            'customer_id': 'c',
+            'facility_id': 'f',
+            'readings': [{'unit_id': 'u1', 'data': {}}, {'unit_id': 'u2', 'data': {}}]
+        }
+
+        events = DataProcessor.expand_event(envelope)
+
+        assert [e['unit_id'] for e in events] == ['u1', 'u2']
+        assert all(e['customer_id'] == 'c' and e['facility_id'] == 'f' for e in events)
+
+    @pytest.fixture
+    def events(self):
+        """Events covering the value shapes sources send, good and bad."""
+        data = [
+            {'timestamp': '2025-06-18T11:00:00Z', 'temperature': -18.2, 'quality_score': 1, 'sensor_id': 's1'},
+            {'recorded_at': '2025-06-18T13:00:00+02:00', 'temperature': '-19.5', 'quality_score': '2.9'},
+            {'reading_time': '2025-06-18T11:00:00.250000', 'temperature': ' 4 ', 'temperature_unit': 'F'},
+            {'timestamp': datetime(2025, 6, 18, 11, 0), 'temperature': None, 'quality_score': ''},
+            {'timestamp': 'not a time', 'temperature': 'warm', 'quality_score': 'high'},
+            {'temperature': 3, 'equipment_status': 'defrost', 'sensor_id': None},
+        ]
+        return [
+            {'customer_id': 'c', 'facility_id': 'f', 'unit_id': f'u{i}', 'data': d}
+            for i, d in enumerate(data * 10)
+        ]
+
+    @pytest.mark.parametrize('threshold', [1, 1000])
+    def test_map_batch_values(self, processor, events, threshold):
+        """Test batch mapping on both the vectorized and per-value paths."""
+        processor.vectorize_threshold = threshold
+        before = datetime.now(timezone.utc)
+
+        records = [dict(zip(TemperatureReadingRepository.record_columns, r)) for r in processor.map_batch(events)]
+
+        utc = timezone.utc
+        assert [r['recorded_at'] for r in records[:4]] == [
+            datetime(2025, 6, 18, 11, 0, tzinfo=utc),
+            datetime(2025, 6, 18, 11, 0, tzinfo=utc),
+            datetime(2025, 6, 18, 11, 0, 0, 250000, tzinfo=utc),
+            datetime(2025, 6, 18, 11, 0, tzinfo=utc),
+        ]
+        assert records[4]['recorded_at'] >= before and records[5]['recorded_at'] >= before
+        assert [r['temperature'] for r in records[:6]] == [-18.2, -19.5, 4.0, 0.0, 0.0, 3.0]
+        assert [r['quality_score'] for r in records[:6]] == [1, 2, 1, 1, 1, 1]
+        assert all(type(r['quality_score']) is int and type(r['temperature']) is float for r in records)
+        assert [r['sensor_id'] for r in records[:6]] == ['s1', '', '', '', '', '']
+        assert records[2]['temperature_unit'] == 'F' and records[5]['equipment_status'] == 'defrost'
+        assert records[7]['storage_unit_id'] == 'u7'
+        assert len({r['created_at'] for r in records}) == 1
+
+    def test_map_batch_matches_single_event_mapping(self, processor, events):
+        """Test batch records carry the same values as map_temperature_reading."""
+        valid = [e for e in events if e['data'].get('temperature') not in ('warm', None)][:3]
+
+        for event, record in zip(valid, processor.map_batch(valid)):
+            single = processor.map_temperature_reading(event)
+            expected = TemperatureReadingRepository.to_record(single)
+            assert record[:5] == expected[:5] and record[6:9] == expected[6:9]
+            assert record[5] == single['recorded_at'].replace(tzinfo=single['recorded_at'].tzinfo or timezone.utc)
+
+    def test_map_message_envelope(self, processor):
+        """Test envelopes map to one record per reading without expanding events."""
+        envelope = {
+            'event_type': ENVELOPE_EVENT_TYPE,
+            'customer_id': 'c',
+            'facility_id': 'f',
+            'readings': [
+                {'unit_id': 'u1', 'data': {'timestamp': '2025-06-18T11:00:00Z', 'temperature': 1}},
+                {'unit_id': 'u2', 'data': {'timestamp': '2025-06-18T11:01:00Z', 'temperature': 2}},
+            ]
+        }
+
+        records = processor.map_message(envelope)
+
+        assert [r[:4] for r in records] == [('c', 'f', 'u1', 1.0), ('c', 'f', 'u2', 2.0)]
+        assert processor.map_message(dict(envelope, readings=[])) == []
+
+    @pytest.mark.asyncio
+    async def test_recent_duplicates_are_dropped(self, processor, customer_id, readings):
+        """Test a reading returned by an overlapping poll is not published twice."""
+        mock_queue = processor.queue = MagicMock()
+        mock_queue.publish = AsyncMock()
+        overlap = readings[:2] + [dict(readings[0], temperature=-18.1)]
+
+        first = await processor.process_api_readings(customer_id, readings[:3])
+        second = await processor.process_api_readings(customer_id, overlap)
+
+        assert first == 3
+        assert second == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_publish_forgets_keys(self, processor, customer_id, readings):
+        """Test readings whose publish failed are not treated as duplicates later."""
+        mock_queue = processor.queue = MagicMock()
+        mock_queue.publish = AsyncMock(side_effect=[Exception("broker down"), None])
+
+        assert await processor.process_api_readings(customer_id, readings[:1]) == 0
+        assert await processor.process_api_readings(customer_id, readings[:1]) == 1
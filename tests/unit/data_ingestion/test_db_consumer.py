@@ -0,0 +1,468 @@
+import asyncio
+import asyncpg
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from data_ingestion.consumer.db_consumer import DatabaseConsumer
+from data_ingestion.consumer.spool import WriteAheadSpool
+from data_ingestion.queue.wire_format import CONTENT_TYPE_COMPACT, decode_body, encode_envelope
+from database.repositories.repositories import TemperatureReadingRepository
+from database.partitions import PartitionManager, TimestampOutOfRangeError
+
+
+class TestDatabaseConsumer:
+
+    @pytest.fixture
+    def sample_event(self):
+        """Sample queue event."""
+        return {
+            'event_type': 'temperature_reading',
+            'customer_id': str(uuid4()),
+            'facility_id': str(uuid4()),
+            'unit_id': str(uuid4()),
+            'data': {
+                'timestamp': datetime.now().isoformat(),
+                'temperature': -18.2,
+                'sensor_id': 'sensor_001'
+            }
+        }
+
+    def make_delivery(self):
+        """Mock AMQP message."""
+        delivery = MagicMock()
+        delivery.ack = AsyncMock()
+        delivery.nack = AsyncMock()
+        delivery.reject = AsyncMock()
+        return delivery
+
+    def test_prefetch_holds_a_full_batch(self):
+        """Test the prefetch window covers the batches in flight plus the one being assembled."""
+        consumer = DatabaseConsumer(batch_size=500, prefetch_count=100, max_in_flight=3, max_batch_size=500,
+                                    readings_per_message=1, use_spool=False)
+
+        assert consumer.prefetch_count == 2000
+
+    def test_prefetch_counts_envelopes_in_messages(self):
+        """Test the window is sized in messages when each carries many readings."""
+        consumer = DatabaseConsumer(prefetch_count=1, max_in_flight=4, max_batch_size=5000,
+                                    readings_per_message=500, use_spool=False)
+
+        assert consumer.prefetch_count == 50
+        assert consumer.max_unacked_readings == 25000
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_acks_after_commit(self, mock_repo, mock_watermarks, sample_event):
+        """Test messages are acked in bulk only once the batch is written."""
+        mock_repo.create_batch = AsyncMock(return_value=2)
+        mock_watermarks.advance = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=2, ack_after_commit=True, use_spool=False)
+        first, second = self.make_delivery(), self.make_delivery()
+
+        await consumer.handle_message(sample_event, first)
+        first.ack.assert_not_called()
+
+        await consumer.handle_message(sample_event, second)
+        await consumer.wait_for_flushes()
+
+        mock_repo.create_batch.assert_awaited_once()
+        second.ack.assert_awaited_once_with(multiple=True)
+        first.ack.assert_not_called()
+        assert consumer.pending_messages == []
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_retries_on_failed_commit(self, mock_repo, sample_event):
+        """Test a failed insert sends each message to retry instead of holding it in memory."""
+        mock_repo.create_batch = AsyncMock(side_effect=Exception("db down"))
+        mock_queue = MagicMock()
+        mock_queue.retry_or_dead_letter = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=2, ack_after_commit=True, use_spool=False, queue=mock_queue)
+        first, second = self.make_delivery(), self.make_delivery()
+
+        await consumer.handle_message(sample_event, first)
+        await consumer.handle_message(sample_event, second)
+        await consumer.wait_for_flushes()
+
+        retried = [c[0][0] for c in mock_queue.retry_or_dead_letter.await_args_list]
+        assert retried == [first, second]
+        assert mock_queue.retry_or_dead_letter.await_args[0][1] == consumer.queue_name
+        second.nack.assert_not_called()
+        assert consumer.pending_batch == []
+
+    @pytest.mark.asyncio
+    async def test_unmappable_message_is_dead_lettered(self):
+        """Test a message that cannot be mapped goes straight to the dead-letter queue."""
+        mock_queue = MagicMock()
+        mock_queue.dead_letter = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=10, ack_after_commit=True, use_spool=False, queue=mock_queue)
+        delivery = self.make_delivery()
+
+        await consumer.handle_message({'event_type': 'temperature_reading'}, delivery)
+
+        mock_queue.dead_letter.assert_awaited_once()
+        assert mock_queue.dead_letter.await_args[0][0] is delivery
+        assert consumer.pending_batch == []
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_failed_dead_letter_is_not_bulk_acked(self, mock_repo, mock_watermarks, sample_event):
+        """Test a message left unacked by a failed dead-letter is not covered by the next bulk ack."""
+        mock_repo.create_batch = AsyncMock(return_value=1)
+        mock_watermarks.advance = AsyncMock()
+        mock_queue = MagicMock()
+        mock_queue.dead_letter = AsyncMock(return_value=False)
+        consumer = DatabaseConsumer(batch_size=1, ack_after_commit=True, use_spool=False, queue=mock_queue)
+        unmappable, good = self.make_delivery(), self.make_delivery()
+        unmappable.channel.is_closed = False
+
+        await consumer.handle_message({'event_type': 'temperature_reading'}, unmappable)
+        await consumer.handle_message(sample_event, good)
+        await consumer.wait_for_flushes()
+
+        good.ack.assert_awaited_once_with()
+        unmappable.ack.assert_not_called()
+        assert [c[0][0] for c in mock_queue.dead_letter.await_args_list] == [unmappable, unmappable]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('handed_off, channel_closed', [(True, False), (False, True)])
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_bulk_acks_resume_once_stranded_message_is_settled(
+        self, mock_repo, mock_watermarks, sample_event, handed_off, channel_closed
+    ):
+        """Test bulk acks resume once the stranded message is handed off or its channel has closed."""
+        mock_repo.create_batch = AsyncMock(return_value=1)
+        mock_watermarks.advance = AsyncMock()
+        mock_queue = MagicMock()
+        mock_queue.dead_letter = AsyncMock(side_effect=[False, handed_off])
+        consumer = DatabaseConsumer(batch_size=1, ack_after_commit=True, use_spool=False, queue=mock_queue)
+        unmappable, good = self.make_delivery(), self.make_delivery()
+        unmappable.channel.is_closed = channel_closed
+
+        await consumer.handle_message({'event_type': 'temperature_reading'}, unmappable)
+        await consumer.handle_message(sample_event, good)
+        await consumer.wait_for_flushes()
+
+        good.ack.assert_awaited_once_with(multiple=True)
+        assert consumer._stranded == []
+        assert mock_queue.dead_letter.await_count == (1 if channel_closed else 2)
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_missing_partition_is_created_and_retried(self, mock_repo, mock_watermarks, sample_event):
+        """Test a backfilled batch gets the partitions of its own periods only and is written on the retry."""
+        missing = asyncpg.exceptions.CheckViolationError('no partition of relation "temperature_readings" found for row')
+        mock_repo.create_batch = AsyncMock(side_effect=[missing, 2])
+        mock_watermarks.advance = AsyncMock()
+        partitions = MagicMock(wraps=PartitionManager())
+        partitions.ensure_periods = AsyncMock(return_value=[])
+        consumer = DatabaseConsumer(batch_size=10, ack_after_commit=False, use_spool=False, partitions=partitions)
+        now = datetime.now(timezone.utc)
+        old = now - timedelta(days=400)
+        for moment in (old, now):
+            await consumer.handle_message(dict(sample_event, data=dict(sample_event['data'], timestamp=moment.isoformat())))
+        await consumer.flush_batch()
+
+        moments = partitions.ensure_periods.await_args.args[0]
+        assert moments == [old, now]
+        partitions.ensure_range.assert_not_called()
+        assert mock_repo.create_batch.await_count == 2
+        mock_watermarks.advance.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_out_of_window_message_is_dead_lettered(self, sample_event):
+        """Test a message with an epoch timestamp is dead-lettered instead of creating partitions."""
+        mock_queue = MagicMock()
+        mock_queue.dead_letter = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=10, ack_after_commit=True, use_spool=False, queue=mock_queue)
+        delivery = self.make_delivery()
+        epoch = dict(sample_event, data=dict(sample_event['data'], timestamp='1970-01-01T00:00:00Z'))
+
+        await consumer.handle_message(epoch, delivery)
+
+        mock_queue.dead_letter.assert_awaited_once()
+        assert mock_queue.dead_letter.await_args[0][0] is delivery
+        assert isinstance(mock_queue.dead_letter.await_args[0][2], TimestampOutOfRangeError)
+        assert consumer.pending_batch == []
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_envelope_is_unpacked_into_batch(self, mock_repo, sample_event):
+        """Test a batch envelope adds every reading but holds a single delivery."""
+        mock_repo.create_batch = AsyncMock(return_value=3)
+        consumer = DatabaseConsumer(batch_size=100, ack_after_commit=True, use_spool=False)
+        envelope = {
+            'event_type': 'temperature_reading_batch',
+            'customer_id': sample_event['customer_id'],
+            'facility_id': sample_event['facility_id'],
+            'readings': [
+                {'unit_id': sample_event['unit_id'], 'data': sample_event['data']}
+                for _ in range(3)
+            ]
+        }
+        delivery = self.make_delivery()
+
+        await consumer.handle_message(envelope, delivery)
+
+        assert len(consumer.pending_batch) == 3
+        record = dict(zip(TemperatureReadingRepository.record_columns, consumer.pending_batch[0]))
+        assert record['storage_unit_id'] == sample_event['unit_id']
+        assert consumer.pending_messages == [delivery]
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_flush_advances_watermarks(self, mock_repo, mock_watermarks, sample_event):
+        """Test a committed batch moves each customer's high-water mark to its latest reading."""
+        mock_repo.create_batch = AsyncMock(return_value=2)
+        mock_watermarks.advance = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=10, ack_after_commit=False, use_spool=False)
+        later = dict(sample_event, data=dict(sample_event['data'], timestamp='2025-01-02T00:00:00Z'))
+        earlier = dict(sample_event, data=dict(sample_event['data'], timestamp='2025-01-01T00:00:00Z'))
+
+        await consumer.handle_message(later)
+        await consumer.handle_message(earlier)
+        await consumer.flush_batch()
+
+        marks = mock_watermarks.advance.call_args[0][0]
+        assert marks == {sample_event['customer_id']: datetime(2025, 1, 2, tzinfo=timezone.utc)}
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_watermarks_ignore_future_and_substituted_times(self, mock_repo, mock_watermarks, sample_event):
+        """Test future readings are capped at the commit time and missing timestamps are skipped."""
+        mock_repo.create_batch = AsyncMock(return_value=3)
+        mock_watermarks.advance = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=10, ack_after_commit=False, use_spool=False)
+        ahead = (datetime.now(timezone.utc) + timedelta(hours=6)).isoformat()
+        future = dict(sample_event, data=dict(sample_event['data'], timestamp=ahead))
+        missing = dict(sample_event, customer_id=str(uuid4()), data=dict(sample_event['data'], timestamp=None))
+        invalid = dict(missing, data=dict(sample_event['data'], timestamp='yesterday'))
+
+        before = datetime.now(timezone.utc)
+        for event in (future, missing, invalid):
+            await consumer.handle_message(event)
+        await consumer.flush_batch()
+
+        marks = mock_watermarks.advance.call_args[0][0]
+        assert set(marks) == {sample_event['customer_id']}
+        assert before <= marks[sample_event['customer_id']] <= datetime.now(timezone.utc)
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_watermarks_ignore_substituted_times_in_compact_messages(self, mock_repo, mock_watermarks, sample_event):
+        """Test missing timestamps in a compact envelope do not move the watermark to the publish time."""
+        mock_repo.create_batch = AsyncMock(return_value=2)
+        mock_watermarks.advance = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=10, ack_after_commit=False, use_spool=False)
+        recorded = datetime.now(timezone.utc) - timedelta(hours=2)
+        envelope = {
+            'event_type': 'temperature_reading_batch',
+            'customer_id': sample_event['customer_id'],
+            'facility_id': sample_event['facility_id'],
+            'readings': [
+                {'unit_id': sample_event['unit_id'], 'data': dict(sample_event['data'], timestamp=timestamp)}
+                for timestamp in (recorded.isoformat(), None, 'yesterday')
+            ]
+        }
+
+        await consumer.handle_message(decode_body(encode_envelope(envelope), CONTENT_TYPE_COMPACT))
+        await consumer.flush_batch()
+
+        marks = mock_watermarks.advance.call_args[0][0]
+        assert marks[sample_event['customer_id']] == recorded.replace(microsecond=recorded.microsecond // 1000 * 1000)
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_failed_flush_keeps_watermarks(self, mock_repo, mock_watermarks, sample_event):
+        """Test watermarks only move after a successful commit."""
+        mock_repo.create_batch = AsyncMock(side_effect=Exception("db down"))
+        mock_watermarks.advance = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=10, ack_after_commit=False, use_spool=False)
+
+        await consumer.handle_message(sample_event)
+        await consumer.flush_batch()
+
+        mock_watermarks.advance.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_failed_commit_is_spooled_and_acked(self, mock_repo, mock_watermarks, sample_event, tmp_path):
+        """Test a batch the database is down for goes to the spool, is acked, and later batches queue behind it."""
+        mock_repo.create_batch = AsyncMock(side_effect=ConnectionRefusedError("db down"))
+        spool = WriteAheadSpool(str(tmp_path))
+        consumer = DatabaseConsumer(batch_size=1, ack_after_commit=True, spool=spool, max_in_flight=1)
+        first, second = self.make_delivery(), self.make_delivery()
+
+        await consumer.handle_message(sample_event, first)
+        await consumer.handle_message(sample_event, second)
+        await consumer.wait_for_flushes()
+
+        first.ack.assert_awaited_once_with(multiple=True)
+        second.ack.assert_awaited_once_with(multiple=True)
+        assert mock_repo.create_batch.await_count == 1
+        assert consumer.get_stats()['spool']['readings'] == 2
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_rejected_batch_is_retried_not_spooled(self, mock_repo, sample_event, tmp_path):
+        """Test a batch the database rejects goes through retry instead of blocking the spool."""
+        rejected = asyncpg.exceptions.StringDataRightTruncationError("value too long for type character varying(8)")
+        mock_repo.create_batch = AsyncMock(side_effect=rejected)
+        mock_queue = MagicMock()
+        mock_queue.retry_or_dead_letter = AsyncMock(return_value=True)
+        spool = WriteAheadSpool(str(tmp_path))
+        consumer = DatabaseConsumer(batch_size=1, ack_after_commit=True, spool=spool, queue=mock_queue)
+        delivery = self.make_delivery()
+
+        await consumer.handle_message(sample_event, delivery)
+        await consumer.wait_for_flushes()
+
+        assert len(spool) == 0
+        mock_queue.retry_or_dead_letter.assert_awaited_once()
+        assert mock_queue.retry_or_dead_letter.await_args[0][2] is rejected
+        delivery.ack.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_drainer_quarantines_rejected_batch(self, mock_repo, mock_watermarks, sample_event, tmp_path):
+        """Test the drainer moves a batch the database rejects aside and replays the ones behind it."""
+        rejected = asyncpg.exceptions.DataError("invalid input value")
+        mock_repo.create_batch = AsyncMock(side_effect=[rejected, 1])
+        mock_watermarks.advance = AsyncMock()
+        spool = WriteAheadSpool(str(tmp_path))
+        consumer = DatabaseConsumer(batch_size=10, spool=spool)
+        spool.append([consumer.processor.map_temperature_reading(sample_event)])
+        spool.append([consumer.processor.map_temperature_reading(sample_event)])
+
+        consumer.is_running = True
+        task = asyncio.create_task(consumer.drain_spool())
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if not len(spool):
+                break
+        consumer.is_running = False
+        task.cancel()
+
+        assert len(spool) == 0
+        assert mock_repo.create_batch.await_count == 2
+        assert spool.get_stats()['quarantined_batches'] == 1
+        mock_watermarks.advance.assert_awaited_once()
+
+    def test_unavailable_errors(self):
+        """Test only connection and availability failures count as the database being down."""
+        assert DatabaseConsumer.is_unavailable_error(asyncpg.exceptions.ConnectionDoesNotExistError("closed"))
+        assert DatabaseConsumer.is_unavailable_error(asyncpg.exceptions.TooManyConnectionsError("full"))
+        assert DatabaseConsumer.is_unavailable_error(asyncio.TimeoutError())
+        assert not DatabaseConsumer.is_unavailable_error(asyncpg.exceptions.DataError("bad value"))
+        assert not DatabaseConsumer.is_unavailable_error(asyncpg.exceptions._base.DataError("cannot encode"))
+        assert not DatabaseConsumer.is_unavailable_error(ValueError("bad record"))
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_drainer_replays_spool(self, mock_repo, mock_watermarks, sample_event, tmp_path):
+        """Test the drainer writes spooled batches once the database accepts them."""
+        mock_repo.create_batch = AsyncMock(return_value=1)
+        mock_watermarks.advance = AsyncMock()
+        spool = WriteAheadSpool(str(tmp_path))
+        consumer = DatabaseConsumer(batch_size=10, spool=spool)
+        spool.append([consumer.processor.map_temperature_reading(sample_event)])
+
+        consumer.is_running = True
+        task = asyncio.create_task(consumer.drain_spool())
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if not len(spool):
+                break
+        consumer.is_running = False
+        task.cancel()
+
+        assert len(spool) == 0
+        batch = mock_repo.create_batch.await_args[0][0]
+        assert batch[0]['storage_unit_id'] == sample_event['unit_id']
+        assert isinstance(batch[0]['recorded_at'], datetime)
+        mock_watermarks.advance.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_batches_are_written_concurrently(self, mock_repo, mock_watermarks, sample_event):
+        """Test several batches are in flight at once, bounded by max_in_flight."""
+        release = asyncio.Event()
+        active = 0
+        peak = 0
+
+        async def create_batch(batch):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await release.wait()
+            active -= 1
+            return len(batch)
+
+        mock_repo.create_batch = create_batch
+        mock_watermarks.advance = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=1, ack_after_commit=True, max_in_flight=2, use_spool=False)
+        deliveries = [self.make_delivery() for _ in range(3)]
+
+        for delivery in deliveries[:2]:
+            await consumer.handle_message(sample_event, delivery)
+        await asyncio.sleep(0)
+        assert peak == 2
+
+        # The third batch waits for a free slot
+        third = asyncio.create_task(consumer.handle_message(sample_event, deliveries[2]))
+        await asyncio.sleep(0.01)
+        assert not third.done()
+
+        release.set()
+        await third
+        await consumer.wait_for_flushes()
+        assert peak == 2
+        for delivery in deliveries:
+            delivery.ack.assert_awaited_once_with(multiple=True)
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_acks_follow_submission_order(self, mock_repo, mock_watermarks, sample_event):
+        """Test a batch that commits first is not acked before an earlier batch settles."""
+        first_done = asyncio.Event()
+        order = []
+        calls = 0
+
+        async def create_batch(batch):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await first_done.wait()
+            return len(batch)
+
+        mock_repo.create_batch = create_batch
+        mock_watermarks.advance = AsyncMock()
+        consumer = DatabaseConsumer(batch_size=1, ack_after_commit=True, max_in_flight=2, use_spool=False)
+        first, second = self.make_delivery(), self.make_delivery()
+        first.ack = AsyncMock(side_effect=lambda **kw: order.append('first'))
+        second.ack = AsyncMock(side_effect=lambda **kw: order.append('second'))
+
+        await consumer.handle_message(sample_event, first)
+        await asyncio.sleep(0)
+        await consumer.handle_message(sample_event, second)
+        await asyncio.sleep(0.01)
+        assert order == []
+
+        first_done.set()
+        await consumer.wait_for_flushes()
+        assert order == ['first', 'second']
@@ -0,0 +1,77 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from data_ingestion.processors.hierarchy_index import HierarchyIndex
+
+
+class TestHierarchyIndex:
+
+    @pytest.fixture
+    def customer_id(self):
+        return str(uuid4())
+
+    @pytest.fixture
+    def rows(self):
+        facility_id = uuid4()
+        return [
+            {'facility_id': facility_id, 'facility_code': 'F1', 'unit_id': uuid4(), 'unit_code': 'U1'},
+            {'facility_id': facility_id, 'facility_code': 'F1', 'unit_id': None, 'unit_code': None},
+        ]
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.processors.hierarchy_index.db')
+    async def test_refresh_uses_single_query(self, mock_db, customer_id, rows):
+        """Test a customer's whole hierarchy is loaded with one JOIN."""
+        mock_db.fetch = AsyncMock(return_value=rows)
+        index = HierarchyIndex()
+
+        await index.ensure_loaded(customer_id)
+        await index.ensure_loaded(customer_id)
+
+        mock_db.fetch.assert_awaited_once()
+        assert "JOIN public.storage_units" in mock_db.fetch.call_args[0][0]
+        facility_id, unit_id = index.lookup(customer_id, 'F1', 'U1')
+        assert facility_id == str(rows[0]['facility_id'])
+        assert unit_id == str(rows[0]['unit_id'])
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.processors.hierarchy_index.db')
+    async def test_miss_reloads_once_then_caches_negative(self, mock_db, customer_id, rows):
+        """Test an unknown unit triggers one reload and is then negatively cached."""
+        mock_db.fetch = AsyncMock(return_value=rows)
+        index = HierarchyIndex(negative_ttl=60)
+        index.apply(customer_id, rows)
+
+        assert await index.resolve(customer_id, 'F1', 'U9') == (str(rows[0]['facility_id']), None)
+        assert await index.resolve(customer_id, 'F1', 'U9') == (str(rows[0]['facility_id']), None)
+
+        mock_db.fetch.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.processors.hierarchy_index.db')
+    async def test_miss_picks_up_new_unit(self, mock_db, customer_id, rows):
+        """Test a unit provisioned after the last load is found on the miss reload."""
+        index = HierarchyIndex()
+        index.apply(customer_id, rows)
+        new_unit = uuid4()
+        mock_db.fetch = AsyncMock(return_value=rows + [
+            {'facility_id': rows[0]['facility_id'], 'facility_code': 'F1', 'unit_id': new_unit, 'unit_code': 'U2'}
+        ])
+
+        _, unit_id = await index.resolve(customer_id, 'F1', 'U2')
+
+        assert unit_id == str(new_unit)
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.processors.hierarchy_index.db')
+    async def test_invalidate_forces_reload(self, mock_db, customer_id, rows):
+        """Test a NOTIFY invalidation makes the next access reload."""
+        mock_db.fetch = AsyncMock(return_value=rows)
+        index = HierarchyIndex()
+        index.apply(customer_id, rows)
+
+        index.invalidate(customer_id)
+        await index.ensure_loaded(customer_id)
+
+        mock_db.fetch.assert_awaited_once()
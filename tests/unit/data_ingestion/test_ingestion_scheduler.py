@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from data_ingestion.schedulers.ingestion_scheduler import IngestionScheduler
+
+
+def make_customer(frequency=1, method='api'):
+    return {
+        'id': uuid4(),
+        'customer_code': 'TEST',
+        'data_sharing_method': method,
+        'data_frequency_seconds': frequency
+    }
+
+
+class TestIngestionScheduler:
+
+    @pytest.fixture
+    def scheduler(self):
+        scheduler = IngestionScheduler(max_concurrent=2, jitter_ratio=0)
+        scheduler.is_running = True
+        return scheduler
+
+    @pytest.mark.asyncio
+    async def test_overrun_is_coalesced(self, scheduler):
+        """Test a run due while the previous one is in flight is not stacked."""
+        release = asyncio.Event()
+
+        async def ingest(customer):
+            await release.wait()
+
+        scheduler.ingest_customer_data = AsyncMock(side_effect=ingest)
+        customer = make_customer(frequency=0.05)
+
+        await scheduler.schedule_customer(customer)
+        loop_task = asyncio.create_task(scheduler._run_scheduler())
+        await asyncio.sleep(0.3)
+        release.set()
+        scheduler.is_running = False
+        scheduler._wakeup.set()
+        await loop_task
+
+        assert scheduler.ingest_customer_data.await_count == 1
+        assert scheduler.coalesced_runs[customer['id']] >= 2
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, scheduler):
+        """Test no more than max_concurrent ingestions run at once."""
+        active = 0
+        peak = 0
+
+        async def ingest(customer):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+
+        scheduler.ingest_customer_data = ingest
+        for _ in range(6):
+            await scheduler.schedule_customer(make_customer(frequency=60))
+        loop_task = asyncio.create_task(scheduler._run_scheduler())
+        await asyncio.sleep(0.3)
+        scheduler.is_running = False
+        scheduler._wakeup.set()
+        await loop_task
+
+        assert peak == 2
+        assert len(scheduler.running_tasks) == 6
+
+    @pytest.mark.asyncio
+    async def test_reschedule_replaces_previous_entry(self, scheduler):
+        """Test rescheduling a customer does not leave its old timer behind."""
+        customer = make_customer(frequency=60)
+
+        await scheduler.schedule_customer(customer)
+        await scheduler.schedule_customer(customer)
+
+        live = [e for e in scheduler._heap if scheduler._generations[e[2]] == e[3]]
+        assert len(live) == 1
+
+    @pytest.mark.asyncio
+    async def test_first_runs_are_jittered(self):
+        """Test first runs are spread across the period."""
+        scheduler = IngestionScheduler(jitter_ratio=1.0)
+
+        for _ in range(50):
+            await scheduler.schedule_customer(make_customer(frequency=60))
+
+        due_times = sorted(e[0] for e in scheduler._heap)
+        assert due_times[-1] - due_times[0] > 30
+
+    @pytest.mark.asyncio
+    async def test_unknown_method_is_not_scheduled(self, scheduler):
+        """Test customers with an unsupported method are skipped."""
+        await scheduler.schedule_customer(make_customer(method='ftp'))
+
+        assert scheduler.customers == {}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("frequency", [0, -5, None, "60"])
+    async def test_invalid_frequency_is_not_scheduled(self, scheduler, frequency):
+        """Test customers without a positive frequency are skipped."""
+        await scheduler.schedule_customer(make_customer(frequency=frequency))
+
+        assert scheduler.customers == {}
+        assert scheduler._heap == []
+
+    @pytest.mark.asyncio
+    async def test_bad_entry_does_not_stop_the_loop(self, scheduler):
+        """Test a customer whose entry fails is dropped and the others keep polling."""
+        scheduler.ingest_customer_data = AsyncMock()
+        broken, healthy = make_customer(frequency=60), make_customer(frequency=60)
+        await scheduler.schedule_customer(broken)
+        await scheduler.schedule_customer(healthy)
+        # Corrupted after validation, e.g. by a later update of the record
+        broken['data_frequency_seconds'] = 0
+
+        loop_task = asyncio.create_task(scheduler._run_scheduler())
+        await asyncio.sleep(0.1)
+        scheduler.is_running = False
+        scheduler._wakeup.set()
+        await loop_task
+
+        assert broken['id'] not in scheduler.customers
+        assert healthy['id'] in scheduler.customers
+        assert scheduler.ingest_customer_data.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_shards_split_customers(self):
+        """Test each shard schedules only its customers and together they cover all."""
+        customers = [make_customer(frequency=60) for _ in range(30)]
+        scheduled = []
+
+        with patch('data_ingestion.schedulers.ingestion_scheduler.CustomerRepository.get_all_active',
+                   new=AsyncMock(return_value=customers)):
+            for index in range(3):
+                scheduler = IngestionScheduler(shard_index=index, shard_count=3)
+                await scheduler.schedule_all_customers()
+                scheduled.append(set(scheduler.customers))
+
+        assert all(scheduled)
+        assert set.union(*scheduled) == {c['id'] for c in customers}
+        assert sum(len(s) for s in scheduled) == len(customers)
+
+    def test_shard_index_out_of_range(self):
+        """Test a shard index outside the shard count is rejected."""
+        with pytest.raises(ValueError):
+            IngestionScheduler(shard_index=2, shard_count=2)
@@ -0,0 +1,130 @@
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+from data_ingestion.schedulers.leases import LeaseManager
+from data_ingestion.schedulers.ingestion_scheduler import IngestionScheduler
+
+
+def make_customer(customer_id=None):
+    return {
+        'id': customer_id or uuid4(),
+        'customer_code': 'TEST',
+        'data_sharing_method': 'api',
+        'data_frequency_seconds': 60
+    }
+
+
+@pytest.fixture
+def repository():
+    with patch('data_ingestion.schedulers.leases.IngestionLeaseRepository') as repository:
+        repository.heartbeat = AsyncMock(return_value={'replicas': 2, 'customers': 10})
+        repository.renew = AsyncMock(return_value=[])
+        repository.claim = AsyncMock(return_value=[])
+        repository.release = AsyncMock()
+        repository.prune_replicas = AsyncMock()
+        yield repository
+
+
+class TestLeaseManager:
+
+    @pytest.mark.asyncio
+    async def test_claims_up_to_fair_share(self, repository):
+        """Test a replica below its share claims the difference."""
+        held = [uuid4() for _ in range(2)]
+        claimed = [uuid4() for _ in range(3)]
+        repository.renew.return_value = held
+        repository.claim.return_value = claimed
+        leases = LeaseManager(replica_id='a', lease_ttl=30)
+
+        owned = await leases.rebalance()
+
+        repository.claim.assert_awaited_once_with('a', 30, 3)
+        repository.release.assert_not_awaited()
+        assert owned == set(held + claimed)
+        assert leases.fair_share == 5
+        assert leases.is_valid()
+
+    @pytest.mark.asyncio
+    async def test_releases_excess_when_peers_join(self, repository):
+        """Test a replica above its share hands the excess back."""
+        held = [uuid4() for _ in range(10)]
+        repository.renew.return_value = held
+        leases = LeaseManager(replica_id='a', lease_ttl=30)
+
+        owned = await leases.rebalance()
+
+        repository.release.assert_awaited_once_with('a', held[5:])
+        repository.claim.assert_not_awaited()
+        assert owned == set(held[:5])
+
+    @pytest.mark.asyncio
+    async def test_leases_lapse_without_renewal(self, repository):
+        """Test leases are only trusted for the TTL after the last renewal."""
+        leases = LeaseManager(replica_id='a', lease_ttl=30)
+        assert not leases.is_valid()
+
+        await leases.rebalance()
+        leases.valid_until = time.monotonic() - 1
+
+        assert not leases.is_valid()
+
+    def test_replica_ids_are_unique_per_process(self):
+        """Test the default replica ID includes the process ID."""
+        assert LeaseManager().replica_id.endswith(f"-{__import__('os').getpid()}")
+
+
+class TestSchedulerLeases:
+
+    @pytest.fixture
+    def leases(self):
+        leases = MagicMock(spec=LeaseManager)
+        leases.owned = set()
+        leases.renew_interval = 0.01
+        return leases
+
+    @pytest.mark.asyncio
+    async def test_polls_exactly_the_leased_customers(self, leases):
+        """Test newly leased customers are scheduled and lost ones dropped."""
+        customers = [make_customer() for _ in range(4)]
+        scheduler = IngestionScheduler(leases=leases, jitter_ratio=0)
+
+        with patch('data_ingestion.schedulers.ingestion_scheduler.CustomerRepository.get_all_active',
+                   new=AsyncMock(return_value=customers)):
+            leases.rebalance = AsyncMock(return_value={customers[0]['id'], customers[1]['id']})
+            await scheduler.sync_leases()
+            assert set(scheduler.customers) == {customers[0]['id'], customers[1]['id']}
+
+            leases.rebalance = AsyncMock(return_value={customers[1]['id'], customers[2]['id']})
+            await scheduler.sync_leases()
+            assert set(scheduler.customers) == {customers[1]['id'], customers[2]['id']}
+
+    @pytest.mark.asyncio
+    async def test_expired_leases_pause_polling(self, leases):
+        """Test customers stop being polled when leases cannot be renewed in time."""
+        scheduler = IngestionScheduler(leases=leases, jitter_ratio=0)
+        scheduler.is_running = True
+        await scheduler.schedule_customer(make_customer())
+        leases.is_valid.return_value = False
+
+        async def fail():
+            scheduler.is_running = False
+            raise ConnectionError("database unavailable")
+
+        scheduler.sync_leases = fail
+        await scheduler._renew_leases()
+
+        assert scheduler.customers == {}
+
+    @pytest.mark.asyncio
+    async def test_stop_releases_leases(self, leases):
+        """Test a stopping scheduler gives its customers back."""
+        scheduler = IngestionScheduler(leases=leases)
+        scheduler.is_running = True
+        scheduler.api_collector.close = AsyncMock()
+        scheduler.csv_collector.close = AsyncMock()
+
+        await scheduler.stop()
+
+        leases.release_all.assert_awaited_once()
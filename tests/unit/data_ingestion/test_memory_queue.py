@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from datetime import datetime
+from uuid import uuid4
+
+from data_ingestion.queue.base import topic_matches
+from data_ingestion.queue.memory_queue import InProcessQueue
+from data_ingestion.consumer.db_consumer import DatabaseConsumer
+
+
+async def settle():
+    """Let the consumer worker run"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestInProcessQueue:
+
+    def test_topic_matching(self):
+        """Test binding keys follow AMQP topic rules."""
+        assert topic_matches("temperature.#", "temperature.c1.f1")
+        assert topic_matches("temperature.#", "temperature")
+        assert topic_matches("temperature.*.f1", "temperature.c1.f1")
+        assert not topic_matches("temperature.*", "temperature.c1.f1")
+        assert not topic_matches("alerts.#", "temperature.c1")
+
+    @pytest.mark.asyncio
+    async def test_events_are_handed_over_without_copying(self):
+        """Test the consumer receives the very object that was published."""
+        queue = InProcessQueue()
+        received = []
+        await queue.consume(AsyncMock(side_effect=received.append), queue_name="q")
+        event = {'event_type': 'temperature_reading', 'data': {}}
+
+        await queue.publish(event, routing_key="temperature.c1.f1")
+        await queue.publish({'event_type': 'other'}, routing_key="alerts.c1")
+        await settle()
+        await queue.close()
+
+        assert received == [event]
+        assert received[0] is event
+
+    @pytest.mark.asyncio
+    async def test_prefetch_limits_unacked_deliveries(self):
+        """Test manual-ack consumers get no more than prefetch_count unacked events."""
+        queue = InProcessQueue()
+        deliveries = []
+
+        async def callback(event, delivery):
+            deliveries.append(delivery)
+
+        await queue.consume(callback, queue_name="q", manual_ack=True, prefetch_count=2)
+        for i in range(5):
+            await queue.publish({'n': i})
+        await settle()
+        assert len(deliveries) == 2
+
+        await deliveries[-1].ack(multiple=True)
+        await settle()
+        await queue.close()
+
+        assert len(deliveries) == 4
+        assert [d.event['n'] for d in deliveries] == [0, 1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_failures_retry_then_dead_letter(self):
+        """Test a failing event is retried with backoff and then dead-lettered."""
+        queue = InProcessQueue(max_retries=2, retry_base_delay=0.01)
+        callback = AsyncMock(side_effect=Exception("boom"))
+        await queue.consume(callback, queue_name="q")
+
+        await queue.publish({'n': 1})
+        await asyncio.sleep(0.1)
+        await queue.close()
+
+        assert callback.await_count == 3
+        dead = queue.dead_letters["q"][0]
+        assert dead['event'] == {'n': 1, 'timestamp': dead['event']['timestamp']}
+        assert dead['retry_count'] == 2
+
+    @pytest.mark.asyncio
+    @patch('data_ingestion.consumer.db_consumer.IngestionWatermarkRepository')
+    @patch('data_ingestion.consumer.db_consumer.TemperatureReadingRepository')
+    async def test_pipeline_runs_without_a_broker(self, mock_repo, mock_watermarks):
+        """Test envelopes flow from a publisher to committed batches in one process."""
+        mock_repo.create_batch = AsyncMock(side_effect=lambda batch: len(batch))
+        mock_watermarks.advance = AsyncMock()
+        queue = InProcessQueue()
+        consumer = DatabaseConsumer(batch_size=3, use_spool=False, queue=queue)
+        consumer.periodic_flush = AsyncMock()
+        await consumer.start()
+
+        customer_id, facility_id = str(uuid4()), str(uuid4())
+        await queue.publish({
+            'event_type': 'temperature_reading_batch',
+            'customer_id': customer_id,
+            'facility_id': facility_id,
+            'readings': [
+                {'unit_id': str(uuid4()), 'data': {'timestamp': datetime.now().isoformat(), 'temperature': -18.0}}
+                for _ in range(3)
+            ]
+        }, routing_key=f"temperature.{customer_id}.{facility_id}")
+        await settle()
+        await consumer.wait_for_flushes()
+        await consumer.stop()
+
+        assert mock_repo.create_batch.await_count == 1
+        assert len(mock_repo.create_batch.await_args[0][0]) == 3
+        assert queue.consumers == {}
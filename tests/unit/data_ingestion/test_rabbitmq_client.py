@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from data_ingestion.queue.rabbitmq_client import (
+    RabbitMQClient, RETRY_COUNT_HEADER, ORIGINAL_ROUTING_KEY_HEADER
+)
+
+
+class TestRetryAndDeadLetter:
+
+    @pytest.fixture
+    def client(self):
+        """Client with a mocked channel and declared failure topology."""
+        client = RabbitMQClient(max_retries=3, retry_base_delay=5)
+        client.connection = MagicMock(is_closed=False)
+        client.channel = MagicMock()
+        client.channel.default_exchange.publish = AsyncMock()
+        client.dead_letter_exchange = MagicMock()
+        client.dead_letter_exchange.publish = AsyncMock()
+        client._failure_topology.add("readings")
+        return client
+
+    def make_message(self, retry_count=None):
+        """Mock incoming AMQP message."""
+        message = MagicMock()
+        message.body = b'{"event_type": "temperature_reading"}'
+        message.content_type = "application/json"
+        message.message_id = "m1"
+        message.routing_key = "temperature.c1.f1"
+        message.headers = {RETRY_COUNT_HEADER: retry_count} if retry_count is not None else {}
+        message.ack = AsyncMock()
+        return message
+
+    def test_retry_delays_back_off_exponentially(self, client):
+        """Test each attempt waits twice as long as the previous one."""
+        assert [client.retry_delay(n) for n in (1, 2, 3)] == [5, 10, 20]
+
+    @pytest.mark.asyncio
+    async def test_failure_goes_to_next_retry_queue(self, client):
+        """Test a failed message is parked in the retry queue of its next attempt."""
+        message = self.make_message(retry_count=1)
+
+        await client.retry_or_dead_letter(message, "readings", Exception("db down"))
+
+        published, = client.channel.default_exchange.publish.await_args[0]
+        assert client.channel.default_exchange.publish.await_args.kwargs['routing_key'] == "readings.retry.2"
+        assert published.headers[RETRY_COUNT_HEADER] == 2
+        assert published.headers[ORIGINAL_ROUTING_KEY_HEADER] == "temperature.c1.f1"
+        assert published.body == message.body
+        message.ack.assert_awaited_once()
+        client.dead_letter_exchange.publish.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_exhausted_message_is_dead_lettered(self, client):
+        """Test a message past max_retries goes to the dead-letter exchange."""
+        message = self.make_message(retry_count=3)
+
+        await client.retry_or_dead_letter(message, "readings", Exception("db down"))
+
+        client.channel.default_exchange.publish.assert_not_called()
+        assert client.dead_letter_exchange.publish.await_args.kwargs['routing_key'] == "readings"
+        message.ack.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_publish_leaves_message_unacked(self, client):
+        """Test a message is only acked once its copy was published."""
+        client.channel.default_exchange.publish = AsyncMock(side_effect=Exception("channel closed"))
+        message = self.make_message()
+
+        await client.retry_or_dead_letter(message, "readings", Exception("db down"))
+
+        message.ack.assert_not_called()
+
+    def test_describe_dead_letter_decodes_payload(self, client):
+        """Test inspection shows the decoded event and failure headers."""
+        message = self.make_message(retry_count=3)
+        message.headers[ORIGINAL_ROUTING_KEY_HEADER] = b"temperature.c1.f1"
+
+        summary = client.describe_dead_letter(message)
+
+        assert summary['payload'] == {'event_type': 'temperature_reading'}
+        assert summary['retry_count'] == 3
+        assert summary['routing_key'] == "temperature.c1.f1"
@@ -0,0 +1,45 @@
+import pytest
+from uuid import uuid4
+
+from data_ingestion.schedulers.sharding import ConsistentHashRing
+
+
+class TestConsistentHashRing:
+
+    @pytest.fixture
+    def keys(self):
+        return [uuid4() for _ in range(5000)]
+
+    def test_single_shard_owns_everything(self, keys):
+        """Test one shard owns every key."""
+        ring = ConsistentHashRing(1)
+
+        assert ring.distribution(keys) == {0: len(keys)}
+
+    def test_assignment_is_stable(self, keys):
+        """Test separately built rings agree on every key."""
+        first, second = ConsistentHashRing(4), ConsistentHashRing(4)
+
+        assert all(first.shard_for(k) == second.shard_for(k) for k in keys)
+        assert first.shard_for(keys[0]) == first.shard_for(str(keys[0]))
+
+    def test_keys_are_balanced(self, keys):
+        """Test every shard gets a fair share of the keys."""
+        counts = ConsistentHashRing(4).distribution(keys)
+
+        for count in counts.values():
+            assert len(keys) / 4 * 0.7 < count < len(keys) / 4 * 1.3
+
+    def test_adding_a_shard_moves_few_keys(self, keys):
+        """Test growing the ring only moves keys onto the new shard."""
+        before, after = ConsistentHashRing(4), ConsistentHashRing(5)
+
+        moved = [k for k in keys if before.shard_for(k) != after.shard_for(k)]
+
+        assert all(after.shard_for(k) == 4 for k in moved)
+        assert len(moved) < len(keys) * 0.3
+
+    def test_invalid_shard_count(self):
+        """Test a ring needs at least one shard."""
+        with pytest.raises(ValueError):
+            ConsistentHashRing(0)
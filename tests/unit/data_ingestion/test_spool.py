@@ -0,0 +1,115 @@
+import os
+import json
+import pytest
+from datetime import datetime, timezone
+
+from data_ingestion.consumer.spool import WriteAheadSpool, SpoolFullError
+
+
+class TestWriteAheadSpool:
+
+    @pytest.fixture
+    def reading(self):
+        return {
+            'customer_id': 'c1',
+            'storage_unit_id': 'u1',
+            'temperature': -18.5,
+            'recorded_at': datetime(2025, 6, 18, 11, 0, tzinfo=timezone.utc),
+            'sensor_id': 's1',
+        }
+
+    def segments(self, directory):
+        return sorted(name for name in os.listdir(directory) if name.startswith("segment-"))
+
+    def test_batches_drain_in_order(self, tmp_path, reading):
+        """Test batches come back in append order with their datetimes restored."""
+        spool = WriteAheadSpool(str(tmp_path))
+        spool.append([reading])
+        spool.append([dict(reading, temperature=-19.0), reading])
+
+        position, batch = spool.peek()
+        assert batch == [reading]
+        spool.commit(position)
+
+        position, batch = spool.peek()
+        assert [r['temperature'] for r in batch] == [-19.0, -18.5]
+        spool.commit(position)
+
+        assert spool.peek() is None
+        assert spool.get_stats()['bytes'] == 0
+
+    def test_tuple_records_round_trip(self, tmp_path):
+        """Test insert records come back as tuples with their datetimes restored."""
+        recorded_at = datetime(2025, 6, 18, 11, 0, tzinfo=timezone.utc)
+        record = ('c1', 'f1', 'u1', -18.5, 'C', recorded_at, 's1', 1, 'normal', recorded_at)
+        spool = WriteAheadSpool(str(tmp_path))
+        spool.append([record])
+
+        _, batch = spool.peek()
+
+        assert batch == [record]
+
+    def test_survives_restart(self, tmp_path, reading):
+        """Test undrained batches are recovered after a reopen."""
+        spool = WriteAheadSpool(str(tmp_path))
+        for temperature in (-1.0, -2.0, -3.0):
+            spool.append([dict(reading, temperature=temperature)])
+        spool.commit(spool.peek()[0])
+        spool.close()
+
+        reopened = WriteAheadSpool(str(tmp_path))
+
+        assert len(reopened) == 2
+        assert reopened.peek()[1][0]['temperature'] == -2.0
+        assert reopened.get_stats()['readings'] == 2
+
+    def test_torn_tail_is_truncated(self, tmp_path, reading):
+        """Test a half-written record from a crash is dropped on open."""
+        spool = WriteAheadSpool(str(tmp_path))
+        spool.append([reading])
+        spool.close()
+        path = os.path.join(str(tmp_path), self.segments(str(tmp_path))[-1])
+        with open(path, 'ab') as f:
+            f.write(b'\x10\x00\x00\x00partial')
+
+        reopened = WriteAheadSpool(str(tmp_path))
+
+        assert len(reopened) == 1
+        reopened.append([reading])
+        reopened.commit(reopened.peek()[0])
+        assert reopened.peek()[1] == [reading]
+
+    def test_drained_segments_are_deleted(self, tmp_path, reading):
+        """Test segments are rolled by size and removed once drained."""
+        spool = WriteAheadSpool(str(tmp_path), segment_bytes=200)
+        for _ in range(4):
+            spool.append([reading])
+        assert len(self.segments(str(tmp_path))) > 1
+
+        while len(spool):
+            spool.commit(spool.peek()[0])
+
+        assert self.segments(str(tmp_path)) == []
+        spool.append([reading])
+        assert len(WriteAheadSpool(str(tmp_path))) == 1
+
+    def test_size_limit(self, tmp_path, reading):
+        """Test appends beyond max_bytes are refused."""
+        spool = WriteAheadSpool(str(tmp_path), max_bytes=200)
+        spool.append([reading])
+
+        with pytest.raises(SpoolFullError):
+            spool.append([reading] * 10)
+
+    def test_quarantine(self, tmp_path, reading):
+        """Test quarantined batches are kept apart from the segments with their error."""
+        spool = WriteAheadSpool(str(tmp_path))
+
+        path = spool.quarantine([reading], "value too long")
+
+        with open(path) as f:
+            stored = json.load(f)
+        assert stored['error'] == "value too long"
+        assert stored['readings'][0]['recorded_at'] == reading['recorded_at'].isoformat()
+        assert spool.get_stats()['quarantined_batches'] == 1
+        assert len(WriteAheadSpool(str(tmp_path))) == 0
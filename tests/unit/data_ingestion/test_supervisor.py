@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import asyncio
+import pytest
+
+from data_ingestion.supervisor import IngestionSupervisor
+
+
+def report_and_wait(shard_index, shard_count, status_queue):
+    """Worker stand-in that reports once and idles until terminated"""
+    status_queue.put({
+        'shard_index': shard_index,
+        'pid': os.getpid(),
+        'reported_at': time.time(),
+        'scheduler': {'scheduled_customers': 10 + shard_index, 'in_flight': 1, 'open_circuits': 0},
+        'consumer': {'pending_readings': 5, 'spool': {'readings': 2}},
+    })
+    time.sleep(60)
+
+
+def exit_immediately(shard_index, shard_count, status_queue):
+    """Worker stand-in that crashes on start"""
+    raise SystemExit(3)
+
+
+async def wait_until(condition, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.05)
+
+
+class TestIngestionSupervisor:
+
+    @pytest.mark.asyncio
+    async def test_reports_are_aggregated(self, tmp_path):
+        """Test live workers are healthy and their load is summed in the status file."""
+        status_file = tmp_path / "status.json"
+        supervisor = IngestionSupervisor(workers=2, status_file=str(status_file), target=report_and_wait,
+                                         stop_timeout=5)
+        await supervisor.start()
+        try:
+            await wait_until(lambda: supervisor.collect_reports()
+                             or all(s.last_report for s in supervisor.states.values()))
+            supervisor.write_status()
+            status = json.loads(status_file.read_text())
+        finally:
+            await supervisor.stop()
+
+        assert status['totals'] == {
+            'healthy_workers': 2,
+            'scheduled_customers': 21,
+            'in_flight': 2,
+            'open_circuits': 0,
+            'pending_readings': 10,
+            'spooled_readings': 4,
+        }
+        assert {w['pid'] for w in status['workers'].values()} == {s.process.pid for s in supervisor.states.values()}
+
+    @pytest.mark.asyncio
+    async def test_stopped_workers_are_unhealthy(self):
+        """Test workers are stopped with the supervisor and no longer counted."""
+        supervisor = IngestionSupervisor(workers=1, status_file=None, target=report_and_wait, stop_timeout=5)
+        await supervisor.start()
+        await supervisor.stop()
+
+        status = supervisor.get_status()
+        assert not status['workers'][0]['alive']
+        assert status['totals']['healthy_workers'] == 0
+        assert status['totals']['scheduled_customers'] == 0
+
+    @pytest.mark.asyncio
+    async def test_dead_worker_is_restarted(self):
+        """Test a worker that exits is restarted after a backoff."""
+        supervisor = IngestionSupervisor(workers=1, status_file=None, target=exit_immediately,
+                                         restart_backoff=0.01, stop_timeout=5)
+        await supervisor.start()
+        state = supervisor.states[0]
+        try:
+            await wait_until(lambda: supervisor.check_workers() or state.restarts >= 2)
+        finally:
+            await supervisor.stop()
+
+        assert state.consecutive_failures >= 2
+        assert not supervisor.get_status()['workers'][0]['healthy']
@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from data_ingestion.collectors.circuit_breaker import CircuitOpenError
+from data_ingestion.collectors.transport import CollectorTransport
+
+
+@asynccontextmanager
+async def serve():
+    """Local endpoint returning a fixed body, with slow and streamed variants"""
+    async def readings(request):
+        return web.Response(body=b'x' * 1000)
+
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.Response(body=b'late')
+
+    async def streamed(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(3):
+            await response.write(b'x' * 100)
+            await asyncio.sleep(0.2)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get('/readings', readings)
+    app.router.add_get('/slow', slow)
+    app.router.add_get('/streamed', streamed)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        yield server
+    finally:
+        await server.close()
+
+
+class TestCollectorTransport:
+
+    @pytest.mark.asyncio
+    async def test_connector_is_tuned(self):
+        """Test the shared session uses the configured limits and timeouts."""
+        transport = CollectorTransport(limit=50, limit_per_host=4, connect_timeout=2, read_timeout=10)
+        await transport.initialize()
+        try:
+            assert transport.session.connector.limit == 50
+            assert transport.session.connector.limit_per_host == 4
+            assert transport.session.timeout.total is None
+            assert transport.session.timeout.sock_connect == 2
+            assert transport.session.timeout.sock_read == 10
+        finally:
+            await transport.close()
+
+    @pytest.mark.asyncio
+    async def test_fetch_metrics_per_customer(self):
+        """Test latency and bytes are recorded under the customer."""
+        transport = CollectorTransport()
+        async with serve() as server:
+            for _ in range(2):
+                async with transport.get('c1', str(server.make_url('/readings'))) as response:
+                    await response.read()
+            await transport.close()
+
+        stats = transport.get_stats('c1')
+        assert stats['fetches'] == 2
+        assert stats['errors'] == 0
+        assert stats['bytes'] == 2000
+        assert stats['last_status'] == 200
+        assert transport.get_stats('c2')['fetches'] == 0
+
+    @pytest.mark.asyncio
+    async def test_read_timeout_counts_as_error(self):
+        """Test a stalled response times out and is recorded as an error."""
+        transport = CollectorTransport(read_timeout=0.1)
+        async with serve() as server:
+            with pytest.raises(asyncio.TimeoutError):
+                async with transport.get('c1', str(server.make_url('/slow'))) as response:
+                    await response.read()
+            await transport.close()
+
+        assert transport.get_stats('c1')['errors'] == 1
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_refuses_fetch(self):
+        """Test a customer whose circuit is open is not fetched."""
+        transport = CollectorTransport()
+        breaker = transport.breaker('c1')
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        async with serve() as server:
+            with pytest.raises(CircuitOpenError):
+                async with transport.get('c1', str(server.make_url('/readings'))):
+                    pass
+            await transport.close()
+
+        assert transport.get_stats('c1')['fetches'] == 0
+        assert transport.get_stats('c1')['circuit']['state'] == 'open'
+
+    @pytest.mark.asyncio
+    async def test_caller_errors_leave_the_circuit_alone(self):
+        """Test exceptions raised while processing a response are not endpoint failures."""
+        transport = CollectorTransport()
+        breaker = transport.breaker('c1')
+
+        async with serve() as server:
+            for _ in range(breaker.failure_threshold + 1):
+                with pytest.raises(RuntimeError):
+                    async with transport.get('c1', str(server.make_url('/readings'))) as response:
+                        await response.read()
+                        raise RuntimeError("queue unavailable")
+            await transport.close()
+
+        assert breaker.state == 'closed'
+        assert breaker.consecutive_failures == 0
+        assert transport.get_stats('c1')['errors'] == 0
+
+    @pytest.mark.asyncio
+    async def test_caller_error_releases_a_probe(self):
+        """Test a half-open probe whose caller fails can be retried at once."""
+        transport = CollectorTransport()
+        breaker = transport.breaker('c1')
+        breaker.base_backoff = breaker.backoff = 0
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        async with serve() as server:
+            with pytest.raises(RuntimeError):
+                async with transport.get('c1', str(server.make_url('/readings'))):
+                    raise RuntimeError("publish failed")
+            await transport.close()
+
+        assert breaker.available()
+
+    @pytest.mark.asyncio
+    async def test_deadline_stops_at_the_headers(self):
+        """Test the p99 deadline does not cut off a body that keeps streaming."""
+        transport = CollectorTransport()
+        breaker = transport.breaker('c1')
+        breaker.min_timeout = 0.1
+        for _ in range(breaker.min_samples):
+            breaker.record_success(0.01)
+
+        async with serve() as server:
+            async with transport.get('c1', str(server.make_url('/streamed'))) as response:
+                body = await response.read()
+            await transport.close()
+
+        assert breaker.timeout() < 0.6
+        assert len(body) == 300
+        assert transport.get_stats('c1')['last_seconds'] < 0.5
@@ -0,0 +1,92 @@
+import json
+import pytest
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from data_ingestion.queue.rabbitmq_client import CustomJSONEncoder
+from data_ingestion.queue.wire_format import (
+    CONTENT_TYPE_COMPACT, CONTENT_TYPE_JSON, WireFormatError,
+    decode_body, decode_envelope, encode_envelope
+)
+
+
+class TestWireFormat:
+
+    @pytest.fixture
+    def envelope(self):
+        """Envelope with two units and repeated strings."""
+        units = [str(uuid4()), str(uuid4())]
+        return {
+            'event_type': 'temperature_reading_batch',
+            'customer_id': str(uuid4()),
+            'facility_id': str(uuid4()),
+            'readings': [
+                {
+                    'unit_id': units[i % 2],
+                    'data': {
+                        'timestamp': f"2025-06-18T11:{i:02d}:00Z",
+                        'temperature': -18.5 + i,
+                        'quality_score': '1',
+                        'sensor_id': f"sensor_{i % 2}",
+                        'equipment_status': 'normal',
+                        'temperature_unit': 'C'
+                    }
+                }
+                for i in range(50)
+            ]
+        }
+
+    def test_round_trip(self, envelope):
+        """Test encoding then decoding keeps every reading."""
+        decoded = decode_envelope(encode_envelope(envelope))
+
+        assert decoded['customer_id'] == envelope['customer_id']
+        assert decoded['facility_id'] == envelope['facility_id']
+        assert len(decoded['readings']) == 50
+        first = decoded['readings'][1]
+        assert first['unit_id'] == envelope['readings'][1]['unit_id']
+        assert first['data']['recorded_at'] == datetime(2025, 6, 18, 11, 1, tzinfo=timezone.utc)
+        assert first['data']['temperature'] == pytest.approx(-17.5)
+        assert first['data']['sensor_id'] == 'sensor_1'
+
+    def test_compact_is_smaller_than_json(self, envelope):
+        """Test the compact body is a fraction of the JSON body."""
+        compact = encode_envelope(envelope)
+        as_json = json.dumps(envelope, cls=CustomJSONEncoder).encode()
+
+        assert len(compact) * 4 < len(as_json)
+
+    def test_decode_body_dispatches_on_content_type(self, envelope):
+        """Test JSON and compact bodies are both accepted."""
+        as_json = json.dumps({'event_type': 'temperature_reading'}).encode()
+
+        assert decode_body(as_json, CONTENT_TYPE_JSON)['event_type'] == 'temperature_reading'
+        assert decode_body(as_json, None)['event_type'] == 'temperature_reading'
+        assert len(decode_body(encode_envelope(envelope), CONTENT_TYPE_COMPACT)['readings']) == 50
+
+    def test_truncated_body_is_rejected(self, envelope):
+        """Test a truncated body raises WireFormatError."""
+        with pytest.raises(WireFormatError):
+            decode_envelope(encode_envelope(envelope)[:-30])
+
+    def test_missing_timestamps_stay_missing(self, envelope):
+        """Test missing and invalid timestamps decode as None rather than the publish time."""
+        envelope['readings'][0]['data']['timestamp'] = None
+        envelope['readings'][1]['data']['timestamp'] = 'yesterday'
+
+        readings = decode_envelope(encode_envelope(envelope))['readings']
+
+        assert readings[0]['data']['recorded_at'] is None
+        assert readings[1]['data']['recorded_at'] is None
+        assert readings[2]['data']['recorded_at'] == datetime(2025, 6, 18, 11, 2, tzinfo=timezone.utc)
+
+    def test_version_1_bodies_are_accepted(self, envelope):
+        """Test bodies published before the missing-timestamp marker still decode."""
+        body = bytearray(encode_envelope(envelope))
+        body[0] = 1
+
+        assert len(decode_envelope(bytes(body))['readings']) == 50
+
+        body[0] = 9
+        with pytest.raises(WireFormatError):
+            decode_envelope(bytes(body))
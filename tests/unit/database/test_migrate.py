@@ -0,0 +1,132 @@
+import re
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database.migrate import MigrationRunner
+
+
+class TestMigrationRunner:
+
+    @pytest.fixture
+    def migrations_dir(self, tmp_path):
+        (tmp_path / "002_second.sql").write_text("SELECT 2;")
+        (tmp_path / "010_tenth.sql").write_text("SELECT 10;")
+        (tmp_path / "001_first.sql").write_text("SELECT 1;")
+        (tmp_path / "adhoc_cleanup.sql").write_text("SELECT 0;")
+        return tmp_path
+
+    @pytest.fixture
+    def mock_conn(self):
+        """Mock pooled connection with an empty migrations table."""
+        conn = MagicMock()
+        conn.transaction.return_value.__aenter__ = AsyncMock()
+        conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        conn.execute = AsyncMock()
+        conn.fetch = AsyncMock(return_value=[])
+        conn.fetchval = AsyncMock(return_value=False)
+        conn.is_in_transaction = MagicMock(return_value=False)
+        return conn
+
+    @pytest.fixture
+    def mock_db(self, mock_conn):
+        with patch('database.migrate.db') as mock_db:
+            acquire = MagicMock()
+            acquire.__aenter__ = AsyncMock(return_value=mock_conn)
+            acquire.__aexit__ = AsyncMock(return_value=False)
+            mock_db.transaction = AsyncMock(return_value=acquire)
+            yield mock_db
+
+    def executed(self, mock_conn):
+        return [c.args[0] for c in mock_conn.execute.await_args_list]
+
+    def test_discover_orders_numbered_files(self, migrations_dir):
+        """Test only numbered files are migrations and they sort numerically."""
+        migrations = MigrationRunner(directory=str(migrations_dir)).discover()
+
+        assert [m.version for m in migrations] == ['001', '002', '010']
+        assert migrations[0].name == 'first'
+
+    def test_discover_rejects_duplicate_versions(self, migrations_dir):
+        """Test two files with the same version are refused."""
+        (migrations_dir / "002_again.sql").write_text("SELECT 2;")
+
+        with pytest.raises(ValueError, match="002"):
+            MigrationRunner(directory=str(migrations_dir)).discover()
+
+    @pytest.fixture
+    def baselined_conn(self, mock_conn):
+        """Connection whose migrations table already records version 001."""
+        mock_conn.fetch.return_value = [{'version': '001', 'name': 'first', 'checksum': 'x', 'applied_at': None}]
+        return mock_conn
+
+    @pytest.mark.asyncio
+    async def test_migrate_applies_pending_up_to_target(self, migrations_dir, mock_db, baselined_conn):
+        """Test pending files run in order up to the target and are recorded."""
+        (migrations_dir / "003_third.sql").write_text("SELECT 3;")
+
+        applied = await MigrationRunner(directory=str(migrations_dir)).migrate(target='3')
+
+        assert applied == ['002', '003']
+        statements = self.executed(baselined_conn)
+        assert "SELECT 1;" not in statements
+        assert statements.index("SELECT 2;") < statements.index("SELECT 3;")
+        assert "SELECT 10;" not in statements
+        assert "pg_advisory_unlock" in statements[-1]
+
+    @pytest.mark.asyncio
+    async def test_migration_and_record_share_a_transaction(self, migrations_dir, mock_db, baselined_conn):
+        """Test a file's own BEGIN/COMMIT give way to the runner's transaction."""
+        (migrations_dir / "002_second.sql").write_text(
+            "BEGIN;\nCREATE TABLE t (id INT);\nDO $$ BEGIN PERFORM 1; END $$;\nCOMMIT;\nANALYZE t;\n"
+        )
+        order = []
+        baselined_conn.transaction.return_value.__aenter__.side_effect = lambda *a: order.append('begin')
+        baselined_conn.transaction.return_value.__aexit__.side_effect = lambda *a: order.append('commit')
+        baselined_conn.execute.side_effect = lambda sql, *a: order.append(sql.strip().split()[0])
+
+        await MigrationRunner(directory=str(migrations_dir)).migrate(target='2')
+
+        body = next(sql for sql in self.executed(baselined_conn) if "CREATE TABLE t" in sql)
+        assert "BEGIN;" not in body and "COMMIT;" not in body
+        assert "DO $$ BEGIN PERFORM 1; END $$;" in body
+        assert order[order.index('begin') + 1:order.index('commit')] == ['CREATE', 'INSERT']
+
+    @pytest.mark.asyncio
+    async def test_migrate_refuses_empty_database(self, migrations_dir, mock_db, mock_conn):
+        """Test an empty database is sent to schema.sql instead of the stub migrations."""
+        with pytest.raises(RuntimeError, match="schema.sql"):
+            await MigrationRunner(directory=str(migrations_dir)).migrate()
+
+        assert "SELECT 1;" not in self.executed(mock_conn)
+
+    @pytest.mark.asyncio
+    async def test_migrate_refuses_unbaselined_schema(self, migrations_dir, mock_db, mock_conn):
+        """Test an existing schema without recorded versions must be baselined first."""
+        mock_conn.fetchval.return_value = True
+
+        with pytest.raises(RuntimeError, match="baseline"):
+            await MigrationRunner(directory=str(migrations_dir)).migrate()
+
+        assert "SELECT 1;" not in self.executed(mock_conn)
+        assert "pg_advisory_unlock" in self.executed(mock_conn)[-1]
+
+    @pytest.mark.asyncio
+    async def test_baseline_records_without_running(self, migrations_dir, mock_db, mock_conn):
+        """Test a baseline records versions but runs none of the files."""
+        mock_conn.fetch.return_value = [{'version': '001', 'name': 'first', 'checksum': 'x', 'applied_at': None}]
+
+        recorded = await MigrationRunner(directory=str(migrations_dir)).baseline()
+
+        assert recorded == ['002', '010']
+        assert not any(st.startswith("SELECT ") and st.endswith(";") for st in self.executed(mock_conn))
+
+    def test_schema_triggers_have_migrations(self):
+        """Test every trigger in schema.sql also reaches upgraded databases through a migration."""
+        schema = (Path(MigrationRunner().directory).parent / "schema.sql").read_text()
+        migrations = "".join(m.sql for m in MigrationRunner().discover())
+
+        triggers = re.findall(r"CREATE TRIGGER (\w+)", schema)
+
+        assert triggers
+        assert [t for t in triggers if f"CREATE TRIGGER {t}" not in migrations] == []
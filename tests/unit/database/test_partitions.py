@@ -0,0 +1,170 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timezone
+
+import asyncpg
+
+from database.partitions import PartitionManager, MONTHLY, DAILY
+
+UTC = timezone.utc
+
+
+class TestPartitionManager:
+
+    def test_monthly_periods(self):
+        """Test monthly periods roll over the year and use the existing names."""
+        manager = PartitionManager(interval=MONTHLY, periods_ahead=3)
+
+        periods = manager.periods(datetime(2024, 11, 15, 8, tzinfo=UTC), datetime(2025, 1, 2, tzinfo=UTC))
+
+        assert [manager.partition_name(lower) for lower, _ in periods] == [
+            'temperature_readings_history_2024_11',
+            'temperature_readings_history_2024_12',
+            'temperature_readings_history_2025_01',
+        ]
+        assert periods[1] == (datetime(2024, 12, 1, tzinfo=UTC), datetime(2025, 1, 1, tzinfo=UTC))
+
+    def test_daily_periods(self):
+        """Test daily periods follow UTC days and treat naive times as UTC."""
+        manager = PartitionManager(interval=DAILY)
+
+        periods = manager.periods(datetime(2025, 2, 28, 23, 30), datetime(2025, 3, 1, 0, 30))
+
+        assert [manager.partition_name(lower) for lower, _ in periods] == [
+            'temperature_readings_history_2025_02_28',
+            'temperature_readings_history_2025_03_01',
+        ]
+        assert manager.periods_ahead == 14
+
+    def test_unknown_interval(self):
+        """Test only monthly and daily partitions are supported."""
+        with pytest.raises(ValueError):
+            PartitionManager(interval='week')
+
+    @pytest.fixture
+    def mock_conn(self):
+        """Mock pooled connection whose transactions are no-op context managers."""
+        conn = MagicMock()
+        conn.transaction.return_value.__aenter__ = AsyncMock()
+        conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        conn.execute = AsyncMock()
+
+        async def fetch(query, *args):
+            if 'pg_indexes' in query:
+                return [{'indexname': 'temperature_readings_history_2025_06_recorded_at_idx'}]
+            return [
+                {'name': 'temperature_readings_history_2025_06', 'bound': "FOR VALUES FROM ('2025-06-01') TO ('2025-07-01')"}
+            ]
+
+        conn.fetch = AsyncMock(side_effect=fetch)
+        return conn
+
+    @pytest.fixture
+    def mock_db(self, mock_conn):
+        with patch('database.partitions.db') as mock_db:
+            acquire = MagicMock()
+            acquire.__aenter__ = AsyncMock(return_value=mock_conn)
+            acquire.__aexit__ = AsyncMock(return_value=False)
+            mock_db.transaction = AsyncMock(return_value=acquire)
+            yield mock_db
+
+    def created_tables(self, mock_conn):
+        return [c.args[0] for c in mock_conn.execute.await_args_list if c.args[0].startswith("CREATE TABLE")]
+
+    @pytest.mark.asyncio
+    async def test_maintain_creates_missing_periods_ahead(self, mock_db, mock_conn):
+        """Test maintenance creates the current and upcoming partitions that do not exist yet."""
+        manager = PartitionManager(interval=MONTHLY, periods_ahead=2)
+
+        created = await manager.maintain(now=datetime(2025, 6, 18, tzinfo=UTC))
+
+        assert created == ['temperature_readings_history_2025_07', 'temperature_readings_history_2025_08']
+        statements = self.created_tables(mock_conn)
+        assert "PARTITION OF public.temperature_readings" in statements[0]
+        assert "FROM ('2025-07-01T00:00:00+00:00') TO ('2025-08-01T00:00:00+00:00')" in statements[0]
+        assert "pg_advisory_xact_lock" in mock_conn.execute.await_args_list[0].args[0]
+
+    @pytest.mark.asyncio
+    async def test_new_partitions_get_a_btree(self, mock_db, mock_conn):
+        """Test each created partition gets its own recorded_at B-tree."""
+        manager = PartitionManager(interval=MONTHLY, periods_ahead=1)
+
+        await manager.ensure_range(datetime(2025, 7, 1, tzinfo=UTC), datetime(2025, 7, 1, tzinfo=UTC))
+
+        statements = [c.args[0] for c in mock_conn.execute.await_args_list]
+        assert ("CREATE INDEX IF NOT EXISTS temperature_readings_history_2025_07_recorded_at_idx "
+                "ON public.temperature_readings_history_2025_07 (recorded_at DESC)") in statements
+
+    @pytest.mark.asyncio
+    async def test_ensure_periods_skips_the_span_between(self, mock_db, mock_conn):
+        """Test only the periods the readings fall in are created, not the months between them."""
+        manager = PartitionManager(interval=MONTHLY)
+
+        created = await manager.ensure_periods([
+            datetime(2025, 7, 9, tzinfo=UTC), datetime(2023, 1, 2, tzinfo=UTC), datetime(2025, 7, 1, tzinfo=UTC)
+        ])
+
+        assert created == ['temperature_readings_history_2023_01', 'temperature_readings_history_2025_07']
+        assert len(self.created_tables(mock_conn)) == 2
+
+    def test_accepts_readings_inside_the_window(self):
+        """Test readings too old or too far ahead are not accepted."""
+        manager = PartitionManager(max_age_days=365, max_future_hours=24)
+        now = datetime(2025, 7, 1, 12, tzinfo=UTC)
+
+        assert manager.accepts(datetime(2025, 1, 1), now)
+        assert manager.accepts(datetime(2025, 7, 2, 6, tzinfo=UTC), now)
+        assert not manager.accepts(datetime(1970, 1, 1, tzinfo=UTC), now)
+        assert not manager.accepts(datetime(2025, 7, 3, tzinfo=UTC), now)
+
+    @pytest.mark.asyncio
+    async def test_old_partitions_move_to_brin(self, mock_db, mock_conn):
+        """Test partitions past `brin_after` periods swap their B-tree for BRIN."""
+        manager = PartitionManager(interval=MONTHLY, brin_after=1)
+
+        changed = await manager.index_partitions(now=datetime(2025, 8, 3, tzinfo=UTC))
+
+        assert changed == {'btree': [], 'brin': ['temperature_readings_history_2025_06']}
+        statements = [c.args[0] for c in mock_conn.execute.await_args_list]
+        assert any("USING brin (recorded_at)" in st for st in statements)
+        assert "DROP INDEX public.temperature_readings_history_2025_06_recorded_at_idx" in statements
+
+    @pytest.mark.asyncio
+    async def test_recent_partitions_keep_their_btree(self, mock_db, mock_conn):
+        """Test the current and previous months keep the B-tree."""
+        manager = PartitionManager(interval=MONTHLY, brin_after=1)
+
+        changed = await manager.index_partitions(now=datetime(2025, 7, 3, tzinfo=UTC))
+
+        assert changed == {'btree': [], 'brin': []}
+
+    def test_partition_end_from_name(self):
+        """Test partition ends are read from monthly and daily names alike."""
+        manager = PartitionManager(interval=DAILY)
+
+        assert manager.partition_end('temperature_readings_history_2024_12') == datetime(2025, 1, 1, tzinfo=UTC)
+        assert manager.partition_end('temperature_readings_history_2025_02_28') == datetime(2025, 3, 1, tzinfo=UTC)
+        assert manager.partition_end('temperature_readings_default') is None
+
+    @pytest.mark.asyncio
+    async def test_overlapping_period_is_skipped(self, mock_db, mock_conn):
+        """Test a period covered by a partition of another granularity is skipped."""
+        async def execute(statement, *args):
+            if 'history_2025_06_02' in statement:
+                raise asyncpg.exceptions.InvalidObjectDefinitionError("would overlap partition")
+
+        mock_conn.execute = AsyncMock(side_effect=execute)
+        manager = PartitionManager(interval=DAILY)
+
+        created = await manager.ensure_range(datetime(2025, 6, 1, tzinfo=UTC), datetime(2025, 6, 3, tzinfo=UTC))
+
+        assert created == ['temperature_readings_history_2025_06_01', 'temperature_readings_history_2025_06_03']
+
+    def test_missing_partition_error(self):
+        """Test only the routing failure counts as a missing partition."""
+        missing = asyncpg.exceptions.CheckViolationError('no partition of relation "temperature_readings" found for row')
+        other = asyncpg.exceptions.CheckViolationError('new row violates check constraint')
+
+        assert PartitionManager.is_missing_partition_error(missing)
+        assert not PartitionManager.is_missing_partition_error(other)
+        assert not PartitionManager.is_missing_partition_error(ValueError("no partition"))
@@ -0,0 +1,132 @@
+import asyncpg
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime
+from uuid import uuid4
+
+from database.repositories.repositories import TemperatureReadingRepository, ReadingRollupRepository
+
+
+class TestTemperatureReadingBatchInsert:
+
+    @pytest.fixture(autouse=True)
+    def rollups_disabled(self):
+        """Rollup maintenance is covered in test_rollups."""
+        with patch.object(ReadingRollupRepository, 'enabled', False):
+            yield
+
+    @pytest.fixture
+    def sample_reading(self):
+        """Sample mapped reading as produced by the data processor."""
+        return {
+            'id': str(uuid4()),
+            'customer_id': str(uuid4()),
+            'facility_id': str(uuid4()),
+            'storage_unit_id': str(uuid4()),
+            'temperature': -20.5,
+            'temperature_unit': 'C',
+            'recorded_at': datetime.now(),
+            'sensor_id': 'sensor_001',
+            'quality_score': 1,
+            'equipment_status': 'normal',
+            'created_at': datetime.now()
+        }
+
+    def test_to_record_follows_column_order(self, sample_reading):
+        """Test tuple records match `record_columns` and skip the serial id."""
+        record = TemperatureReadingRepository.to_record(sample_reading)
+
+        assert len(record) == len(TemperatureReadingRepository.record_columns)
+        assert record[0] == sample_reading['customer_id']
+        assert record[3] == -20.5
+        assert sample_reading['id'] not in record
+
+    @pytest.fixture
+    def mock_conn(self):
+        """Mock asyncpg connection whose transactions are no-op context managers."""
+        conn = MagicMock()
+        conn.transaction.return_value.__aenter__ = AsyncMock()
+        conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        conn.copy_records_to_table = AsyncMock(return_value="COPY 2")
+        conn.execute = AsyncMock()
+        conn.is_closed = MagicMock(return_value=False)
+        # Inserts run as one statement returning the number of rows inserted
+        conn.fetchval = AsyncMock(return_value=2)
+        return conn
+
+    @pytest.mark.asyncio
+    @patch('database.repositories.repositories.db')
+    async def test_create_batch_acquires_transaction(self, mock_db, mock_conn, sample_reading):
+        """Test a pooled connection is used when none is passed in."""
+        acquire = MagicMock()
+        acquire.__aenter__ = AsyncMock(return_value=mock_conn)
+        acquire.__aexit__ = AsyncMock(return_value=False)
+        mock_db.transaction = AsyncMock(return_value=acquire)
+
+        count = await TemperatureReadingRepository.create_batch([sample_reading, sample_reading])
+
+        assert count == 2
+        mock_db.transaction.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_copy_merges_through_staging_table(self, mock_conn, sample_reading):
+        """Test COPY loads the staging table and merges with ON CONFLICT DO NOTHING."""
+        count = await TemperatureReadingRepository.create_batch(
+            [sample_reading, sample_reading], use_copy=True, conn=mock_conn
+        )
+
+        assert count == 2
+        staging = TemperatureReadingRepository.staging_table
+        assert mock_conn.copy_records_to_table.call_args[0][0] == staging
+        assert mock_conn.copy_records_to_table.call_args.kwargs['columns'] == \
+            list(TemperatureReadingRepository.record_columns)
+        merge = mock_conn.fetchval.call_args[0][0]
+        assert "INSERT INTO public.temperature_readings" in merge
+        assert f"FROM {staging}" in merge
+        assert "ON CONFLICT (storage_unit_id, recorded_at, sensor_id) DO NOTHING" in merge
+
+    @pytest.mark.asyncio
+    async def test_create_batch_falls_back_to_values(self, mock_conn, sample_reading):
+        """Test a COPY the server does not support retries the batch through INSERT ... VALUES."""
+        mock_conn.copy_records_to_table = AsyncMock(
+            side_effect=asyncpg.exceptions.FeatureNotSupportedError("COPY is not supported")
+        )
+        mock_conn.fetchval = AsyncMock(return_value=1)
+
+        count = await TemperatureReadingRepository.create_batch([sample_reading], use_copy=True, conn=mock_conn)
+
+        assert count == 1
+        query = mock_conn.fetchval.call_args[0][0]
+        assert "INSERT INTO public.temperature_readings" in query
+        assert "VALUES ($1" in query
+        assert "DO NOTHING" in query
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('error, closed', [
+        (asyncpg.exceptions.CheckViolationError('no partition of relation "temperature_readings" found for row'), False),
+        (asyncpg.exceptions.StringDataRightTruncationError("value too long"), False),
+        (asyncpg.exceptions._base.DataError("invalid input for query argument"), False),
+        (asyncpg.InterfaceError("connection is closed"), True),
+    ])
+    async def test_other_copy_errors_are_raised(self, mock_conn, sample_reading, error, closed):
+        """Test errors that would fail the VALUES insert too are raised without a second attempt."""
+        mock_conn.copy_records_to_table = AsyncMock(side_effect=error)
+        mock_conn.is_closed = MagicMock(return_value=closed)
+
+        with pytest.raises(type(error)):
+            await TemperatureReadingRepository.create_batch([sample_reading], use_copy=True, conn=mock_conn)
+
+        mock_conn.fetchval.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_values_path_stays_under_bind_limit(self, mock_conn, sample_reading):
+        """Test large VALUES batches are split below the bind parameter limit."""
+        mock_conn.fetchval = AsyncMock(side_effect=lambda q, *args: len(args) // 10)
+        record = TemperatureReadingRepository.to_record(sample_reading)
+
+        count = await TemperatureReadingRepository.create_batch([record] * 5000, use_copy=False, conn=mock_conn)
+
+        assert count == 5000
+        assert mock_conn.fetchval.call_count == 2
+        for call in mock_conn.fetchval.call_args_list:
+            assert len(call[0]) - 1 <= TemperatureReadingRepository.max_bind_params
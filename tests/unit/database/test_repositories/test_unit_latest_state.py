@@ -0,0 +1,23 @@
+from database.repositories.repositories import TemperatureReadingRepository, UnitLatestStateRepository
+
+
+class TestUnitLatestStateRepository:
+
+    def test_upsert_keeps_the_newest_reading_per_unit(self):
+        """Test each unit takes its newest inserted reading and late readings are ignored."""
+        query = UnitLatestStateRepository.upsert_sql('inserted')
+
+        assert "SELECT DISTINCT ON (storage_unit_id)" in query
+        assert "ORDER BY storage_unit_id, recorded_at DESC, id DESC" in query
+        assert "ON CONFLICT (storage_unit_id) DO UPDATE" in query
+        assert "WHERE EXCLUDED.recorded_at >= s.recorded_at" in query
+
+    def test_every_insert_updates_the_latest_state(self):
+        """Test the latest state is written by the same statement as the readings."""
+        query = TemperatureReadingRepository.wrap_insert(
+            "INSERT INTO public.temperature_readings (a) VALUES ($1)", select="id, created_at"
+        )
+
+        assert "latest_state AS (" in query
+        assert f"INSERT INTO {UnitLatestStateRepository.table_name}" in query
+        assert query.endswith("SELECT id, created_at FROM inserted")
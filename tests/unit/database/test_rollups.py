@@ -0,0 +1,158 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from database.repositories.repositories import TemperatureReadingRepository, ReadingRollupRepository
+from database.rollups import RollupRepairJob
+
+UTC = timezone.utc
+
+
+class TestReadingRollupRepository:
+
+    def test_levels_for_group_by(self):
+        """Test the coarsest usable rollup comes first and sensors need raw readings."""
+        assert ReadingRollupRepository.levels_for(['day', 'facility']) == ['day', 'hour']
+        assert ReadingRollupRepository.levels_for(['unit']) == ['day', 'hour']
+        assert ReadingRollupRepository.levels_for(['hour']) == ['hour']
+        assert ReadingRollupRepository.levels_for(['day', 'sensor']) == []
+
+        with patch.object(ReadingRollupRepository, 'enabled', False):
+            assert ReadingRollupRepository.levels_for(['day']) == []
+
+    def test_cover_uses_finer_pieces_towards_the_edges(self):
+        """Test a range splits into whole days, whole hours and raw edges."""
+        segments = ReadingRollupRepository.cover(
+            ['day', 'hour'], datetime(2024, 1, 1, 10, 30), datetime(2024, 1, 5, 3, 15)
+        )
+
+        assert segments == [
+            ('day', datetime(2024, 1, 2, tzinfo=UTC), datetime(2024, 1, 5, tzinfo=UTC), False),
+            ('hour', datetime(2024, 1, 1, 11, tzinfo=UTC), datetime(2024, 1, 2, tzinfo=UTC), False),
+            (None, datetime(2024, 1, 1, 10, 30, tzinfo=UTC), datetime(2024, 1, 1, 11, tzinfo=UTC), False),
+            ('hour', datetime(2024, 1, 5, tzinfo=UTC), datetime(2024, 1, 5, 3, tzinfo=UTC), False),
+            (None, datetime(2024, 1, 5, 3, tzinfo=UTC), datetime(2024, 1, 5, 3, 15, tzinfo=UTC), True),
+        ]
+
+    def test_cover_short_range_and_open_bounds(self):
+        """Test ranges shorter than a bucket fall through and open ranges use one rollup."""
+        short = ReadingRollupRepository.cover(
+            ['day', 'hour'], datetime(2024, 1, 1, 10, 30, tzinfo=UTC), datetime(2024, 1, 1, 10, 45, tzinfo=UTC)
+        )
+        assert short == [(None, datetime(2024, 1, 1, 10, 30, tzinfo=UTC), datetime(2024, 1, 1, 10, 45, tzinfo=UTC), True)]
+
+        assert ReadingRollupRepository.cover(['day', 'hour'], None, None) == [('day', None, None, False)]
+
+    def test_partials_sql_appends_bounds(self):
+        """Test the partials query reads each rollup once and numbers its bounds after the filters."""
+        params = ['customer']
+        sql = ReadingRollupRepository.partials_sql(
+            ['day', 'hour'], "customer_id = $1", params,
+            datetime(2024, 1, 1, 10, 30), datetime(2024, 1, 5, 3, 15)
+        )
+
+        assert sql.count("UNION ALL") == 2
+        assert "FROM public.temperature_rollup_daily" in sql
+        assert "FROM public.temperature_rollup_hourly" in sql
+        assert "FROM public.temperature_readings" in sql
+        assert "recorded_at <= $11" in sql
+        assert len(params) == 11
+
+    def test_wrap_insert_updates_both_rollups(self):
+        """Test inserts return their rows to additive upserts of both rollups."""
+        with patch.object(ReadingRollupRepository, 'enabled', True):
+            query = TemperatureReadingRepository.wrap_insert("INSERT INTO public.temperature_readings (a) VALUES ($1)")
+
+        assert query.startswith("WITH inserted AS (INSERT INTO public.temperature_readings (a) VALUES ($1) RETURNING *)")
+        assert "INSERT INTO public.temperature_rollup_hourly" in query
+        assert "INSERT INTO public.temperature_rollup_daily" in query
+        assert "reading_count = r.reading_count + EXCLUDED.reading_count" in query
+        assert "date_trunc('hour', recorded_at, 'UTC')" in query
+        assert query.endswith("SELECT COUNT(*) FROM inserted")
+
+        with patch.object(ReadingRollupRepository, 'enabled', False):
+            query = TemperatureReadingRepository.wrap_insert("INSERT INTO public.temperature_readings (a) VALUES ($1)")
+        assert "temperature_rollup" not in query
+
+    @pytest.mark.asyncio
+    async def test_batch_insert_counts_rows_returned_by_the_rollup_statement(self):
+        """Test batch inserts fold rows into the rollups and count only inserted rows."""
+        conn = MagicMock()
+        conn.transaction.return_value.__aenter__ = AsyncMock()
+        conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        conn.copy_records_to_table = AsyncMock(return_value="COPY 2")
+        conn.execute = AsyncMock()
+        conn.fetchval = AsyncMock(return_value=1)
+        reading = {
+            'customer_id': str(uuid4()), 'facility_id': str(uuid4()), 'storage_unit_id': str(uuid4()),
+            'temperature': -20.5, 'recorded_at': datetime.now(UTC), 'sensor_id': 'sensor_001',
+        }
+
+        with patch.object(ReadingRollupRepository, 'enabled', True), \
+             patch.object(TemperatureReadingRepository, 'skip_duplicates', False):
+            count = await TemperatureReadingRepository.create_batch([reading, reading], use_copy=True, conn=conn)
+
+        assert count == 1
+        # Even without duplicate skipping the rows go through staging to reach the rollups
+        assert conn.copy_records_to_table.call_args[0][0] == TemperatureReadingRepository.staging_table
+        query = conn.fetchval.call_args[0][0]
+        assert f"FROM {TemperatureReadingRepository.staging_table} RETURNING *" in query
+        assert "temperature_rollup_daily" in query
+
+    @pytest.mark.asyncio
+    async def test_rebuild_locks_rollups_and_replaces_buckets(self):
+        """Test rebuilds hold back incremental writers and replace whole buckets."""
+        conn = MagicMock()
+        conn.transaction.return_value.__aenter__ = AsyncMock()
+        conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+        conn.execute = AsyncMock()
+        conn.fetchval = AsyncMock(side_effect=[1, 3])
+        acquire = MagicMock()
+        acquire.__aenter__ = AsyncMock(return_value=conn)
+        acquire.__aexit__ = AsyncMock(return_value=False)
+
+        with patch('database.repositories.repositories.db') as mock_db:
+            mock_db.transaction = AsyncMock(return_value=acquire)
+            rebuilt = await ReadingRollupRepository.rebuild(
+                datetime(2024, 1, 1, 10, 30, tzinfo=UTC), datetime(2024, 1, 1, 12, 15, tzinfo=UTC)
+            )
+
+        assert rebuilt == {'day': 1, 'hour': 3}
+        assert "IN EXCLUSIVE MODE" in conn.execute.call_args[0][0]
+        daily, hourly = conn.fetchval.call_args_list
+        assert daily[0][1:] == (datetime(2024, 1, 1, tzinfo=UTC), datetime(2024, 1, 2, tzinfo=UTC))
+        assert hourly[0][1:] == (datetime(2024, 1, 1, 10, tzinfo=UTC), datetime(2024, 1, 1, 13, tzinfo=UTC))
+        assert "temperature_sum = EXCLUDED.temperature_sum" in hourly[0][0]
+        assert "DELETE FROM public.temperature_rollup_hourly" in hourly[0][0]
+
+
+class TestRollupRepairJob:
+
+    @pytest.mark.asyncio
+    @patch.object(ReadingRollupRepository, 'rebuild', new_callable=AsyncMock)
+    async def test_rebuild_runs_one_day_per_transaction(self, mock_rebuild):
+        """Test long ranges are rebuilt a UTC day at a time and totals are summed."""
+        mock_rebuild.return_value = {'day': 1, 'hour': 24}
+        job = RollupRepairJob()
+
+        totals = await job.rebuild(datetime(2024, 1, 1, 6), datetime(2024, 1, 3, 12))
+
+        assert totals == {'day': 3, 'hour': 72}
+        calls = [c[0] for c in mock_rebuild.call_args_list]
+        assert calls[0][0] == datetime(2024, 1, 1, 6, tzinfo=UTC)
+        assert calls[0][1] == datetime(2024, 1, 1, 23, 59, 59, 999999, tzinfo=UTC)
+        assert calls[1][0] == datetime(2024, 1, 2, tzinfo=UTC)
+        assert calls[2][1] == datetime(2024, 1, 3, 12, tzinfo=UTC)
+
+    @pytest.mark.asyncio
+    @patch.object(ReadingRollupRepository, 'rebuild', new_callable=AsyncMock)
+    async def test_repair_covers_the_window(self, mock_rebuild):
+        """Test the periodic repair rebuilds the trailing window."""
+        mock_rebuild.return_value = {'day': 1, 'hour': 1}
+        job = RollupRepairJob(window_hours=6)
+
+        await job.repair(now=datetime(2024, 1, 1, 12, tzinfo=UTC))
+
+        assert mock_rebuild.call_args_list[0][0][0] == datetime(2024, 1, 1, 6, tzinfo=UTC)
+        assert job.last_repair == {'day': 1, 'hour': 1}
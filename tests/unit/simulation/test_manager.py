@@ -0,0 +1,63 @@
+# tests/unit/simulation/test_manager.py
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+from simulation.customer_generator import CustomerGenerator
+from simulation.manager import create_customer_app, parse_since
+
+
+class TestCustomerApp:
+
+    @pytest.fixture
+    def api_client(self):
+        customer = CustomerGenerator().generate_customer("SIM_API", template_name="pharmaceutical")
+        return TestClient(create_customer_app(customer))
+
+    def test_parse_since_normalizes_to_naive_utc(self):
+        """Test aware `since` values are converted to naive UTC."""
+        parsed = parse_since("2025-06-18T12:00:00+02:00")
+
+        assert parsed == datetime(2025, 6, 18, 10, 0)
+        assert parse_since(None) is None
+
+    def test_since_filters_api_readings(self, api_client):
+        """Test the API endpoint only returns readings at or after `since`."""
+        since = datetime.now() - timedelta(minutes=5)
+
+        full = api_client.get("/temperature/current", params={"hours": 0.5}).json()
+        partial = api_client.get(
+            "/temperature/current",
+            params={"hours": 0.5, "since": since.replace(tzinfo=timezone.utc).isoformat()}
+        ).json()
+
+        assert partial["reading_count"] < full["reading_count"]
+        assert all(datetime.fromisoformat(r["timestamp"]) >= since for r in partial["readings"])
+
+    def test_unchanged_payload_returns_304(self, api_client):
+        """Test a repeated poll with the ETag or Last-Modified gets 304."""
+        first = api_client.get("/temperature/current")
+        etag = first.headers["etag"]
+
+        by_etag = api_client.get("/temperature/current", headers={"If-None-Match": etag})
+        by_date = api_client.get(
+            "/temperature/current", headers={"If-Modified-Since": first.headers["last-modified"]}
+        )
+
+        assert first.status_code == 200
+        assert by_etag.status_code == 304
+        assert by_date.status_code == 304
+        assert by_etag.content == b""
+
+    def test_stale_etag_returns_payload(self, api_client):
+        """Test a non-matching ETag gets the full body."""
+        response = api_client.get("/temperature/current", headers={"If-None-Match": '"stale"'})
+
+        assert response.status_code == 200
+        assert response.json()["reading_count"] > 0
+
+    def test_gzip_transfer_encoding(self, api_client):
+        """Test responses are compressed when the client accepts gzip."""
+        response = api_client.get("/temperature/current", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"